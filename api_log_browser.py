@@ -0,0 +1,182 @@
+# api_log_browser.py
+
+# --- Standard Library Imports ---
+from datetime import datetime
+
+# --- Third-party Library Imports ---
+from sqlalchemy import and_, or_, select, func
+
+# --- Application-Specific Imports ---
+from models import db, APILog
+
+API_LOG_PAGE_SIZE = 25
+COUNT_CAP = 10000  # Lọc theo cột không có trong rollup: chỉ đếm tới mức này ("10000+")
+
+# Các tham số lọc trên URL (dùng chung cho trang admin và export)
+API_LOG_FILTER_ARGS = ("api_name", "success", "user_id", "status_code", "since", "until")
+
+
+def parse_api_log_filters(args):
+    """
+    Đọc bộ lọc từ query string (request.args). Giá trị không hợp lệ bị bỏ qua và được báo lại.
+    'since'/'until' theo định dạng của <input type="datetime-local"> (giờ UTC), ví dụ 2024-05-01T13:30.
+
+    Returns:
+        tuple: (filters, errors) - filters là dict chỉ gồm các bộ lọc hợp lệ đã chuyển kiểu,
+               errors là list thông báo cho các giá trị bị bỏ qua.
+    """
+    filters = {}
+    errors = []
+
+    api_name = (args.get("api_name") or "").strip()
+    if api_name:
+        filters["api_name"] = api_name
+
+    success = (args.get("success") or "").strip().lower()
+    if success in ("1", "true", "yes"):
+        filters["success"] = True
+    elif success in ("0", "false", "no"):
+        filters["success"] = False
+    elif success:
+        errors.append(f"Invalid success filter '{success}' ignored.")
+
+    for name in ("user_id", "status_code"):
+        raw_value = (args.get(name) or "").strip()
+        if not raw_value:
+            continue
+        try:
+            filters[name] = int(raw_value)
+        except ValueError:
+            errors.append(f"Invalid {name.replace('_', ' ')} '{raw_value}' ignored.")
+
+    for name in ("since", "until"):
+        raw_value = (args.get(name) or "").strip()
+        if not raw_value:
+            continue
+        try:
+            filters[name] = datetime.fromisoformat(raw_value)
+        except ValueError:
+            errors.append(f"Invalid {name} time '{raw_value}' ignored.")
+
+    return filters, errors
+
+
+def filter_args_for_url(filters):
+    """Chuyển filters về dạng chuỗi để dựng lại URL (url_for) giữ nguyên bộ lọc."""
+    args = {}
+    for name, value in filters.items():
+        if isinstance(value, bool):
+            args[name] = "1" if value else "0"
+        elif isinstance(value, datetime):
+            args[name] = value.strftime("%Y-%m-%dT%H:%M")
+        else:
+            args[name] = value
+    return args
+
+
+def filter_conditions(filters):
+    """
+    Điều kiện WHERE cho bộ lọc. Mỗi cột lọc có index ghép (cột, timestamp, id) trên api_log,
+    nên lọc + sắp theo thời gian chỉ là một lần seek trên index.
+    """
+    conditions = []
+    if "api_name" in filters:
+        conditions.append(APILog.api_name == filters["api_name"])
+    if "success" in filters:
+        conditions.append(APILog.success == filters["success"])
+    if "user_id" in filters:
+        conditions.append(APILog.user_id == filters["user_id"])
+    if "status_code" in filters:
+        conditions.append(APILog.status_code == filters["status_code"])
+    if "since" in filters:
+        conditions.append(APILog.timestamp >= filters["since"])
+    if "until" in filters:
+        conditions.append(APILog.timestamp < filters["until"])
+    return conditions
+
+
+def encode_cursor(log_entry):
+    """Con trỏ trang: timestamp và id của một dòng, ví dụ '2024-05-01T13:30:00.123456_42'."""
+    return f"{log_entry.timestamp.isoformat()}_{log_entry.id}"
+
+
+def decode_cursor(cursor):
+    """Trả về (timestamp, id) từ con trỏ, hoặc None nếu con trỏ không hợp lệ."""
+    if not cursor:
+        return None
+    timestamp_part, _, id_part = cursor.rpartition("_")
+    try:
+        return datetime.fromisoformat(timestamp_part), int(id_part)
+    except ValueError:
+        return None
+
+
+def keyset_condition(cursor_key, older, model=APILog):
+    """
+    (timestamp, id) < cursor (older=True) hoặc > cursor. Viết tách ra thay vì so sánh tuple
+    để mọi database đều dùng được index (timestamp, id) cho phần timestamp <= / >=.
+    Dùng được cho mọi model có cột timestamp và id (APILog, UserActivity).
+    """
+    timestamp, row_id = cursor_key
+    if older:
+        return and_(model.timestamp <= timestamp,
+                    or_(model.timestamp < timestamp, model.id < row_id))
+    return and_(model.timestamp >= timestamp,
+                or_(model.timestamp > timestamp, model.id > row_id))
+
+
+def fetch_api_log_page(filters, after=None, before=None, per_page=API_LOG_PAGE_SIZE):
+    """
+    Một trang log (mới nhất trước) theo kiểu keyset: không dùng OFFSET, nên trang sâu cũng nhanh như trang đầu.
+    - after: con trỏ của dòng cuối trang trước -> trang cũ hơn.
+    - before: con trỏ của dòng đầu trang sau -> trang mới hơn.
+    Nhảy tới một thời điểm bất kỳ: dùng bộ lọc 'until' (trang đầu tiên ngay trước thời điểm đó).
+
+    Returns:
+        dict: {'logs': [...], 'older_cursor': str|None, 'newer_cursor': str|None}
+              (None nếu không còn trang theo hướng đó).
+    """
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+    query = APILog.query.filter(*filter_conditions(filters))
+
+    if before_key is not None and after_key is None:
+        # Đi ngược về phía mới hơn: sắp tăng dần rồi đảo lại để vẫn hiển thị mới nhất trước
+        rows = query.filter(keyset_condition(before_key, older=False)) \
+            .order_by(APILog.timestamp.asc(), APILog.id.asc()).limit(per_page + 1).all()
+        has_newer = len(rows) > per_page
+        logs = list(reversed(rows[:per_page]))
+        has_older = True
+    else:
+        if after_key is not None:
+            query = query.filter(keyset_condition(after_key, older=True))
+        rows = query.order_by(APILog.timestamp.desc(), APILog.id.desc()).limit(per_page + 1).all()
+        has_older = len(rows) > per_page
+        logs = rows[:per_page]
+        has_newer = after_key is not None
+
+    return {
+        "logs": logs,
+        "older_cursor": encode_cursor(logs[-1]) if logs and has_older else None,
+        "newer_cursor": encode_cursor(logs[0]) if logs and has_newer else None,
+    }
+
+
+def count_api_logs(filters, call_count_rollup, cap=COUNT_CAP):
+    """
+    Số dòng khớp bộ lọc, không đếm cả bảng api_log:
+    - chỉ lọc theo api_name / success / khoảng thời gian: ước lượng từ bảng api_call_rollup (làm tròn theo giờ/ngày);
+    - có lọc user_id / status_code: đếm thật nhưng dừng ở `cap`.
+
+    Returns:
+        dict: {'value': int, 'approximate': bool, 'capped': bool}
+    """
+    if "user_id" not in filters and "status_code" not in filters:
+        value = call_count_rollup.estimate_count(api_name=filters.get("api_name"), success=filters.get("success"),
+                                                 since=filters.get("since"), until=filters.get("until"))
+        approximate = "since" in filters or "until" in filters
+        return {"value": value, "approximate": approximate, "capped": False}
+
+    limited = select(APILog.id).where(*filter_conditions(filters)).limit(cap + 1).subquery()
+    value = db.session.execute(select(func.count()).select_from(limited)).scalar() or 0
+    return {"value": min(value, cap), "approximate": False, "capped": value > cap}
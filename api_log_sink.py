@@ -0,0 +1,198 @@
+# api_log_sink.py
+
+# --- Standard Library Imports ---
+import atexit  # Ghi nốt các log đang chờ khi tiến trình thoát
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+# --- Application-Specific Imports ---
+from models import db, APILog
+
+logger = logging.getLogger(__name__)
+
+
+def api_log_row(log_entry):
+    """
+    Chuyển một APILog (chưa lưu) thành dict giá trị cột để insert hàng loạt.
+    Cột để trống nhưng có giá trị mặc định (timestamp, success, ...) được điền ngay lúc này,
+    để thời điểm ghi nhận là lúc gọi API chứ không phải lúc log được ghi xuống database.
+    """
+    row = {}
+    for column in APILog.__table__.columns:
+        if column.primary_key:
+            continue
+        value = getattr(log_entry, column.key)
+        if value is None and column.default is not None:
+            default = column.default.arg
+            value = default(None) if callable(default) else default  # SQLAlchemy bọc hàm mặc định để nhận context
+        row[column.key] = value
+    if row.get('timestamp') is None:
+        row['timestamp'] = datetime.utcnow()
+    return row
+
+
+class ApiLogSink:
+    """
+    Ghi APILog theo kiểu write-behind: các lời gọi API chỉ đưa log vào hàng đợi trong bộ nhớ,
+    một thread nền gom lại và ghi bằng MỘT lệnh insert nhiều dòng (executemany) trên kết nối riêng,
+    không dùng chung session của request (log lỗi không thể rollback dữ liệu của người dùng và ngược lại).
+
+    - Ghi khi đủ batch_size log hoặc sau flush_interval giây kể từ log đầu tiên của batch.
+    - Hàng đợi đầy (max_queue): người gọi chờ tối đa put_timeout giây (backpressure), quá thời gian thì log
+      bị bỏ và được đếm vào 'dropped'.
+    - Batch ghi lỗi được ghi lại từng dòng một: chỉ dòng nào vẫn lỗi mới bị bỏ và đếm vào 'failed'.
+    - Khi tiến trình thoát (atexit) hoặc gọi close(), các log còn trong hàng đợi được ghi nốt.
+    - enabled=False: ghi đồng bộ ngay (vẫn trên kết nối riêng), dùng khi cần thấy log tức thì.
+    - rollups: các đối tượng có apply(connection, rows), được chạy trong cùng transaction với lệnh insert
+      để các bảng tổng hợp (xem log_rollups.py) luôn khớp với các log đã ghi.
+    """
+
+    def __init__(self, app, enabled=True, max_queue=10000, batch_size=200, flush_interval=1.0, put_timeout=0.05,
+                 rollups=()):
+        self.app = app
+        self.rollups = list(rollups)
+        self.enabled = enabled
+        self.max_queue = max(1, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._pending = 0  # Log đã nhận nhưng chưa ghi xong (kể cả batch đang ghi)
+        self._pending_changed = threading.Condition()
+        self._counters = {"submitted": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._started_pid = None  # Tiến trình con sau fork (Gunicorn) phải tự khởi động thread của mình
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    # --- Phía người gọi ---
+
+    def submit(self, log_entry):
+        """Đưa một APILog vào hàng đợi. Không bao giờ ném lỗi ra cho người gọi."""
+        try:
+            row = api_log_row(log_entry)
+        except Exception as e:
+            logger.error("Lỗi khi chuẩn bị API log để ghi: %s", e)
+            return
+
+        with self._pending_changed:
+            self._pending += 1
+            self._counters["submitted"] += 1
+        if not self.enabled:
+            self._write_batch([row])
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            with self._pending_changed:
+                self._pending -= 1
+                self._counters["dropped"] += 1
+                self._pending_changed.notify_all()
+
+    def flush(self, timeout=10.0):
+        """Chờ tới khi mọi log đã nhận được ghi xong (hoặc hết timeout). Trả về True nếu đã ghi hết."""
+        if self._thread is None or not self._thread.is_alive():
+            self._drain()
+        deadline = time.monotonic() + timeout
+        with self._pending_changed:
+            while self._pending > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._pending_changed.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Dừng thread nền sau khi ghi nốt các log còn trong hàng đợi."""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._started_pid == os.getpid():
+            thread.join(timeout)
+        self._drain()
+
+    def stats(self):
+        with self._pending_changed:
+            counters = dict(self._counters)
+            counters["pending"] = self._pending
+        counters["queue_size"] = self._queue.qsize()
+        counters["max_queue"] = self.max_queue
+        counters["enabled"] = self.enabled
+        return counters
+
+    # --- Thread nền ---
+
+    def _ensure_started(self):
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="api-log-sink", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                first_row = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first_row]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _drain(self):
+        """Ghi đồng bộ mọi log còn trong hàng đợi (khi dừng hoặc khi thread nền không chạy)."""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        if self._write_rows(batch):
+            written = len(batch)
+        else:
+            # Một dòng hỏng (hoặc database bị khóa nhất thời) không được làm mất cả batch: ghi lại từng dòng
+            written = sum(1 for row in batch if self._write_rows([row]))
+        with self._pending_changed:
+            self._pending -= len(batch)
+            self._counters["batches"] += 1
+            self._counters["written"] += written
+            self._counters["failed"] += len(batch) - written
+            self._pending_changed.notify_all()
+
+    def _write_rows(self, rows):
+        """Insert nhiều dòng trong một transaction trên kết nối riêng. Trả về True nếu thành công."""
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(APILog.__table__.insert(), rows)
+                    for rollup in self.rollups:
+                        rollup.apply(connection, rows)
+            return True
+        except Exception as e:
+            logger.critical("Không thể ghi %s API log vào database: %s", len(rows), e)
+            return False
@@ -1,23 +1,31 @@
 # app.py
 
 # --- Standard Library Imports ---
+import csv  # csv.Error: file nhập hỏng (xem import_words_page)
+import json  # Đọc/ghi payload và kết quả của công việc nền
+import logging  # Log có cấu trúc (xem app_logging.py)
 import os  # Để tương tác với hệ điều hành, ví dụ: đọc biến môi trường
+import time  # Đo độ trễ các lời gọi API (circuit breaker)
+import uuid  # Tên file upload của /import-words
+from itertools import islice  # Đọc file nhập theo từng đoạn
 from datetime import datetime, timedelta  # Để làm việc với ngày giờ, ví dụ: created_at, added_at
 from functools import wraps  # Để tạo decorator (ví dụ: @login_required, @admin_required)
 from models import db, APILog
 # --- Flask and Related Extensions ---
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, has_request_context, \
+    Response, stream_with_context
 from flask_sqlalchemy import \
     SQLAlchemy  # Dòng này có thể không cần nếu db đã được khởi tạo trong models.py và chỉ import db từ đó
 from flask_migrate import Migrate  # Cho việc quản lý thay đổi schema database
 from flask_dance.contrib.google import make_google_blueprint, google  # Cho việc đăng nhập bằng Google OAuth
 from flask_wtf import FlaskForm  # Lớp cơ sở để tạo form trong Flask-WTF
 from flask_wtf.csrf import CSRFProtect  # Để bảo vệ chống lại tấn công CSRF
-from sqlalchemy import func, case
+from sqlalchemy import func, case, insert
 from flask_wtf import FlaskForm
 
 # --- WTForms Fields and Validators ---
-from wtforms import StringField, PasswordField, BooleanField, TextAreaField, HiddenField, SubmitField
+from wtforms import StringField, PasswordField, BooleanField, TextAreaField, HiddenField, SubmitField, SelectField
+from flask_wtf.file import FileField, FileRequired, FileAllowed  # Upload file CSV/TSV (/import-words)
 from wtforms.validators import DataRequired, Email, EqualTo, Length  # Các validators cho trường dữ liệu form
 
 # --- Third-Party Libraries ---
@@ -26,8 +34,37 @@ from deep_translator import GoogleTranslator  # Thư viện dịch thuật sử
 import requests  # Để gửi các yêu cầu HTTP (ví dụ: gọi API)
 
 # --- Application-Specific Imports ---
-from models import db, User, VocabularyList, VocabularyEntry, \
-    APILog, UserActivity  # Import SQLAlchemy instance (db) và các model từ file models.py
+from models import db, User, VocabularyList, VocabularyEntry, vocabulary_word_key, \
+    APILog, UserActivity, CacheStat, BackgroundJob  # Import SQLAlchemy instance (db) và các model từ file models.py
+from enrichment import WordEnrichmentEngine, split_translation_batches, UPSTREAM_DICTIONARY, UPSTREAM_TATOEBA, \
+    UPSTREAM_TRANSLATOR, UPSTREAM_LIBRE_BATCH, UPSTREAM_LIBRETRANSLATE, TRANSLATION_MODE_BATCH, DEFAULT_WORD_TYPE, \
+    DEFAULT_DEFINITION_EN, DEFAULT_DEFINITION_VI, DEFAULT_EXAMPLE_EN, DEFAULT_EXAMPLE_VI, DEFAULT_IPA, \
+    parse_libre_batch_response, text_to_translate_for
+from lookup_cache import WordLookupCache, CacheStatsRecorder, TranslationMemo, normalize_word_key, \
+    hash_translation_text
+from tatoeba_index import TatoebaIndex, import_tatoeba_export
+from dictionary_store import DictionaryStore, import_dictionary_dump
+from upstream_client import UpstreamClient
+from providers import build_providers, DictionaryProvider, TatoebaProvider, LibreTranslateProvider
+from singleflight import SingleFlight
+from circuit_breaker import CircuitBreaker
+from hedging import HedgedRequester, HEDGE_ROLE_PRIMARY, HEDGE_ROLE_SECONDARY
+from negative_cache import NegativeLookupCache
+from api_log_sink import ApiLogSink
+from api_log_browser import parse_api_log_filters, filter_args_for_url, fetch_api_log_page, count_api_logs
+from retention import LogRetention
+from log_export import EXPORT_SOURCES, EXPORT_FORMATS, export_stream
+from log_rollups import (LatencyHistogramRollup, ApiCallCountRollup, rebuild_rollups, LATENCY_WINDOWS,
+                         DEFAULT_LATENCY_WINDOW, LATENCY_BUCKET_BOUNDS_MS, CALL_ROLLUP_HOUR)
+from sense_store import WordSenseStore, pack_senses, unpack_senses
+from lemmatizer import lemmatize, normalize_surface
+from background_jobs import JobRunner, enqueue_job, load_job_summary, load_job_items, JOB_TYPE_ENRICH_WORDS, \
+    JOB_STATUS_DONE, JOB_STATUS_FAILED, JOB_TYPE_IMPORT_WORDS
+from word_import import detect_delimiter, iter_import_rows, count_import_rows
+import click  # Tham số cho các lệnh CLI (flask <lệnh>)
+from app_logging import app_logging
+
+logger = logging.getLogger(__name__)
 
 # === APPLICATION SETUP ===
 
@@ -38,6 +75,18 @@ load_dotenv()
 # Khởi tạo ứng dụng Flask
 app = Flask(__name__)
 
+# --- Cấu hình log (app_logging.py): JSON qua hàng đợi, ghi trên thread nền ---
+app.config['LOG_LEVEL'] = os.environ.get("LOG_LEVEL", "INFO")
+# Mức log riêng từng module, ví dụ "enrichment=DEBUG,lookup_cache=WARNING,werkzeug=WARNING"
+app.config['LOG_LEVELS'] = os.environ.get("LOG_LEVELS", "")
+app.config['LOG_FORMAT'] = os.environ.get("LOG_FORMAT", "json")  # 'json' hoặc 'text' (dễ đọc khi dev)
+app.config['LOG_FILE'] = os.environ.get("LOG_FILE")  # Không đặt: ghi ra stdout
+# Hàng đợi đầy thì bỏ bản ghi (request không bao giờ phải chờ ghi log)
+app.config['LOG_QUEUE_SIZE'] = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+# Bản ghi DEBUG (và các sự kiện nhiều được đánh dấu sample) chỉ giữ 1 trên mỗi N lần của cùng một câu lệnh log
+app.config['LOG_DEBUG_SAMPLE_EVERY'] = int(os.environ.get("LOG_DEBUG_SAMPLE_EVERY", 1))
+app_logging.configure(app.config)
+
 app.config["GOOGLE_OAUTH_CLIENT_ID"] = os.environ.get("GOOGLE_OAUTH_CLIENT_ID")
 app.config["GOOGLE_OAUTH_CLIENT_SECRET"] = os.environ.get("GOOGLE_OAUTH_CLIENT_SECRET")
 app.secret_key = os.environ.get("FLASK_SECRET_KEY",
@@ -47,9 +96,332 @@ app.secret_key = os.environ.get("FLASK_SECRET_KEY",
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///vocabulary_app.db'  # Đường dẫn tới file database SQLite
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # Tắt thông báo không cần thiết
 
+# --- Cấu hình bộ máy lấy thông tin từ vựng song song (/enter-words) ---
+# Số worker tối đa của pool dùng chung cho tất cả request
+app.config['ENRICHMENT_MAX_WORKERS'] = int(os.environ.get("ENRICHMENT_MAX_WORKERS", 8))
+# Số lời gọi đồng thời tối đa tới từng API bên ngoài (khóa trùng với api_name trong APILog)
+app.config['ENRICHMENT_UPSTREAM_LIMITS'] = {
+    UPSTREAM_DICTIONARY: int(os.environ.get("ENRICHMENT_DICTIONARY_LIMIT", 4)),
+    UPSTREAM_TATOEBA: int(os.environ.get("ENRICHMENT_TATOEBA_LIMIT", 2)),
+    UPSTREAM_TRANSLATOR: int(os.environ.get("ENRICHMENT_TRANSLATOR_LIMIT", 4)),
+    UPSTREAM_LIBRE_BATCH: int(os.environ.get("ENRICHMENT_LIBRE_BATCH_LIMIT", 2)),
+}
+# Cách dịch định nghĩa: 'batch' (gom cả request thành vài batch LibreTranslate) hoặc 'single' (mỗi từ một lời gọi)
+app.config['ENRICHMENT_TRANSLATION_MODE'] = os.environ.get("ENRICHMENT_TRANSLATION_MODE", TRANSLATION_MODE_BATCH)
+# Giới hạn kích thước một batch dịch; batch lớn hơn sẽ tự được chia nhỏ
+app.config['TRANSLATION_BATCH_MAX_ITEMS'] = int(os.environ.get("TRANSLATION_BATCH_MAX_ITEMS", 50))
+app.config['TRANSLATION_BATCH_MAX_BYTES'] = int(os.environ.get("TRANSLATION_BATCH_MAX_BYTES", 5000))
+# Dịch hedged: gửi tới provider chính ('google' hoặc 'libre'), quá độ trễ phân vị mà chưa có kết quả thì gửi thêm
+# tới provider còn lại, dùng câu trả lời tốt đầu tiên. Tắt: chỉ dùng Google Translate như trước
+app.config['TRANSLATION_HEDGE_ENABLED'] = os.environ.get("TRANSLATION_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+app.config['TRANSLATION_HEDGE_PRIMARY'] = os.environ.get("TRANSLATION_HEDGE_PRIMARY", "google")
+app.config['TRANSLATION_HEDGE_PERCENTILE'] = float(os.environ.get("TRANSLATION_HEDGE_PERCENTILE", 0.95))
+app.config['TRANSLATION_HEDGE_MIN_DELAY'] = float(os.environ.get("TRANSLATION_HEDGE_MIN_DELAY", 0.1))  # Giây
+app.config['TRANSLATION_HEDGE_MAX_DELAY'] = float(os.environ.get("TRANSLATION_HEDGE_MAX_DELAY", 5))
+app.config['TRANSLATION_HEDGE_DEFAULT_DELAY'] = float(os.environ.get("TRANSLATION_HEDGE_DEFAULT_DELAY", 1))  # Khi chưa đủ mẫu
+app.config['TRANSLATION_HEDGE_MAX_WORKERS'] = int(os.environ.get("TRANSLATION_HEDGE_MAX_WORKERS", 8))
+# Đưa từ người dùng nhập về dạng gốc trước khi tra ("running", "Ran" -> "run"). Tắt: chỉ chuẩn hóa Unicode/hoa thường
+app.config['LEMMATIZATION_ENABLED'] = os.environ.get("LEMMATIZATION_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# --- Cấu hình cache tra từ điển dùng chung (word_lookup_cache) ---
+app.config['WORD_CACHE_TTL_DAYS'] = int(os.environ.get("WORD_CACHE_TTL_DAYS", 30))  # Thời gian sống của một mục
+app.config['WORD_CACHE_MAX_ROWS'] = int(os.environ.get("WORD_CACHE_MAX_ROWS", 20000))  # Số dòng tối đa trong DB
+app.config['WORD_CACHE_HOT_SIZE'] = int(os.environ.get("WORD_CACHE_HOT_SIZE", 5000))  # Số mục trong bộ nhớ tiến trình
+
+# --- Cấu hình kho các nghĩa của từ (word_sense), dùng để xem/đổi sang nghĩa khác không cần gọi lại API ---
+app.config['SENSE_STORE_TTL_DAYS'] = int(os.environ.get("SENSE_STORE_TTL_DAYS", 90))
+app.config['SENSE_STORE_MAX_ROWS'] = int(os.environ.get("SENSE_STORE_MAX_ROWS", 50000))
+app.config['SENSE_STORE_HOT_SIZE'] = int(os.environ.get("SENSE_STORE_HOT_SIZE", 2000))
+app.config['SENSE_STORE_MAX_SENSES'] = int(os.environ.get("SENSE_STORE_MAX_SENSES", 30))  # Số nghĩa tối đa mỗi từ
+
+# --- Cấu hình bộ nhớ dịch (translation_memo) cho translate_with_deep_translator ---
+app.config['TRANSLATION_MEMO_TTL_DAYS'] = int(os.environ.get("TRANSLATION_MEMO_TTL_DAYS", 90))
+app.config['TRANSLATION_MEMO_MAX_ROWS'] = int(os.environ.get("TRANSLATION_MEMO_MAX_ROWS", 50000))
+app.config['TRANSLATION_MEMO_HOT_SIZE'] = int(os.environ.get("TRANSLATION_MEMO_HOT_SIZE", 5000))
+# Thời gian sống của bản dịch trong bộ nhớ tiến trình: bản dịch admin sửa/xóa ở một worker được các worker khác
+# thấy sau tối đa chừng này giây
+app.config['TRANSLATION_MEMO_HOT_TTL_SECONDS'] = int(os.environ.get("TRANSLATION_MEMO_HOT_TTL_SECONDS", 300))
+
+# --- Cấu hình negative cache (từ mà upstream đã trả lời "không có", xem lệnh `flask negative-cache-rebuild`) ---
+app.config['NEGATIVE_CACHE_ENABLED'] = os.environ.get("NEGATIVE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config['NEGATIVE_CACHE_TTL_HOURS'] = float(os.environ.get("NEGATIVE_CACHE_TTL_HOURS", 24))  # Sau đó gọi lại upstream
+app.config['NEGATIVE_CACHE_BLOOM_PATH'] = os.environ.get("NEGATIVE_CACHE_BLOOM_PATH",
+                                                         os.path.join(app.instance_path, "negative_cache.bloom"))
+app.config['NEGATIVE_CACHE_FP_RATE'] = float(os.environ.get("NEGATIVE_CACHE_FP_RATE", 0.01))  # Tỉ lệ dương tính giả
+app.config['NEGATIVE_CACHE_EXPECTED_ITEMS'] = int(os.environ.get("NEGATIVE_CACHE_EXPECTED_ITEMS", 100000))
+
+# --- Cấu hình chỉ mục câu ví dụ Tatoeba cục bộ (xem lệnh `flask tatoeba-import`) ---
+app.config['TATOEBA_INDEX_PATH'] = os.environ.get("TATOEBA_INDEX_PATH",
+                                                  os.path.join(app.instance_path, "tatoeba_index.sqlite3"))
+# Có gọi API tatoeba.org khi chỉ mục cục bộ không có câu ví dụ (hoặc chưa được import) hay không
+app.config['TATOEBA_LIVE_FALLBACK'] = os.environ.get("TATOEBA_LIVE_FALLBACK", "true").lower() in ("1", "true", "yes")
+
+# --- Cấu hình dictionary store cục bộ (xem lệnh `flask dictionary-import`) ---
+app.config['DICTIONARY_STORE_PATH'] = os.environ.get("DICTIONARY_STORE_PATH",
+                                                     os.path.join(app.instance_path, "dictionary_store.bin"))
+
+# --- Cấu hình HTTP client dùng chung cho các API bên ngoài (pool keep-alive, retry, timeout) ---
+app.config['UPSTREAM_CONNECT_TIMEOUT'] = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 3.05))
+app.config['UPSTREAM_RETRIES'] = int(os.environ.get("UPSTREAM_RETRIES", 2))
+app.config['UPSTREAM_RETRY_BACKOFF'] = float(os.environ.get("UPSTREAM_RETRY_BACKOFF", 0.3))
+# Read timeout theo từng upstream (giữ nguyên các giá trị trước đây đã hard-code trong từng fetcher)
+app.config['DICTIONARY_READ_TIMEOUT'] = float(os.environ.get("DICTIONARY_READ_TIMEOUT", 15))
+app.config['TATOEBA_READ_TIMEOUT'] = float(os.environ.get("TATOEBA_READ_TIMEOUT", 10))
+app.config['LIBRETRANSLATE_READ_TIMEOUT'] = float(os.environ.get("LIBRETRANSLATE_READ_TIMEOUT", 20))
+app.config['LIBRETRANSLATE_BATCH_READ_TIMEOUT'] = float(os.environ.get("LIBRETRANSLATE_BATCH_READ_TIMEOUT", 45))
+
+# --- Cấu hình địa chỉ các provider (xem providers.py). Trỏ về `flask stub-server` để chạy/benchmark không cần Internet ---
+app.config['DICTIONARY_API_BASE_URL'] = os.environ.get("DICTIONARY_API_BASE_URL")  # Mặc định: api.dictionaryapi.dev
+app.config['TATOEBA_API_BASE_URL'] = os.environ.get("TATOEBA_API_BASE_URL")  # Mặc định: tatoeba.org
+app.config['LIBRETRANSLATE_BASE_URL'] = os.environ.get("LIBRETRANSLATE_BASE_URL")  # Mặc định: libretranslate.de
+app.config['UPSTREAM_BASE_URL'] = os.environ.get("UPSTREAM_BASE_URL")  # Nếu đặt: ghi đè cả ba địa chỉ trên
+# Provider dịch từng đoạn: "google" (deep-translator, không đổi được địa chỉ) hoặc "libre" (LibreTranslate)
+app.config['TRANSLATION_PROVIDER'] = os.environ.get("TRANSLATION_PROVIDER", "google")
+
+# --- Cấu hình ghi APILog kiểu write-behind (xem api_log_sink.py) ---
+app.config['API_LOG_SINK_ENABLED'] = os.environ.get("API_LOG_SINK_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config['API_LOG_SINK_MAX_QUEUE'] = int(os.environ.get("API_LOG_SINK_MAX_QUEUE", 10000))  # Số log tối đa đang chờ ghi
+app.config['API_LOG_SINK_BATCH_SIZE'] = int(os.environ.get("API_LOG_SINK_BATCH_SIZE", 200))
+app.config['API_LOG_SINK_FLUSH_INTERVAL'] = float(os.environ.get("API_LOG_SINK_FLUSH_INTERVAL", 1.0))  # Giây
+# Hàng đợi đầy: chờ tối đa bấy nhiêu giây rồi bỏ log (không làm chậm request quá mức)
+app.config['API_LOG_SINK_PUT_TIMEOUT'] = float(os.environ.get("API_LOG_SINK_PUT_TIMEOUT", 0.05))
+# Histogram độ trễ theo upstream (bảng api_latency_rollup): độ dài mỗi khoảng và thời gian giữ lại
+app.config['LATENCY_ROLLUP_PERIOD_SECONDS'] = int(os.environ.get("LATENCY_ROLLUP_PERIOD_SECONDS", 300))
+app.config['LATENCY_ROLLUP_RETENTION_DAYS'] = int(os.environ.get("LATENCY_ROLLUP_RETENTION_DAYS", 30))
+# Số lời gọi theo giờ/ngày (bảng api_call_rollup): số ngày giữ các dòng theo giờ (dòng theo ngày được giữ mãi)
+app.config['CALL_ROLLUP_HOURLY_RETENTION_DAYS'] = int(os.environ.get("CALL_ROLLUP_HOURLY_RETENTION_DAYS", 14))
+
+# --- Cấu hình retention của các bảng log (flask logs-retention, nên chạy định kỳ bằng cron) ---
+# Dòng cũ hơn số ngày này được chuyển sang file archive NDJSON nén rồi xóa khỏi bảng (0: giữ mãi)
+app.config['API_LOG_RETENTION_DAYS'] = int(os.environ.get("API_LOG_RETENTION_DAYS", 30))
+# Dashboard đọc hoạt động của tháng trước, nên không đặt dưới ~62 ngày
+app.config['USER_ACTIVITY_RETENTION_DAYS'] = int(os.environ.get("USER_ACTIVITY_RETENTION_DAYS", 90))
+app.config['LOG_ARCHIVE_DIR'] = os.environ.get("LOG_ARCHIVE_DIR", os.path.join(app.instance_path, "log_archive"))
+app.config['LOG_RETENTION_BATCH_SIZE'] = int(os.environ.get("LOG_RETENTION_BATCH_SIZE", 1000))
+# Nghỉ giữa các lô xóa (giây) để request khác lấy được write lock của SQLite
+app.config['LOG_RETENTION_BATCH_PAUSE'] = float(os.environ.get("LOG_RETENTION_BATCH_PAUSE", 0.05))
+app.config['LOG_RETENTION_VACUUM_PAGES'] = int(os.environ.get("LOG_RETENTION_VACUUM_PAGES", 1000))
+
+# --- Cấu hình circuit breaker cho từng upstream ---
+app.config['CIRCUIT_WINDOW_SIZE'] = int(os.environ.get("CIRCUIT_WINDOW_SIZE", 20))  # Số lời gọi gần nhất được xét
+app.config['CIRCUIT_MIN_CALLS'] = int(os.environ.get("CIRCUIT_MIN_CALLS", 10))  # Số lời gọi tối thiểu trước khi đánh giá
+app.config['CIRCUIT_ERROR_RATE'] = float(os.environ.get("CIRCUIT_ERROR_RATE", 0.5))  # Tỉ lệ lỗi để ngắt
+app.config['CIRCUIT_SLOW_CALL_SECONDS'] = float(os.environ.get("CIRCUIT_SLOW_CALL_SECONDS", 8))  # Ngưỡng "lời gọi chậm"
+app.config['CIRCUIT_SLOW_RATE'] = float(os.environ.get("CIRCUIT_SLOW_RATE", 0.8))  # Tỉ lệ lời gọi chậm để ngắt
+app.config['CIRCUIT_OPEN_SECONDS'] = float(os.environ.get("CIRCUIT_OPEN_SECONDS", 30))  # Thời gian ngắt trước khi thử lại
+# Read timeout thích ứng: p95 độ trễ * hệ số, không thấp hơn mức tối thiểu và không vượt quá các *_READ_TIMEOUT ở trên
+app.config['ADAPTIVE_TIMEOUT_ENABLED'] = os.environ.get("ADAPTIVE_TIMEOUT_ENABLED", "true").lower() in ("1", "true", "yes")
+app.config['ADAPTIVE_TIMEOUT_MULTIPLIER'] = float(os.environ.get("ADAPTIVE_TIMEOUT_MULTIPLIER", 3.0))
+app.config['ADAPTIVE_TIMEOUT_MIN'] = float(os.environ.get("ADAPTIVE_TIMEOUT_MIN", 2.0))
+
+# --- Cấu hình gộp các lời gọi upstream trùng nhau (single-flight) ---
+# Thư mục file khóa để gộp cả giữa các tiến trình worker; đặt chuỗi rỗng để chỉ gộp trong một tiến trình.
+app.config['SINGLEFLIGHT_LOCK_DIR'] = os.environ.get("SINGLEFLIGHT_LOCK_DIR",
+                                                     os.path.join(app.instance_path, "singleflight_locks"))
+app.config['SINGLEFLIGHT_LOCK_TIMEOUT'] = float(os.environ.get("SINGLEFLIGHT_LOCK_TIMEOUT", 30))
+
+# --- Cấu hình công việc nền (xử lý danh sách từ dài ngoài request) ---
+# Danh sách có từ ENRICHMENT_ASYNC_THRESHOLD từ trở lên sẽ được đưa vào hàng đợi thay vì xử lý ngay trong POST.
+app.config['ENRICHMENT_ASYNC_THRESHOLD'] = int(os.environ.get("ENRICHMENT_ASYNC_THRESHOLD", 30))
+# Số worker thread trong mỗi tiến trình web; đặt 0 nếu chỉ dùng tiến trình riêng `flask jobs-worker`.
+app.config['JOB_WORKER_THREADS'] = int(os.environ.get("JOB_WORKER_THREADS", 1))
+app.config['JOB_POLL_INTERVAL'] = float(os.environ.get("JOB_POLL_INTERVAL", 2))  # Giây giữa hai lần kiểm tra hàng đợi
+app.config['JOB_HEARTBEAT_TIMEOUT'] = float(os.environ.get("JOB_HEARTBEAT_TIMEOUT", 300))  # Mất heartbeat -> chạy lại
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+app.config['JOB_CHUNK_SIZE'] = int(os.environ.get("JOB_CHUNK_SIZE", 10))  # Số từ xử lý giữa hai lần lưu kết quả
+
+# --- Cấu hình nhập từ vựng từ file CSV/TSV (/import-words) ---
+app.config['IMPORT_UPLOAD_DIR'] = os.environ.get("IMPORT_UPLOAD_DIR", os.path.join(app.instance_path, "imports"))
+# Giới hạn kích thước request: IMPORT_MAX_UPLOAD_MB chỉ áp dụng cho /import-words (xem allow_import_upload_size),
+# mọi request khác giữ giới hạn nhỏ MAX_REQUEST_MB. Lớn hơn -> 413
+app.config['IMPORT_MAX_UPLOAD_MB'] = int(os.environ.get("IMPORT_MAX_UPLOAD_MB", 20))
+app.config['MAX_REQUEST_MB'] = float(os.environ.get("MAX_REQUEST_MB", 2))
+app.config['MAX_CONTENT_LENGTH'] = int(app.config['MAX_REQUEST_MB'] * 1024 * 1024)
+app.config['IMPORT_CHUNK_SIZE'] = int(os.environ.get("IMPORT_CHUNK_SIZE", 200))  # Số dòng mỗi transaction insert
+# Tra bổ sung (từ điển, câu ví dụ, bản dịch) cho các dòng thiếu thông tin. Tắt: nhập đúng nội dung trong file
+app.config['IMPORT_ENRICH_MISSING'] = os.environ.get("IMPORT_ENRICH_MISSING", "true").lower() in ("1", "true", "yes")
+
 db.init_app(app)
 migrate = Migrate(app, db)
 
+# Bộ đếm hit/miss của các cache, được ghi dồn vào bảng cache_stat
+cache_stats = CacheStatsRecorder()
+
+# Histogram độ trễ theo upstream, được cập nhật cùng lúc với mỗi lô APILog
+latency_rollup = LatencyHistogramRollup(
+    period_seconds=app.config['LATENCY_ROLLUP_PERIOD_SECONDS'],
+    retention_days=app.config['LATENCY_ROLLUP_RETENTION_DAYS']
+)
+
+# Số lời gọi/thành công/thất bại theo giờ và theo ngày, cho các con số tổng trên trang admin
+call_count_rollup = ApiCallCountRollup(hourly_retention_days=app.config['CALL_ROLLUP_HOURLY_RETENTION_DAYS'])
+
+# Mọi APILog đi qua đây: xếp hàng trong bộ nhớ, thread nền ghi theo lô trên kết nối riêng
+api_log_sink = ApiLogSink(
+    app,
+    enabled=app.config['API_LOG_SINK_ENABLED'],
+    max_queue=app.config['API_LOG_SINK_MAX_QUEUE'],
+    batch_size=app.config['API_LOG_SINK_BATCH_SIZE'],
+    flush_interval=app.config['API_LOG_SINK_FLUSH_INTERVAL'],
+    put_timeout=app.config['API_LOG_SINK_PUT_TIMEOUT'],
+    rollups=[latency_rollup, call_count_rollup]
+)
+
+# Cache kết quả get_word_details_dictionaryapi, dùng chung cho mọi người dùng
+word_lookup_cache = WordLookupCache(
+    source=UPSTREAM_DICTIONARY,
+    stats=cache_stats,
+    ttl_seconds=app.config['WORD_CACHE_TTL_DAYS'] * 24 * 3600,
+    max_rows=app.config['WORD_CACHE_MAX_ROWS'],
+    hot_size=app.config['WORD_CACHE_HOT_SIZE']
+)
+
+# Bộ nhớ dịch hai tầng (LRU trong tiến trình + bảng translation_memo)
+translation_memo = TranslationMemo(
+    stats=cache_stats,
+    ttl_seconds=app.config['TRANSLATION_MEMO_TTL_DAYS'] * 24 * 3600,
+    max_rows=app.config['TRANSLATION_MEMO_MAX_ROWS'],
+    hot_size=app.config['TRANSLATION_MEMO_HOT_SIZE'],
+    hot_ttl_seconds=app.config['TRANSLATION_MEMO_HOT_TTL_SECONDS']
+)
+
+# Tất cả các nghĩa của từng từ đã tra (bảng word_sense), xem get_word_senses
+sense_store = WordSenseStore(
+    stats=cache_stats,
+    ttl_seconds=app.config['SENSE_STORE_TTL_DAYS'] * 24 * 3600,
+    max_rows=app.config['SENSE_STORE_MAX_ROWS'],
+    hot_size=app.config['SENSE_STORE_HOT_SIZE']
+)
+
+# Danh sách "biết là không có" (Bloom filter mmap + bảng negative_lookup có TTL), tra trước khi gọi upstream
+negative_cache = NegativeLookupCache(
+    filter_path=app.config['NEGATIVE_CACHE_BLOOM_PATH'],
+    ttl_seconds=app.config['NEGATIVE_CACHE_TTL_HOURS'] * 3600,
+    fp_rate=app.config['NEGATIVE_CACHE_FP_RATE'],
+    expected_items=app.config['NEGATIVE_CACHE_EXPECTED_ITEMS']
+)
+
+
+def tatoeba_negative_key(word, source_lang, target_lang):
+    """Khóa negative cache của Tatoeba: câu ví dụ phụ thuộc cả cặp ngôn ngữ."""
+    return f"{source_lang}:{target_lang}:{normalize_word_key(word)}"
+
+
+# Chỉ mục câu ví dụ Anh - Việt cục bộ, được get_tatoeba_examples tra trước khi gọi tatoeba.org
+tatoeba_index = TatoebaIndex(app.config['TATOEBA_INDEX_PATH'])
+
+# Từ điển cục bộ dạng mmap, được get_word_details_dictionaryapi tra trước cache và API
+dictionary_store = DictionaryStore(app.config['DICTIONARY_STORE_PATH'])
+DICTIONARY_STORE_STATS_NAME = "dictionary_store"  # Tên dòng thống kê hit/miss trong bảng cache_stat
+
+def log_circuit_state_change(upstream_name, old_state, new_state, reason):
+    """Ghi mỗi lần circuit breaker đổi trạng thái vào APILog để trang admin thấy khi nào và vì sao upstream bị ngắt."""
+    logger.info("Circuit breaker '%s': %s -> %s (%s)", upstream_name, old_state, new_state, reason)
+    # api_log_sink ghi trên kết nối riêng, không đụng vào session của lời gọi đang chạy
+    api_log_sink.submit(APILog(
+        api_name=f"circuit_breaker:{upstream_name}",
+        request_details=f"State: {old_state} -> {new_state}",
+        error_message=reason,
+        success=(new_state != "open")
+    ))
+
+
+def submit_api_log(log_entry, started_at=None):
+    """Ghi thời gian gọi (từ started_at = time.monotonic()) vào log_entry rồi đưa vào api_log_sink."""
+    if started_at is not None:
+        log_entry.duration_ms = int((time.monotonic() - started_at) * 1000)
+    api_log_sink.submit(log_entry)
+
+
+def make_circuit_breaker(upstream_name):
+    """Tạo circuit breaker cho một upstream theo cấu hình CIRCUIT_*."""
+    return CircuitBreaker(
+        upstream_name,
+        window_size=app.config['CIRCUIT_WINDOW_SIZE'],
+        min_calls=app.config['CIRCUIT_MIN_CALLS'],
+        error_rate_threshold=app.config['CIRCUIT_ERROR_RATE'],
+        slow_call_seconds=app.config['CIRCUIT_SLOW_CALL_SECONDS'],
+        slow_rate_threshold=app.config['CIRCUIT_SLOW_RATE'],
+        open_seconds=app.config['CIRCUIT_OPEN_SECONDS'],
+        on_state_change=log_circuit_state_change
+    )
+
+
+# Tham số timeout thích ứng dùng chung cho các HTTP client (None -> timeout cố định)
+adaptive_timeout_settings = {
+    "multiplier": app.config['ADAPTIVE_TIMEOUT_MULTIPLIER'],
+    "min_timeout": app.config['ADAPTIVE_TIMEOUT_MIN'],
+} if app.config['ADAPTIVE_TIMEOUT_ENABLED'] else None
+
+# HTTP client dùng chung cho từng host upstream. Kích thước pool bằng giới hạn đồng thời của upstream đó,
+# để mỗi worker của enrichment_engine luôn có sẵn một kết nối keep-alive.
+upstream_clients = {
+    UPSTREAM_DICTIONARY: UpstreamClient(
+        UPSTREAM_DICTIONARY,
+        connect_timeout=app.config['UPSTREAM_CONNECT_TIMEOUT'],
+        read_timeout=app.config['DICTIONARY_READ_TIMEOUT'],
+        pool_maxsize=app.config['ENRICHMENT_UPSTREAM_LIMITS'][UPSTREAM_DICTIONARY],
+        retries=app.config['UPSTREAM_RETRIES'],
+        backoff_factor=app.config['UPSTREAM_RETRY_BACKOFF'],
+        breaker=make_circuit_breaker(UPSTREAM_DICTIONARY),
+        adaptive_timeout=adaptive_timeout_settings
+    ),
+    UPSTREAM_TATOEBA: UpstreamClient(
+        UPSTREAM_TATOEBA,
+        connect_timeout=app.config['UPSTREAM_CONNECT_TIMEOUT'],
+        read_timeout=app.config['TATOEBA_READ_TIMEOUT'],
+        pool_maxsize=app.config['ENRICHMENT_UPSTREAM_LIMITS'][UPSTREAM_TATOEBA],
+        retries=app.config['UPSTREAM_RETRIES'],
+        backoff_factor=app.config['UPSTREAM_RETRY_BACKOFF'],
+        breaker=make_circuit_breaker(UPSTREAM_TATOEBA),
+        adaptive_timeout=adaptive_timeout_settings
+    ),
+    UPSTREAM_LIBRETRANSLATE: UpstreamClient(
+        UPSTREAM_LIBRETRANSLATE,
+        connect_timeout=app.config['UPSTREAM_CONNECT_TIMEOUT'],
+        read_timeout=app.config['LIBRETRANSLATE_READ_TIMEOUT'],
+        pool_maxsize=max(app.config['ENRICHMENT_UPSTREAM_LIMITS'][UPSTREAM_LIBRE_BATCH],
+                         app.config['ENRICHMENT_UPSTREAM_LIMITS'][UPSTREAM_TRANSLATOR]),
+        retries=app.config['UPSTREAM_RETRIES'],
+        backoff_factor=app.config['UPSTREAM_RETRY_BACKOFF'],
+        breaker=make_circuit_breaker(UPSTREAM_LIBRETRANSLATE),
+        adaptive_timeout=adaptive_timeout_settings
+    ),
+}
+
+# Các provider bên ngoài: fetcher lấy URL từ đây thay vì hard-code địa chỉ
+providers = build_providers(app.config)
+
+# Gộp các lời gọi đồng thời cùng khóa (cùng từ / cùng đoạn văn bản) thành một lời gọi upstream
+single_flight = SingleFlight(
+    lock_dir=app.config['SINGLEFLIGHT_LOCK_DIR'],
+    lock_timeout=app.config['SINGLEFLIGHT_LOCK_TIMEOUT']
+)
+
+# Google Translate (deep-translator) không đi qua upstream_clients nên có circuit breaker riêng
+translator_breaker = make_circuit_breaker(UPSTREAM_TRANSLATOR)
+
+# Dịch hedged giữa Google Translate và LibreTranslate (xem call_hedged_translation)
+translation_hedger = HedgedRequester(
+    "translation",
+    max_workers=app.config['TRANSLATION_HEDGE_MAX_WORKERS'],
+    percentile=app.config['TRANSLATION_HEDGE_PERCENTILE'],
+    min_delay=app.config['TRANSLATION_HEDGE_MIN_DELAY'],
+    max_delay=app.config['TRANSLATION_HEDGE_MAX_DELAY'],
+    default_delay=app.config['TRANSLATION_HEDGE_DEFAULT_DELAY']
+)
+
+
+@app.before_request
+def allow_import_upload_size():
+    """
+    Nâng giới hạn kích thước request lên IMPORT_MAX_UPLOAD_MB cho riêng trang nhập file.
+    Phải được đăng ký TRƯỚC CSRFProtect: CSRFProtect đọc form (và body) ngay trong before_request của nó.
+    """
+    if request.endpoint == 'import_words_page':
+        request.max_content_length = app.config['IMPORT_MAX_UPLOAD_MB'] * 1024 * 1024
+
+
 csrf = CSRFProtect(app)  # Khởi tạo CSRFProtect
 
 # --- Tạo Google Blueprint với Flask-Dance ---
@@ -75,23 +447,67 @@ from flask import session, flash, redirect, url_for
 from models import User  # Đảm bảo User model đã được import
 
 
+def resolve_log_user_id(user_id=None):
+    """
+    Xác định user_id để ghi vào APILog.
+    Ưu tiên user_id được truyền vào (khi hàm gọi API chạy trong worker thread, không có request context);
+    nếu không có thì lấy từ session của request hiện tại.
+    """
+    if user_id is not None:
+        return user_id
+    if has_request_context():
+        return session.get("db_user_id")
+    return None
 
 
-def get_tatoeba_examples(word, source_lang='eng', target_lang='vie'):
+def get_tatoeba_examples(word, source_lang='eng', target_lang='vie', user_id=None):
     """
-    Lấy câu ví dụ tiếng Anh và bản dịch tiếng Việt từ Tatoeba API.
+    Lấy câu ví dụ tiếng Anh và bản dịch tiếng Việt.
+    Tra chỉ mục Tatoeba cục bộ trước; chỉ gọi Tatoeba API khi TATOEBA_LIVE_FALLBACK bật.
     Trả về một dictionary {'example_en': '...', 'example_vi': '...'} nếu tìm thấy,
     hoặc None nếu không tìm thấy.
+    user_id: ID người dùng để ghi log; nếu None sẽ lấy từ session (xem resolve_log_user_id).
     """
-    TATOEBA_API_URL = f"https://tatoeba.org/en/api_v0/search?from={source_lang}&query={word}&orphans=no&unapproved=no&trans_filter=limit&to={target_lang}"
+    # 1. Tra chỉ mục cục bộ (không có lời gọi mạng, không ghi APILog)
+    try:
+        local_example = tatoeba_index.lookup(word, source_lang=source_lang, target_lang=target_lang)
+    except Exception as e:
+        logger.error("Lỗi khi tra chỉ mục Tatoeba cục bộ cho '%s': %s", word, e,
+                     extra={"word": word, "user_id": user_id})
+        local_example = None
+    if local_example:
+        return local_example
+
+    # 2. Không có trong chỉ mục: chỉ gọi API khi được phép
+    if not app.config.get('TATOEBA_LIVE_FALLBACK', True):
+        return None
+
+    # 3. Tatoeba đã trả lời "không có câu ví dụ" cho từ này gần đây: không gọi lại
+    if app.config['NEGATIVE_CACHE_ENABLED'] and negative_cache.is_known_missing(
+            UPSTREAM_TATOEBA, tatoeba_negative_key(word, source_lang, target_lang)):
+        return None
+
+    # 4. Gọi API; các yêu cầu đồng thời cho cùng một từ dùng chung một lời gọi (single-flight)
+    return single_flight.do(f"{UPSTREAM_TATOEBA}:{source_lang}:{target_lang}:{normalize_word_key(word)}",
+                            fetch_tatoeba_example_live, word, source_lang, target_lang, user_id)
+
+
+def fetch_tatoeba_example_live(word, source_lang='eng', target_lang='vie', user_id=None):
+    """
+    Gọi Tatoeba API và lấy câu tiếng Anh đầu tiên có bản dịch sang target_lang.
+    Trả về {'example_en': '...', 'example_vi': '...'} hoặc None. Mỗi lời gọi ghi một APILog.
+    """
+    TATOEBA_API_URL = providers[TatoebaProvider.name].search_url(word, source_lang, target_lang)
 
     api_name = "tatoeba_api"
-    user_id_to_log = session.get("db_user_id")
+    user_id_to_log = resolve_log_user_id(user_id)
     log_entry = APILog(api_name=api_name, request_details=f"Word: {word}", user_id=user_id_to_log, success=False)
+    started_at = time.monotonic()
 
     try:
-        response = requests.get(TATOEBA_API_URL, timeout=10)
+        response = upstream_clients[UPSTREAM_TATOEBA].get(TATOEBA_API_URL)
         log_entry.status_code = response.status_code
+        log_entry.bytes_received = len(response.content)
         response.raise_for_status()
         data = response.json()
 
@@ -114,18 +530,16 @@ def get_tatoeba_examples(word, source_lang='eng', target_lang='vie'):
                     return {'example_en': example_en, 'example_vi': example_vi}
 
         log_entry.error_message = "No matching example sentence or translation found."
+        # Tatoeba trả lời thành công nhưng không có câu phù hợp: ghi nhận để lần sau không gọi lại
+        if app.config['NEGATIVE_CACHE_ENABLED']:
+            negative_cache.add_missing(UPSTREAM_TATOEBA, tatoeba_negative_key(word, source_lang, target_lang))
 
     except requests.exceptions.RequestException as e:
         log_entry.error_message = f"Request error to Tatoeba API: {str(e)}"
     except Exception as e:
         log_entry.error_message = f"Unexpected error processing Tatoeba response: {str(e)}"
     finally:
-        try:
-            db.session.add(log_entry)
-            db.session.commit()
-        except Exception as db_e:
-            db.session.rollback()
-            print(f"CRITICAL ERROR: Không thể ghi API log vào database: {db_e}")
+        submit_api_log(log_entry, started_at)
 
     return None
 
@@ -256,7 +670,7 @@ def home():
                     flash("Could not get information from Google. Please try again.", "danger")
                     return redirect(url_for('logout'))  # Đăng xuất khỏi hệ thống và có thể cả Google Dance session
             except Exception as e:  # Lỗi mạng hoặc lỗi khác khi gọi API Google
-                print(f"Error fetching user info from Google: {e}")
+                logger.error("Error fetching user info from Google: %s", e)
                 flash("Error connecting to Google. Please try again.", "danger")
                 return redirect(url_for('logout'))
 
@@ -491,18 +905,8 @@ def login():
     - POST: Xác thực thông tin đăng nhập, đặt session nếu thành công, và trả về JSON response.
     """
 
-    # --- DEBUGGING: In thông tin request đến ---
-    print(f"--- Request to /login ---")
-    print(f"Method: {request.method}")
-    print(f"Is JSON: {request.is_json}")  # Kiểm tra xem request có phải là JSON không
-    if request.is_json:
-        # In dữ liệu JSON nếu có (silent=True để không gây lỗi nếu không phải JSON hợp lệ)
-        print(f"Request JSON data: {request.get_json(silent=True)}")
-    else:
-        # In dữ liệu form nếu không phải JSON (ví dụ: submit form HTML truyền thống)
-        print(f"Request Form data: {request.form}")
-        print(f"Request Headers: {request.headers}")  # In headers để kiểm tra Content-Type
-    # --- KẾT THÚC DEBUGGING ---
+    # Chỉ ghi loại nội dung: body chứa mật khẩu, headers chứa cookie phiên
+    logger.debug("Request to /login", extra={"is_json": request.is_json, "content_type": request.content_type})
 
     # --- Xử lý GET Request ---
     if request.method == 'GET':
@@ -520,7 +924,7 @@ def login():
         # 1. Kiểm tra Content-Type: Yêu cầu này có phải là JSON không?
         #    Login modal của chúng ta được thiết kế để gửi dữ liệu JSON.
         if not request.is_json:
-            print("ERROR: Request POST to /login is not JSON")  # Debug
+            logger.error("Request POST to /login is not JSON")
             # Trả về lỗi nếu client không gửi dữ liệu dưới dạng JSON như mong đợi
             return jsonify({"success": False,
                             "message": "Invalid request. Data must be JSON."}), 415  # 415 Unsupported Media Type
@@ -528,13 +932,13 @@ def login():
         # 2. Lấy dữ liệu JSON từ request
         data = request.get_json()
         if not data:  # Trường hợp get_json() trả về None (ví dụ: body rỗng dù content-type đúng)
-            print("ERROR: No JSON data received in POST to /login")  # Debug
+            logger.error("No JSON data received in POST to /login")
             return jsonify(
                 {"success": False, "message": "Failed to receive JSON data from request."}), 400  # 400 Bad Request
 
         email = data.get('email')
         password = data.get('password')
-        print(f"Login attempt for email: {email}")  # Debug
+        logger.debug("Login attempt for email: %s", email)
 
         # 3. Validate dữ liệu đầu vào (email và password)
         if not email or not password:
@@ -551,7 +955,7 @@ def login():
         if user and user.password_hash and user.check_password(password):
             # 5a. Kiểm tra xem tài khoản có bị Admin chặn không
             if user.is_blocked:
-                print(f"Login FAILED for {email}: Account blocked")  # Debug
+                logger.warning("Login FAILED for %s: Account blocked", email)
                 return jsonify({"success": False,
                                 "message": "Your account has been locked. Please contact the administrator."}), 403  # 403 Forbidden
 
@@ -569,13 +973,13 @@ def login():
                 'is_admin': user.is_admin  # Quan trọng để phân quyền trong template (ví dụ: hiển thị menu Admin)
             }
             session['user_info'] = actual_user_info
-            print(f"Login SUCCESS for {email}")  # Debug
+            logger.info("Login SUCCESS for %s", email)
 
             # Trả về JSON báo thành công cho client (AJAX)
             return jsonify({"success": True, "message": "Login successful!"})  # HTTP 200 OK (mặc định)
         else:
             # Đăng nhập thất bại: Sai email, sai mật khẩu, hoặc user đăng nhập bằng Google và chưa đặt mật khẩu hệ thống.
-            print(f"Login FAILED for {email}: Invalid credentials or no password_hash set for this email.")  # Debug
+            logger.warning("Login FAILED for %s: Invalid credentials or no password_hash set for this email.", email)
             return jsonify({"success": False, "message": "Incorrect email or password."}), 401  # 401 Unauthorized
 
     # Trường hợp khác (ví dụ: request không phải GET cũng không phải POST hợp lệ, không nên xảy ra với route này)
@@ -648,7 +1052,7 @@ def register():
         except Exception as e:
             db.session.rollback()  # Hoàn tác lại các thay đổi trong database nếu có lỗi
             flash(f'An error occurred during registration.: {str(e)}', 'danger')
-            print(f"Error during user registration for email {email}: {e}")  # Log lỗi chi tiết ở server
+            logger.error("Error during user registration for email %s: %s", email, e)  # Log lỗi chi tiết ở server
             return redirect(url_for('register'))  # Quay lại trang đăng ký
 
     # 3. Nếu là GET request, chỉ cần hiển thị trang đăng ký
@@ -666,7 +1070,7 @@ def terms_of_service_page():
     return "<h1>Điều khoản Dịch vụ (Terms of Service)</h1><p>Nội dung sẽ được cập nhật sớm.</p>"
 
 
-def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='auto'):
+def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='auto', user_id=None):
     """
     Dịch một đoạn văn bản sang ngôn ngữ đích sử dụng GoogleTranslator từ thư viện deep-translator.
     Đồng thời ghi log lại thông tin của mỗi lần gọi API dịch.
@@ -676,6 +1080,7 @@ def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='
         dest_lang (str, optional): Mã ngôn ngữ đích (ví dụ: 'vi' cho tiếng Việt). Mặc định là 'vi'.
         src_lang (str, optional): Mã ngôn ngữ nguồn (ví dụ: 'en' cho tiếng Anh, 'auto' để tự động phát hiện).
                                  Mặc định là 'auto'.
+        user_id (int, optional): ID người dùng để ghi log. Nếu None sẽ lấy từ session (khi có request context).
 
     Returns:
         str: Đoạn văn bản đã dịch, hoặc văn bản gốc nếu có lỗi hoặc dịch không thành công/không thay đổi.
@@ -683,12 +1088,87 @@ def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='
 
     # 1. Kiểm tra đầu vào: Nếu không có text hoặc text không hợp lệ, trả về text gốc.
     if not text_to_translate or not isinstance(text_to_translate, str) or not text_to_translate.strip():
-        # print(f"translate_with_deep_translator: Input không hợp lệ hoặc rỗng: '{text_to_translate}'") # Debug
+        # logger.debug("translate_with_deep_translator: Input không hợp lệ hoặc rỗng: '%s'", text_to_translate)
         return text_to_translate
 
+    # 1b. Tra bộ nhớ dịch: nếu đoạn văn bản này đã từng được dịch thì trả về ngay,
+    #     không gọi mạng và cũng không ghi APILog (tránh một lần commit cho mỗi lần trúng cache).
+    memo_translation = translation_memo.get_translation(text_to_translate, src_lang, dest_lang)
+    if memo_translation is not None:
+        return memo_translation
+
+    # 1c. Gộp các yêu cầu dịch đồng thời cùng một đoạn văn bản (single-flight).
+    #     Tiến trình khác đang chờ khóa sẽ tra lại bộ nhớ dịch trước khi tự gọi API.
+    #     Ở chế độ hedged, lời gọi được gửi tới cả Google và LibreTranslate (xem call_hedged_translation);
+    #     với TRANSLATION_PROVIDER=libre thì chỉ gọi LibreTranslate (ví dụ khi chạy với stub server).
+    if app.config['TRANSLATION_HEDGE_ENABLED']:
+        translation_call = call_hedged_translation
+    elif app.config['TRANSLATION_PROVIDER'] == "libre":
+        translation_call = call_libre_translation
+    else:
+        translation_call = call_deep_translator
+    return single_flight.do(
+        f"{UPSTREAM_TRANSLATOR}:{src_lang}:{dest_lang}:{hash_translation_text(text_to_translate)}",
+        translation_call, text_to_translate, dest_lang, src_lang, user_id,
+        recheck=lambda: translation_memo.get_translation(text_to_translate, src_lang, dest_lang)
+    )
+
+
+def is_useful_translation(original_text, translated_text):
+    """Bản dịch dùng được: có nội dung và khác văn bản gốc."""
+    return bool(translated_text) and translated_text.strip().lower() != original_text.strip().lower()
+
+
+def call_libre_translation(text_to_translate, dest_lang='vi', src_lang='auto', user_id=None):
+    """Dịch một đoạn bằng LibreTranslate (TRANSLATION_PROVIDER=libre) và lưu bản dịch dùng được vào bộ nhớ dịch."""
+    translated_text = translate_single_text_libre(text_to_translate, target_lang=dest_lang, source_lang=src_lang,
+                                                  user_id=user_id)
+    if not is_useful_translation(text_to_translate, translated_text):
+        return text_to_translate
+    translation_memo.set_translation(text_to_translate, src_lang, dest_lang, translated_text)
+    return translated_text
+
+
+def call_hedged_translation(text_to_translate, dest_lang='vi', src_lang='auto', user_id=None):
+    """
+    Dịch hedged: gọi provider chính (TRANSLATION_HEDGE_PRIMARY), nếu quá độ trễ phân vị của nó mà chưa có
+    bản dịch dùng được thì gọi thêm provider còn lại; bản dịch tốt đầu tiên được dùng.
+    Mỗi lời gọi ghi APILog riêng với hedge_role = 'primary'/'secondary'.
+    """
+    user_id_to_log = resolve_log_user_id(user_id)  # Worker của hedger không có request context
+
+    def google(hedge_role):
+        with app.app_context():
+            return call_deep_translator(text_to_translate, dest_lang, src_lang, user_id_to_log, hedge_role=hedge_role)
+
+    def libre(hedge_role):
+        with app.app_context():
+            return translate_single_text_libre(text_to_translate, target_lang=dest_lang, source_lang=src_lang,
+                                               user_id=user_id_to_log, hedge_role=hedge_role)
+
+    primary, secondary = (libre, google) if app.config['TRANSLATION_HEDGE_PRIMARY'] == "libre" else (google, libre)
+    translated_text, winner = translation_hedger.call(
+        lambda: primary(HEDGE_ROLE_PRIMARY),
+        lambda: secondary(HEDGE_ROLE_SECONDARY),
+        is_good=lambda result: is_useful_translation(text_to_translate, result)
+    )
+    if winner is None:
+        return text_to_translate
+    if (primary if winner == HEDGE_ROLE_PRIMARY else secondary) is libre:
+        # call_deep_translator tự lưu bản dịch của Google; bản dịch của LibreTranslate được lưu ở đây
+        translation_memo.set_translation(text_to_translate, src_lang, dest_lang, translated_text)
+    return translated_text
+
+
+def call_deep_translator(text_to_translate, dest_lang='vi', src_lang='auto', user_id=None, hedge_role=None):
+    """
+    Gọi GoogleTranslator (deep-translator) cho một đoạn văn bản, ghi APILog và lưu bản dịch vào bộ nhớ dịch.
+    Được translate_with_deep_translator gọi khi bộ nhớ dịch chưa có; trả về bản dịch hoặc văn bản gốc.
+    hedge_role: vai trò của lời gọi trong một yêu cầu hedged (ghi vào APILog), None nếu không hedged.
+    """
     # 2. Chuẩn bị thông tin để ghi log
     api_name = "deep_translator_google"  # Tên định danh cho API này trong log
-    user_id_to_log = session.get("db_user_id")  # Lấy ID của người dùng hiện tại từ session (nếu có)
+    user_id_to_log = resolve_log_user_id(user_id)  # Lấy ID người dùng (tham số hoặc session)
 
     # Tạo một đối tượng APILog mới. Mặc định success có thể là False, sẽ cập nhật sau.
     # Giới hạn request_details để không quá dài, ví dụ 100 ký tự đầu.
@@ -696,27 +1176,41 @@ def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='
         api_name=api_name,
         request_details=f"Text: {text_to_translate[:100]}...",  # Lưu một phần text request
         user_id=user_id_to_log,
-        success=False  # Giả định ban đầu là thất bại, sẽ cập nhật nếu thành công
+        success=False,  # Giả định ban đầu là thất bại, sẽ cập nhật nếu thành công
+        hedge_role=hedge_role
     )
+    started_at = time.monotonic()
 
     try:
         # 3. Thực hiện việc dịch sử dụng GoogleTranslator
         #    Khởi tạo đối tượng GoogleTranslator với ngôn ngữ nguồn và đích.
         #    Gọi phương thức translate() để dịch.
-        # print(f"deep-translator: Đang dịch: '{text_to_translate[:50]}...' từ '{src_lang}' sang '{dest_lang}'") # Debug
-        translated_text = GoogleTranslator(source=src_lang, target=dest_lang).translate(text_to_translate)
+        # logger.debug("deep-translator: Đang dịch: '%s...' từ '%s' sang '%s'",
+        #              text_to_translate[:50], src_lang, dest_lang)
+        translator_breaker.before_call()  # Ném CircuitOpenError ngay nếu Google Translate đang bị ngắt
+        call_started = time.monotonic()
+        try:
+            translated_text = GoogleTranslator(source=src_lang, target=dest_lang).translate(text_to_translate)
+        except Exception:
+            translator_breaker.record(False, time.monotonic() - call_started)
+            raise
+        translator_breaker.record(translated_text is not None, time.monotonic() - call_started)
+        if translated_text is not None:  # deep-translator không trả về response, lấy kích thước bản dịch
+            log_entry.bytes_received = len(translated_text.encode("utf-8"))
 
         # 4. Xử lý kết quả dịch
         if translated_text is None:
             # Trường hợp API trả về None (không dịch được)
             log_entry.error_message = "Translation returned None"
-            print(f"deep-translator: Dịch trả về None cho '{text_to_translate[:50]}...'")
+            logger.info("deep-translator: Dịch trả về None cho '%s...'", text_to_translate[:50],
+                        extra={"user_id": user_id})
             # Văn bản gốc sẽ được trả về ở khối finally sau khi ghi log
         elif translated_text.strip().lower() == text_to_translate.strip().lower():
             # Trường hợp bản dịch giống hệt bản gốc (có thể do từ không cần dịch, hoặc API không tìm thấy bản dịch tốt hơn)
             log_entry.success = True  # Vẫn coi là một lượt gọi API thành công (không có exception)
             log_entry.error_message = "Translation result is the same as the original text."
-            print(f"deep-translator: Bản dịch giống văn bản gốc cho '{text_to_translate[:50]}...'")
+            logger.info("deep-translator: Bản dịch giống văn bản gốc cho '%s...'", text_to_translate[:50],
+                        extra={"user_id": user_id})
             # Sẽ trả về translated_text (là bản gốc)
         else:
             # Dịch thành công và có kết quả khác biệt
@@ -724,7 +1218,7 @@ def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='
             # Thuộc tính status_code không được cung cấp trực tiếp bởi thư viện này cho mỗi lần dịch,
             # nên chúng ta có thể bỏ qua hoặc mặc định là 200 nếu thành công.
             # log_entry.status_code = 200
-            print(f"deep-translator: Dịch thành công: '{translated_text[:50]}...'")
+            logger.debug("deep-translator: Dịch thành công: '%s...'", translated_text[:50], extra={"user_id": user_id})
             # Sẽ trả về translated_text (bản dịch)
 
         # Trả về bản dịch nếu thành công và khác biệt, ngược lại trả về bản gốc.
@@ -736,20 +1230,18 @@ def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='
         # 5. Xử lý nếu có bất kỳ lỗi nào xảy ra trong quá trình gọi API hoặc xử lý kết quả
         log_entry.success = False  # Đã được đặt mặc định
         log_entry.error_message = str(e)[:500]  # Giới hạn độ dài thông báo lỗi để không quá lớn trong DB
-        print(f"Lỗi khi dùng deep-translator cho '{text_to_translate[:50]}...': {e}")
+        logger.error("Lỗi khi dùng deep-translator cho '%s...': %s", text_to_translate[:50], e,
+                     extra={"user_id": user_id})
         # Văn bản gốc sẽ được trả về ở khối finally hoặc cuối hàm
 
     finally:
-        # 6. Luôn ghi log vào database, bất kể thành công hay thất bại
-        try:
-            db.session.add(log_entry)
-            db.session.commit()
-        except Exception as db_e:
-            db.session.rollback()  # Rollback nếu ghi log lỗi
-            print(f"LỖI NGHIÊM TRỌNG: Không thể ghi API log vào database: {db_e}")
+        # 6. Luôn ghi log, bất kể thành công hay thất bại (api_log_sink ghi xuống database theo lô)
+        submit_api_log(log_entry, started_at)
 
     # 7. Quyết định giá trị trả về cuối cùng
     if log_entry.success and translated_text and translated_text.strip().lower() != text_to_translate.strip().lower():
+        # Lưu vào bộ nhớ dịch để lần sau (của bất kỳ người dùng nào) không phải gọi lại API
+        translation_memo.set_translation(text_to_translate, src_lang, dest_lang, translated_text)
         return translated_text
     else:
         # Trả về văn bản gốc nếu:
@@ -758,15 +1250,17 @@ def translate_with_deep_translator(text_to_translate, dest_lang='vi', src_lang='
         return text_to_translate
 
 
-def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang="en"):
+def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang="en", user_id=None):
     """
     Dịch một danh sách các đoạn văn bản sử dụng API LibreTranslate (batch request).
+    Mỗi batch được ghi đúng MỘT bản ghi APILog.
 
     Args:
         texts_to_translate (list): Danh sách các chuỗi (str) cần dịch.
         target_lang (str, optional): Mã ngôn ngữ đích (ví dụ: 'vi' cho tiếng Việt). Mặc định là 'vi'.
         source_lang (str, optional): Mã ngôn ngữ nguồn (ví dụ: 'en' cho tiếng Anh). Mặc định là 'en'.
                                      LibreTranslate cũng hỗ trợ 'auto' cho một số trường hợp.
+        user_id (int, optional): ID người dùng để ghi log; nếu None sẽ lấy từ session (xem resolve_log_user_id).
 
     Returns:
         list: Danh sách các chuỗi đã được dịch, theo đúng thứ tự của danh sách đầu vào.
@@ -779,7 +1273,7 @@ def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang
         return []
 
     # 2. Định nghĩa URL của API LibreTranslate và chuẩn bị payload/headers
-    LIBRETRANSLATE_API_URL = "https://libretranslate.de/translate"  # Instance công khai của LibreTranslate
+    LIBRETRANSLATE_API_URL = providers[LibreTranslateProvider.name].translate_url()  # Mặc định: libretranslate.de
 
     # Payload cho request API. LibreTranslate cho phép gửi một mảng các chuỗi trong trường 'q'
     # khi Content-Type là 'application/json'.
@@ -794,23 +1288,34 @@ def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang
     }
 
     # 3. Đặt thời gian chờ (timeout) cho request API
-    #    Thời gian chờ cố định là 45 giây. Nếu danh sách texts_to_translate quá lớn hoặc
-    #    các câu quá dài, bạn có thể cần tăng giá trị này hoặc xem xét việc chia nhỏ batch.
-    timeout_duration = 45  # Đơn vị: giây
+    #    Mặc định 45 giây (LIBRETRANSLATE_BATCH_READ_TIMEOUT). Nếu danh sách texts_to_translate quá lớn hoặc
+    #    các câu quá dài, bạn có thể cần tăng giá trị này hoặc giảm TRANSLATION_BATCH_MAX_ITEMS/MAX_BYTES.
+    timeout_duration = app.config['LIBRETRANSLATE_BATCH_READ_TIMEOUT']  # Đơn vị: giây
+
+    # Một bản ghi log cho cả batch
+    batch_bytes = sum(len(str(text).encode("utf-8")) for text in texts_to_translate)
+    log_entry = APILog(
+        api_name=UPSTREAM_LIBRE_BATCH,
+        request_details=f"Batch: {len(texts_to_translate)} texts, {batch_bytes} bytes",
+        user_id=resolve_log_user_id(user_id),
+        success=False
+    )
+    started_at = time.monotonic()
 
     try:
         # In thông báo debug trước khi gửi request
-        print(
-            f"Đang gửi batch translation request tới LibreTranslate với timeout: {timeout_duration}s cho {len(texts_to_translate)} câu."
-        )
+        logger.debug("Đang gửi batch translation request tới LibreTranslate với timeout: %ss cho %d câu.",
+                     timeout_duration, len(texts_to_translate))
 
         # 4. Gửi POST request đến API LibreTranslate
-        response = requests.post(
+        response = upstream_clients[UPSTREAM_LIBRETRANSLATE].post(
             LIBRETRANSLATE_API_URL,
             json=payload,  # Gửi payload dưới dạng JSON (requests sẽ tự đặt Content-Type từ headers)
             headers=headers,
-            timeout=timeout_duration  # Đặt thời gian chờ cho request
+            read_timeout=timeout_duration  # Đặt thời gian chờ đọc response cho request
         )
+        log_entry.status_code = response.status_code
+        log_entry.bytes_received = len(response.content)
 
         # 5. Kiểm tra lỗi HTTP từ response
         #    response.raise_for_status() sẽ ném ra một exception (HTTPError)
@@ -820,47 +1325,93 @@ def translate_text_libre_batch(texts_to_translate, target_lang="vi", source_lang
         # 6. Phân tích JSON response
         data = response.json()  # Chuyển đổi nội dung response thành dictionary Python
 
-        # LibreTranslate thường trả về kết quả dịch batch trong một key là "translatedTexts" (một list các chuỗi)
-        # hoặc đôi khi là một list các object, mỗi object có key "translatedText".
-        # Instance libretranslate.de trả về {"translatedTexts": ["dịch 1", "dịch 2", ...]}
-        translated_texts_list = data.get("translatedTexts")
+        # LibreTranslate trả về batch trong key "translatedText" (giá trị là list các chuỗi),
+        # xem parse_libre_batch_response
+        translated_texts_list = parse_libre_batch_response(data, len(texts_to_translate))
 
         # 7. Kiểm tra kết quả dịch
-        if translated_texts_list and isinstance(translated_texts_list, list) and \
-                len(translated_texts_list) == len(texts_to_translate):
+        if translated_texts_list is not None:
             # Nếu có danh sách kết quả, nó là list, và số lượng kết quả khớp với số lượng đầu vào
-            print("Dịch batch thành công!")  # Debug
+            logger.debug("Dịch batch thành công!")
+            log_entry.success = True
             return translated_texts_list  # Trả về danh sách các bản dịch
         else:
             # Nếu kết quả không như mong đợi (ví dụ: thiếu key, sai định dạng, số lượng không khớp)
-            print(f"Lỗi dịch batch: Không tìm thấy 'translatedTexts' hoặc số lượng không khớp. Response: {data}")
+            logger.error("Lỗi dịch batch: Không tìm thấy 'translatedText' hoặc số lượng không khớp. Response: %s",
+                         data)
+            log_entry.error_message = "Missing 'translatedText' list or item count mismatch."
             # Trả về danh sách các chuỗi gốc nếu có vấn đề với cấu trúc response
             return [str(text) for text in texts_to_translate]  # Đảm bảo mọi thứ là string
 
     except requests.exceptions.Timeout:
         # 8. Xử lý lỗi Timeout (nếu request vượt quá timeout_duration)
-        print(f"Timeout ({timeout_duration}s) khi dịch batch cho: {texts_to_translate}")
+        logger.warning("Timeout (%ss) khi dịch batch cho: %s", timeout_duration, texts_to_translate)
+        log_entry.error_message = f"Timeout after {timeout_duration}s"
         return [str(text) for text in texts_to_translate]  # Trả về gốc
     except requests.exceptions.RequestException as e:
         # 9. Xử lý các lỗi request khác (ví dụ: lỗi kết nối, lỗi HTTP đã được raise_for_status() ném ra)
-        print(f"Lỗi Request API trong khi dịch batch: {e}")
+        logger.error("Lỗi Request API trong khi dịch batch: %s", e)
+        log_entry.error_message = f"Request Error: {str(e)}"
         return [str(text) for text in texts_to_translate]  # Trả về gốc
     except Exception as e:
         # 10. Xử lý các lỗi không mong muốn khác (ví dụ: lỗi parse JSON nếu response không phải JSON, ...)
-        print(f"Lỗi không mong muốn trong khi dịch batch: {e}")
+        logger.error("Lỗi không mong muốn trong khi dịch batch: %s", e)
+        log_entry.error_message = f"Unexpected Error: {str(e)}"
         return [str(text) for text in texts_to_translate]  # Trả về gốc
+    finally:
+        # 11. Luôn ghi log của batch (qua api_log_sink)
+        submit_api_log(log_entry, started_at)
+
+
+def translate_texts_batched(texts, dest_lang='vi', src_lang='auto', user_id=None):
+    """
+    Dịch nhiều đoạn văn bản bằng ít request nhất có thể (dùng cho bước dịch của enrichment_engine).
+
+    1. Bỏ trùng lặp và tra bộ nhớ dịch trước (cùng khóa với translate_with_deep_translator).
+    2. Phần còn lại được chia thành các batch theo số lượng và số byte (TRANSLATION_BATCH_MAX_ITEMS/MAX_BYTES)
+       rồi gửi qua translate_text_libre_batch (mỗi batch một APILog).
+    3. Chỉ nhận bản dịch khác văn bản gốc và lưu vào bộ nhớ dịch.
+
+    Returns:
+        dict: {văn bản gốc: bản dịch} cho các đoạn dịch được. Đoạn nào không có trong dict
+              thì người gọi tự dịch lại từng đoạn (ví dụ bằng translate_with_deep_translator).
+    """
+    translations = {}
+    pending_texts = []
+    for text in dict.fromkeys(t for t in texts if t and t.strip()):  # Bỏ trùng, giữ thứ tự
+        memo_translation = translation_memo.get_translation(text, src_lang, dest_lang)
+        if memo_translation is not None:
+            translations[text] = memo_translation
+        else:
+            pending_texts.append(text)
+
+    for batch in split_translation_batches(pending_texts,
+                                           max_items=app.config['TRANSLATION_BATCH_MAX_ITEMS'],
+                                           max_bytes=app.config['TRANSLATION_BATCH_MAX_BYTES']):
+        translated_batch = translate_text_libre_batch(batch, target_lang=dest_lang, source_lang=src_lang,
+                                                      user_id=user_id)
+        for original_text, translated_text in zip(batch, translated_batch):
+            if translated_text and translated_text.strip().lower() != original_text.strip().lower():
+                translations[original_text] = translated_text
+                translation_memo.set_translation(original_text, src_lang, dest_lang, translated_text)
+
+    return translations
 
 
-def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang="en", timeout=20):
+def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang="en", timeout=None, user_id=None,
+                                hedge_role=None):
     """
-    Dịch một đoạn văn bản đơn lẻ sử dụng API LibreTranslate.
+    Dịch một đoạn văn bản đơn lẻ sử dụng API LibreTranslate. Mỗi lời gọi được ghi vào APILog.
 
     Args:
         text_to_translate (str): Đoạn văn bản cần dịch.
         target_lang (str, optional): Mã ngôn ngữ đích. Mặc định là 'vi' (Tiếng Việt).
         source_lang (str, optional): Mã ngôn ngữ nguồn. Mặc định là 'en' (Tiếng Anh).
                                      LibreTranslate cũng có thể hỗ trợ 'auto' cho một số trường hợp.
-        timeout (int, optional): Thời gian chờ tối đa cho request API (tính bằng giây). Mặc định là 20 giây.
+        timeout (int, optional): Thời gian chờ tối đa cho request API (tính bằng giây).
+                                 Mặc định là LIBRETRANSLATE_READ_TIMEOUT (20 giây).
+        user_id (int, optional): ID người dùng để ghi log. Nếu None sẽ lấy từ session (khi có request context).
+        hedge_role (str, optional): Vai trò của lời gọi trong một yêu cầu dịch hedged (ghi vào APILog).
 
     Returns:
         str: Đoạn văn bản đã dịch, hoặc văn bản gốc nếu có lỗi xảy ra hoặc không dịch được.
@@ -868,13 +1419,14 @@ def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang
 
     # 1. Kiểm tra đầu vào: Nếu không có text hoặc text chỉ là khoảng trắng, trả về text gốc.
     if not text_to_translate or not text_to_translate.strip():
-        # print(f"translate_single_text_libre: Input rỗng hoặc chỉ chứa khoảng trắng, trả về gốc: '{text_to_translate}'") # Debug
+        # logger.debug("translate_single_text_libre: Input rỗng hoặc chỉ chứa khoảng trắng, trả về gốc: '%s'",
+        #              text_to_translate)
         return text_to_translate
 
     # 2. Định nghĩa URL của API LibreTranslate và chuẩn bị payload
-    LIBRETRANSLATE_API_URL = "https://libretranslate.de/translate"
-    # Bạn có thể thử các instance LibreTranslate công khai khác nếu 'libretranslate.de' không ổn định:
-    # Ví dụ: LIBRETRANSLATE_API_URL = "https://translate.argosopentech.com/translate"
+    LIBRETRANSLATE_API_URL = providers[LibreTranslateProvider.name].translate_url()
+    # Có thể dùng instance LibreTranslate khác nếu 'libretranslate.de' không ổn định (LIBRETRANSLATE_BASE_URL),
+    # ví dụ: LIBRETRANSLATE_BASE_URL=https://translate.argosopentech.com
     # (Lưu ý: API của argosopentech có thể yêu cầu gửi payload dưới dạng JSON (`json=payload`) thay vì `data=payload`
     # và cấu trúc response có thể khác một chút).
 
@@ -887,22 +1439,33 @@ def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang
         "format": "text"  # Yêu cầu output là text thuần
     }
 
+    log_entry = APILog(
+        api_name="libretranslate_single",
+        request_details=f"Text: {text_to_translate[:100]}...",
+        user_id=resolve_log_user_id(user_id),
+        success=False,
+        hedge_role=hedge_role
+    )
+    started_at = time.monotonic()
+
     try:
         # In thông báo debug trước khi gửi request (nếu cần)
-        # print(f"Đang dịch đơn lẻ (LibreTranslate): '{text_to_translate[:30]}...' với timeout {timeout}s")
+        # logger.debug("Đang dịch đơn lẻ (LibreTranslate): '%s...' với timeout %ss", text_to_translate[:30], timeout)
 
         # 3. Gửi POST request đến API LibreTranslate
         #    Sử dụng `data=payload` vì nhiều instance LibreTranslate (bao gồm libretranslate.de)
         #    mong đợi dữ liệu form (application/x-www-form-urlencoded).
-        response = requests.post(
+        response = upstream_clients[UPSTREAM_LIBRETRANSLATE].post(
             LIBRETRANSLATE_API_URL,
             data=payload,  # Gửi payload dưới dạng form data
-            timeout=timeout  # Đặt thời gian chờ cho request
+            read_timeout=timeout  # None -> dùng read timeout mặc định của client LibreTranslate
         )
+        log_entry.bytes_received = len(response.content)
 
         # 4. Kiểm tra lỗi HTTP từ response
         #    response.raise_for_status() sẽ ném ra một exception (HTTPError)
         #    nếu mã trạng thái HTTP là lỗi (4xx hoặc 5xx).
+        log_entry.status_code = response.status_code
         response.raise_for_status()
 
         # 5. Phân tích JSON response
@@ -913,30 +1476,193 @@ def translate_single_text_libre(text_to_translate, target_lang="vi", source_lang
 
         # 6. Kiểm tra và trả về kết quả dịch
         if translated_text:
-            # print(f"Dịch đơn lẻ thành công (LibreTranslate): '{translated_text[:30]}...'") # Debug
+            # logger.debug("Dịch đơn lẻ thành công (LibreTranslate): '%s...'", translated_text[:30])
+            log_entry.success = True
             return translated_text  # Trả về bản dịch nếu có
         else:
             # Nếu key "translatedText" không có trong response hoặc giá trị của nó là None/rỗng
-            print(
-                f"Không tìm thấy 'translatedText' trong phản hồi đơn lẻ của LibreTranslate cho '{text_to_translate[:30]}...'. Phản hồi: {data}"
-            )
+            log_entry.error_message = "No 'translatedText' in response"
+            logger.warning("Không tìm thấy 'translatedText' trong phản hồi đơn lẻ của LibreTranslate cho '%s...'. "
+                           "Phản hồi: %s", text_to_translate[:30], data)
             return text_to_translate  # Trả về văn bản gốc
 
     except requests.exceptions.Timeout:
         # 7. Xử lý lỗi Timeout (nếu request vượt quá `timeout`)
-        print(f"Timeout ({timeout}s) khi dịch đơn lẻ bằng LibreTranslate cho: '{text_to_translate[:30]}...'")
+        log_entry.error_message = "Request timed out"
+        logger.warning("Timeout (%ss) khi dịch đơn lẻ bằng LibreTranslate cho: '%s...'",
+                       timeout or app.config['LIBRETRANSLATE_READ_TIMEOUT'], text_to_translate[:30])
         return text_to_translate  # Trả về văn bản gốc
     except requests.exceptions.RequestException as e:
         # 8. Xử lý các lỗi request khác (ví dụ: lỗi kết nối, lỗi HTTP đã được raise_for_status() ném ra)
-        print(f"Lỗi Request API khi dịch đơn lẻ bằng LibreTranslate '{text_to_translate[:30]}...': {e}")
+        log_entry.error_message = str(e)[:500]
+        logger.error("Lỗi Request API khi dịch đơn lẻ bằng LibreTranslate '%s...': %s", text_to_translate[:30], e)
         return text_to_translate  # Trả về văn bản gốc
     except Exception as e:
         # 9. Xử lý các lỗi không mong muốn khác (ví dụ: lỗi parse JSON nếu response không phải JSON, ...)
-        print(f"Lỗi không mong muốn khi dịch đơn lẻ bằng LibreTranslate '{text_to_translate[:30]}...': {e}")
+        log_entry.error_message = f"Unexpected error: {str(e)[:480]}"
+        logger.error("Lỗi không mong muốn khi dịch đơn lẻ bằng LibreTranslate '%s...': %s", text_to_translate[:30], e)
         return text_to_translate  # Trả về văn bản gốc
 
+    finally:
+        # 10. Luôn ghi log (qua api_log_sink)
+        submit_api_log(log_entry, started_at)
+
+
+def get_word_details_dictionaryapi(word, user_id=None):
+    """
+    Lấy thông tin chi tiết của một từ theo thứ tự:
+        1. Dictionary store cục bộ (file mmap, xem lệnh `flask dictionary-import`).
+        2. word_lookup_cache.
+        3. negative_cache: từ mà dictionaryapi.dev đã trả 404 gần đây được trả về [] ngay.
+        4. dictionaryapi.dev qua fetch_word_details_dictionaryapi; kết quả tìm được sẽ được lưu vào cache
+           cho các lần tra sau (của mọi người dùng).
+
+    Args:
+        word (str): Từ tiếng Anh cần tra cứu.
+        user_id (int, optional): ID người dùng để ghi log khi phải gọi API.
 
-def get_word_details_dictionaryapi(word):
+    Returns:
+        list: Cùng định dạng với fetch_word_details_dictionaryapi.
+    """
+    # 1. Tra dictionary store cục bộ (không có lời gọi mạng, không ghi APILog)
+    try:
+        store_entries = dictionary_store.lookup(word)
+    except Exception as e:
+        logger.error("Lỗi khi tra dictionary store cho '%s': %s", word, e, extra={"word": word, "user_id": user_id})
+        store_entries = None
+    if store_entries is not None:
+        store_result, _ = parse_dictionaryapi_entries(store_entries)
+        cache_stats.record(DICTIONARY_STORE_STATS_NAME, 'hot_hits' if store_result else 'misses')
+        if store_result:
+            return store_result
+
+    # 2. Tra cache, 3. negative cache, 4. gọi API
+    cached_result = word_lookup_cache.get_word(word)
+    if cached_result is not None:
+        return cached_result
+
+    if app.config['NEGATIVE_CACHE_ENABLED'] and negative_cache.is_known_missing(UPSTREAM_DICTIONARY,
+                                                                                normalize_word_key(word)):
+        return []
+
+    # Nhiều người cùng tra một từ cùng lúc chỉ tạo ra MỘT lời gọi API (single-flight).
+    # Tiến trình khác đang chờ khóa sẽ tra lại cache trước khi tự gọi API.
+    return single_flight.do(f"{UPSTREAM_DICTIONARY}:{normalize_word_key(word)}",
+                            fetch_and_cache_word_details, word, user_id,
+                            recheck=lambda: word_lookup_cache.get_word(word))
+
+
+def fetch_and_cache_word_details(word, user_id=None):
+    """Gọi dictionaryapi.dev và lưu kết quả tìm được vào word_lookup_cache (trước khi nhả khóa single-flight)."""
+    result = fetch_word_details_dictionaryapi(word, user_id=user_id)
+    if result:  # Chỉ cache kết quả tìm thấy; lỗi mạng/404 không được lưu
+        word_lookup_cache.set_word(word, result)
+    return result
+
+
+def get_word_senses(word, user_id=None, fetch_missing=False):
+    """
+    Tất cả các nghĩa đã biết của một từ, theo thứ tự:
+        1. Dictionary store cục bộ (entry gốc có đủ các nghĩa).
+        2. sense_store (được ghi mỗi khi dictionaryapi.dev trả kết quả).
+        3. Chỉ khi fetch_missing=True và từ không nằm trong negative cache: gọi dictionaryapi.dev một lần
+           (single-flight chung khóa với get_word_details_dictionaryapi) rồi đọc lại sense_store.
+
+    Returns:
+        dict | None: {'ipa', 'phonetics', 'senses': [...]} (xem sense_store.unpack_senses), None nếu không có.
+    """
+    try:
+        store_entries = dictionary_store.lookup(word)
+    except Exception as e:
+        logger.error("Lỗi khi tra dictionary store cho '%s': %s", word, e, extra={"word": word, "user_id": user_id})
+        store_entries = None
+    packed = pack_senses(store_entries, max_senses=app.config['SENSE_STORE_MAX_SENSES']) \
+        if store_entries is not None else None
+
+    if packed is None:
+        packed = sense_store.get_senses(word)
+
+    if packed is None and fetch_missing and not (
+            app.config['NEGATIVE_CACHE_ENABLED'] and
+            negative_cache.is_known_missing(UPSTREAM_DICTIONARY, normalize_word_key(word))):
+        single_flight.do(f"{UPSTREAM_DICTIONARY}:{normalize_word_key(word)}",
+                         fetch_and_cache_word_details, word, user_id,
+                         recheck=lambda: sense_store.get_senses(word))
+        packed = sense_store.get_senses(word)
+
+    return unpack_senses(packed) if packed is not None else None
+
+
+def parse_dictionaryapi_entries(data):
+    """
+    Phân tích danh sách entry theo định dạng của dictionaryapi.dev (từ API hoặc từ dictionary store cục bộ).
+    Cố gắng tìm định nghĩa đầu tiên có kèm câu ví dụ, nếu không sẽ lấy định nghĩa đầu tiên tìm được.
+
+    Returns:
+        tuple: (kết quả, thông báo lỗi). Kết quả là danh sách chứa MỘT dictionary
+               (ví dụ: [{"type": "noun", "definition_en": "...", "example_en": "...", "ipa": "/.../"}])
+               hoặc [] kèm thông báo lỗi nếu không có thông tin dùng được.
+    """
+    if not (isinstance(data, list) and len(data) > 0):  # data không phải list hoặc list rỗng
+        return [], "No detailed entry found or unexpected format from API."
+
+    # API này thường trả về một mảng, chúng ta lấy phần tử đầu tiên (thường chứa thông tin chính của từ)
+    first_entry_data = data[0]
+
+    # 1. Trích xuất thông tin phiên âm IPA
+    ipa_text = "N/A"  # Giá trị mặc định nếu không tìm thấy IPA
+    if first_entry_data.get("phonetics"):  # Kiểm tra xem có mục 'phonetics' không
+        for phonetic_item in first_entry_data["phonetics"]:
+            if phonetic_item.get("text"):  # Ưu tiên lấy trường 'text' chứa IPA
+                ipa_text = phonetic_item.get("text")
+                break  # Lấy IPA đầu tiên tìm thấy và thoát vòng lặp
+
+    # 2. Tìm định nghĩa và ví dụ từ mục 'meanings'
+    if first_entry_data.get("meanings"):
+        for meaning_obj in first_entry_data["meanings"]:  # Một từ có thể có nhiều nhóm nghĩa (ví dụ: noun, verb)
+            part_of_speech = meaning_obj.get("partOfSpeech", "N/A")  # Lấy loại từ
+
+            if meaning_obj.get("definitions"):  # Mỗi nhóm nghĩa có thể có nhiều định nghĩa
+                first_definition_without_example = None  # Để lưu định nghĩa đầu tiên tìm được (kể cả không có ví dụ)
+
+                # Ưu tiên tìm định nghĩa có kèm câu ví dụ
+                for definition_obj_item in meaning_obj["definitions"]:
+                    definition_en = definition_obj_item.get("definition")  # Câu giải thích nghĩa tiếng Anh
+                    example_en = definition_obj_item.get("example")  # Câu ví dụ tiếng Anh
+
+                    if definition_en:  # Chỉ xử lý nếu có câu định nghĩa
+                        current_details = {
+                            "type": part_of_speech,
+                            "definition_en": definition_en,
+                            "example_en": example_en if example_en else "N/A",  # "N/A" nếu không có ví dụ
+                            "ipa": ipa_text  # Thêm thông tin IPA đã lấy được ở trên
+                        }
+
+                        if example_en:  # Nếu định nghĩa này có câu ví dụ thì trả về ngay (được ưu tiên)
+                            return [current_details], None
+
+                        if not first_definition_without_example:
+                            # Lưu lại định nghĩa đầu tiên (phòng trường hợp không có định nghĩa nào có ví dụ)
+                            first_definition_without_example = current_details
+
+                # Đã duyệt hết các định nghĩa trong 'meaning_obj' mà không có cái nào có ví dụ
+                if first_definition_without_example:
+                    return [first_definition_without_example], None
+
+    # 3. Trường hợp không tìm thấy định nghĩa nào trong 'meanings' nhưng vẫn lấy được IPA
+    if ipa_text != "N/A":
+        return [{
+            "type": "N/A",
+            "definition_en": "No definition found.",
+            "example_en": "N/A",
+            "ipa": ipa_text
+        }], None
+
+    # Không có định nghĩa hợp lệ nào và cũng không có IPA
+    return [], "No valid definitions or usable IPA found in API response."
+
+
+def fetch_word_details_dictionaryapi(word, user_id=None):
     """
     Lấy thông tin chi tiết của một từ từ API dictionaryapi.dev.
     Bao gồm loại từ, định nghĩa tiếng Anh, câu ví dụ tiếng Anh, và phiên âm IPA.
@@ -946,6 +1672,7 @@ def get_word_details_dictionaryapi(word):
 
     Args:
         word (str): Từ tiếng Anh cần tra cứu.
+        user_id (int, optional): ID người dùng để ghi log. Nếu None sẽ lấy từ session (khi có request context).
 
     Returns:
         list: Một danh sách CHỨA MỘT dictionary nếu tìm thấy thông tin phù hợp
@@ -953,18 +1680,20 @@ def get_word_details_dictionaryapi(word):
               Trả về danh sách rỗng ([]) nếu không tìm thấy thông tin, có lỗi API, hoặc từ không tồn tại.
     """
 
-    DICTIONARY_API_URL = f"https://api.dictionaryapi.dev/api/v2/entries/en/{word}"
+    DICTIONARY_API_URL = providers[DictionaryProvider.name].entry_url(word)
 
     # Chuẩn bị cho việc ghi log API call
     api_name = "dictionary_api"
-    user_id_to_log = session.get("db_user_id")  # Lấy user_id từ session (nếu có)
+    user_id_to_log = resolve_log_user_id(user_id)  # Lấy user_id (tham số hoặc session)
     # Khởi tạo log entry, mặc định success là False, sẽ được cập nhật nếu thành công
     log_entry = APILog(api_name=api_name, request_details=f"Word: {word}", user_id=user_id_to_log, success=False)
+    started_at = time.monotonic()  # Thời gian gọi (kể cả retry/timeout) được ghi vào log_entry.duration_ms
 
     try:
         # 1. Gửi GET request đến API từ điển, đặt timeout để tránh chờ đợi vô hạn
-        response = requests.get(DICTIONARY_API_URL, timeout=15)  # Tăng nhẹ timeout
+        response = upstream_clients[UPSTREAM_DICTIONARY].get(DICTIONARY_API_URL)  # Timeout: DICTIONARY_READ_TIMEOUT
         log_entry.status_code = response.status_code  # Ghi lại mã trạng thái HTTP
+        log_entry.bytes_received = len(response.content)
 
         # 2. Kiểm tra lỗi HTTP từ response (ví dụ: 404 Not Found, 500 Internal Server Error)
         response.raise_for_status()  # Nếu có lỗi, sẽ ném ra HTTPError và được bắt ở khối except
@@ -973,108 +1702,358 @@ def get_word_details_dictionaryapi(word):
         data = response.json()  # Chuyển đổi nội dung response thành list các dictionary Python
 
         # In ra để debug (có thể bỏ comment khi cần)
-        # print(f"DEBUG: Dictionary API response for '{word}': {data}")
-
-        # 4. Xử lý dữ liệu JSON nhận được
-        if isinstance(data, list) and len(data) > 0:
-            # API này thường trả về một mảng, chúng ta lấy phần tử đầu tiên (thường chứa thông tin chính của từ)
-            first_entry_data = data[0]
-
-            # 4a. Trích xuất thông tin phiên âm IPA
-            ipa_text = "N/A"  # Giá trị mặc định nếu không tìm thấy IPA
-            if first_entry_data.get("phonetics"):  # Kiểm tra xem có mục 'phonetics' không
-                for phonetic_item in first_entry_data["phonetics"]:
-                    if phonetic_item.get("text"):  # Ưu tiên lấy trường 'text' chứa IPA
-                        ipa_text = phonetic_item.get("text")
-                        break  # Lấy IPA đầu tiên tìm thấy và thoát vòng lặp
-
-            # 4b. Tìm định nghĩa và ví dụ từ mục 'meanings'
-            if first_entry_data.get("meanings"):
-                for meaning_obj in first_entry_data[
-                    "meanings"]:  # Một từ có thể có nhiều nhóm nghĩa (ví dụ: noun, verb)
-                    part_of_speech = meaning_obj.get("partOfSpeech", "N/A")  # Lấy loại từ
-
-                    if meaning_obj.get("definitions"):  # Mỗi nhóm nghĩa có thể có nhiều định nghĩa
-                        first_definition_without_example = None  # Để lưu định nghĩa đầu tiên tìm được (kể cả không có ví dụ)
-
-                        # Ưu tiên tìm định nghĩa có kèm câu ví dụ
-                        for definition_obj_item in meaning_obj["definitions"]:
-                            definition_en = definition_obj_item.get("definition")  # Câu giải thích nghĩa tiếng Anh
-                            example_en = definition_obj_item.get("example")  # Câu ví dụ tiếng Anh
-
-                            if definition_en:  # Chỉ xử lý nếu có câu định nghĩa
-                                current_details = {
-                                    "type": part_of_speech,
-                                    "definition_en": definition_en,
-                                    "example_en": example_en if example_en else "N/A",  # "N/A" nếu không có ví dụ
-                                    "ipa": ipa_text  # Thêm thông tin IPA đã lấy được ở trên
-                                }
-
-                                if example_en:  # Nếu định nghĩa này có câu ví dụ
-                                    log_entry.success = True  # Đánh dấu API call thành công
-                                    # Trả về ngay định nghĩa này (được ưu tiên vì có ví dụ)
-                                    # Hàm sẽ kết thúc ở đây nếu tìm thấy.
-                                    return [current_details]
-
-                                if not first_definition_without_example:
-                                    # Nếu chưa lưu định nghĩa nào, lưu lại định nghĩa đầu tiên này
-                                    # (phòng trường hợp không có định nghĩa nào có ví dụ)
-                                    first_definition_without_example = current_details
-
-                        # Nếu đã duyệt hết các định nghĩa trong một 'meaning_obj' mà không có cái nào có ví dụ,
-                        # thì sử dụng 'first_definition_without_example' đã lưu (nếu có)
-                        if first_definition_without_example:
-                            log_entry.success = True  # Đánh dấu API call thành công
-                            # Trả về định nghĩa đầu tiên tìm được (không có ví dụ)
-                            # Hàm sẽ kết thúc ở đây nếu tìm thấy.
-                            return [first_definition_without_example]
-
-            # 4c. Trường hợp không tìm thấy định nghĩa nào trong 'meanings' nhưng vẫn lấy được IPA
-            if ipa_text != "N/A":  # Và chưa return ở trên (nghĩa là không có definition_en nào hợp lệ)
-                log_entry.success = True  # Coi như thành công nếu lấy được ít nhất IPA
-                return [{
-                    "type": "N/A",
-                    "definition_en": "No definition found.",
-                    "example_en": "N/A",
-                    "ipa": ipa_text
-                }]
-
-            # Nếu không có định nghĩa hợp lệ nào và cũng không có IPA (hoặc IPA là "N/A" và không có definition)
-            log_entry.error_message = "No valid definitions or usable IPA found in API response."
-            print(f"No valid definitions or IPA found for '{word}'.")
-        else:  # data không phải list hoặc list rỗng
-            log_entry.error_message = "No detailed entry found or unexpected format from API."
-            print(f"No detailed entry found or unexpected format for '{word}'.")
+        # logger.debug("Dictionary API response for '%s': %s", word, data, extra={"word": word})
+
+        # 4. Lưu tất cả các nghĩa vào sense_store (để xem/đổi nghĩa khác sau này không phải gọi lại API),
+        #    rồi chọn một nghĩa cho thẻ từ (dùng chung bộ phân tích với dictionary store cục bộ)
+        sense_store.store_entries(word, data, max_senses=app.config['SENSE_STORE_MAX_SENSES'])
+        result, parse_error = parse_dictionaryapi_entries(data)
+        if result:
+            log_entry.success = True
+            return result
+
+        log_entry.error_message = parse_error
+        logger.info("%s Word: '%s'.", parse_error, word, extra={"word": word, "user_id": user_id})
+        if app.config['NEGATIVE_CACHE_ENABLED']:
+            negative_cache.add_missing(UPSTREAM_DICTIONARY, normalize_word_key(word))
 
     except requests.exceptions.Timeout as e:
         log_entry.error_message = f"Timeout: {str(e)}"
-        print(f"Timeout when calling Dictionary API for '{word}': {e}")
+        logger.warning("Timeout when calling Dictionary API for '%s': %s", word, e,
+                       extra={"word": word, "user_id": user_id})
     except requests.exceptions.HTTPError as http_err:
         # log_entry.status_code đã được set ở đầu khối try
         log_entry.error_message = f"HTTP Error: {str(http_err)}"
-        print(f"Lỗi HTTP khi gọi Dictionary API cho từ '{word}': {http_err}")
+        log_extra = {"word": word, "user_id": user_id, "status_code": log_entry.status_code}
+        # 404 là câu trả lời chắc chắn "từ điển không có từ này" (khác với lỗi 5xx/timeout): không phải lỗi
+        if log_entry.status_code == 404:
+            logger.info("Dictionary API không có từ '%s'", word, extra=log_extra)
+            if app.config['NEGATIVE_CACHE_ENABLED']:
+                negative_cache.add_missing(UPSTREAM_DICTIONARY, normalize_word_key(word))
+        else:
+            logger.error("Lỗi HTTP khi gọi Dictionary API cho từ '%s': %s", word, http_err, extra=log_extra)
     except requests.exceptions.RequestException as e:
         log_entry.error_message = f"Request Error: {str(e)}"
-        print(f"Lỗi Request API cho từ '{word}' với Dictionary API: {e}")
+        logger.error("Lỗi Request API cho từ '%s' với Dictionary API: %s", word, e,
+                     extra={"word": word, "user_id": user_id})
     except Exception as e:  # Các lỗi khác, ví dụ lỗi parse JSON nếu response không phải JSON
         log_entry.error_message = f"Unexpected Error: {str(e)}"
-        print(f"Lỗi không mong muốn khi lấy chi tiết cho từ '{word}': {e}")
+        logger.error("Lỗi không mong muốn khi lấy chi tiết cho từ '%s': %s", word, e,
+                     extra={"word": word, "user_id": user_id})
 
     finally:
-        # 5. Luôn ghi log vào database, bất kể thành công hay thất bại
-        #    Điều này đảm bảo mọi nỗ lực gọi API đều được ghi lại.
-        try:
-            db.session.add(log_entry)
-            db.session.commit()
-        except Exception as db_e:
-            db.session.rollback()  # Hoàn tác nếu việc ghi log vào DB bị lỗi
-            print(f"CRITICAL ERROR: Could not write API log to database: {db_e}")
-            # Trong trường hợp này, log_entry có thể không được lưu, nhưng hàm vẫn nên tiếp tục.
+        # 5. Luôn ghi log, bất kể thành công hay thất bại, để mọi nỗ lực gọi API đều được ghi lại.
+        #    api_log_sink chỉ xếp log vào hàng đợi; thread nền ghi xuống database theo lô.
+        submit_api_log(log_entry, started_at)
 
     # 6. Nếu không tìm thấy thông tin phù hợp nào hoặc có lỗi, trả về danh sách rỗng
     return []
 
 
+# Bộ máy lấy thông tin từ vựng song song, dùng chung cho mọi request tới /enter-words.
+# Pool worker và giới hạn theo từng upstream được chia sẻ giữa các request để bảo vệ các API bên ngoài.
+enrichment_engine = WordEnrichmentEngine(
+    app,
+    fetch_details=get_word_details_dictionaryapi,
+    fetch_example=get_tatoeba_examples,
+    translate=translate_with_deep_translator,
+    translate_batch=translate_texts_batched,
+    translation_mode=app.config['ENRICHMENT_TRANSLATION_MODE'],
+    max_workers=app.config['ENRICHMENT_MAX_WORKERS'],
+    upstream_limits=app.config['ENRICHMENT_UPSTREAM_LIMITS'],
+    normalize_word=lemmatize if app.config['LEMMATIZATION_ENABLED'] else normalize_surface
+)
+
+# Số lời gọi API bên ngoài cho một từ mới: từ điển, câu ví dụ và bản dịch định nghĩa
+UPSTREAM_CALLS_PER_WORD = 3
+
+
+def known_word_key(word):
+    """Khóa so khớp từ không phân biệt hoa thường, cùng khóa với cột VocabularyEntry.word_key."""
+    return vocabulary_word_key(word)
+
+
+def dedupe_words(words):
+    """
+    Bỏ các từ nhập trùng (không phân biệt hoa thường), giữ lần xuất hiện đầu tiên.
+
+    Returns:
+        tuple: (các từ còn lại theo thứ tự nhập, vị trí trong `words` của các từ bị bỏ).
+    """
+    unique_words = []
+    duplicate_indexes = []
+    seen = set()
+    for index, word in enumerate(words):
+        key = known_word_key(word)
+        if key in seen:
+            duplicate_indexes.append(index)
+            continue
+        seen.add(key)
+        unique_words.append(word)
+    return unique_words, duplicate_indexes
+
+
+def find_known_words(user_id, words, target_list_id=None):
+    """
+    Tìm các từ mà người dùng đã có trong VocabularyEntry bằng MỘT truy vấn (IN trên word_key),
+    để dùng lại nội dung đã lưu thay vì tra lại các API bên ngoài.
+    Nếu một từ có trong nhiều danh sách, ưu tiên bản trong danh sách đích, sau đó là bản mới nhất.
+
+    Returns:
+        dict: {từ như người dùng nhập: [thẻ từ vựng]}; thẻ có thêm 'reused', 'source_list_name', 'in_target_list'.
+    """
+    if not user_id or not words:
+        return {}
+    words_by_key = {}
+    for word in words:
+        words_by_key.setdefault(known_word_key(word), word)
+
+    preferred_first = case((VocabularyEntry.list_id == target_list_id, 0), else_=1) if target_list_id else None
+    query = db.session.query(VocabularyEntry, VocabularyList.name) \
+        .join(VocabularyList, VocabularyEntry.list_id == VocabularyList.id) \
+        .filter(VocabularyEntry.user_id == user_id,
+                VocabularyEntry.word_key.in_(list(words_by_key)))
+    if preferred_first is not None:
+        query = query.order_by(preferred_first)
+    rows = query.order_by(VocabularyEntry.added_at.desc()).all()
+
+    known = {}
+    for entry, list_name in rows:
+        word = words_by_key.get(entry.word_key)
+        if word is None or word in known:
+            continue  # Đã có bản được ưu tiên hơn
+        known[word] = [{
+            "type": entry.word_type or DEFAULT_WORD_TYPE,
+            "definition_en": entry.definition_en or DEFAULT_DEFINITION_EN,
+            "definition_vi": entry.definition_vi or DEFAULT_DEFINITION_VI,
+            "example_sentence": entry.example_en or DEFAULT_EXAMPLE_EN,
+            "example_sentence_vi": entry.example_vi or DEFAULT_EXAMPLE_VI,
+            "ipa": entry.ipa or DEFAULT_IPA,
+            "reused": True,
+            "source_list_name": list_name,
+            "in_target_list": bool(target_list_id) and entry.list_id == target_list_id
+        }]
+    return known
+
+
+def enrich_new_words(words, user_id, target_list_id=None):
+    """
+    Lấy thông tin cho danh sách từ (đã bỏ trùng): từ người dùng đã có được lấy từ database,
+    chỉ các từ thật sự mới mới đi qua enrichment_engine.
+
+    Returns:
+        tuple: ([(từ gốc, [thẻ từ vựng])] theo thứ tự của `words`, số từ được dùng lại).
+    """
+    known = find_known_words(user_id, words, target_list_id)
+    new_words = [word for word in words if word not in known]
+    enriched = dict(enrichment_engine.enrich(new_words, user_id=user_id)) if new_words else {}
+    return [(word, known[word] if word in known else enriched[word]) for word in words], len(known)
+
+
+def lookup_summary(input_count, duplicate_count, reused_count):
+    """Thống kê của bước lọc trước khi tra cứu, trả về cho trình duyệt."""
+    return {
+        "input": input_count,
+        "duplicates": duplicate_count,
+        "reused": reused_count,
+        "looked_up": input_count - duplicate_count - reused_count,
+        "upstream_calls_avoided": reused_count * UPSTREAM_CALLS_PER_WORD
+    }
+
+
+def run_enrich_words_job(job, runner):
+    """
+    Handler của công việc nền 'enrich_words': lấy thông tin cho danh sách từ theo từng đoạn JOB_CHUNK_SIZE từ.
+    Kết quả mỗi đoạn được thêm thành một BackgroundJobChunk (ghép lại bằng load_job_items), nên trang web thấy
+    được kết quả từng phần, và khi worker khởi động lại công việc chạy tiếp từ job.completed thay vì tra lại từ đầu.
+    Số từ được dùng lại từ vocabulary của người dùng được cộng dồn vào bảng thống kê cùng lúc với mỗi đoạn.
+
+    Returns:
+        dict: Bảng thống kê {'input', 'duplicates', 'reused'} (xem lookup_summary);
+              kết quả [từ gốc, [thẻ từ vựng]] nằm trong các đoạn đã lưu.
+    """
+    payload = json.loads(job.payload)
+    words = payload.get('words', [])
+    chunk_size = max(1, app.config['JOB_CHUNK_SIZE'])
+    summary = dict({'input': len(words), 'duplicates': 0, 'reused': 0}, **load_job_summary(job))
+
+    for start in range(job.completed or 0, len(words), chunk_size):
+        enriched_words, reused_count = enrich_new_words(words[start:start + chunk_size], job.user_id,
+                                                        payload.get('target_list_id'))
+        summary['reused'] += reused_count
+        runner.save_progress(job, completed=start + len(enriched_words), summary=summary,
+                             chunk_results=[[original_word, word_results]
+                                            for original_word, word_results in enriched_words])
+    logger.info("Công việc nền %s xong: %s từ, dùng lại %s từ đã có (tránh được %s lời gọi API bên ngoài).",
+                job.id, len(words), summary['reused'], summary['reused'] * UPSTREAM_CALLS_PER_WORD)
+    return summary
+
+
+def fill_import_rows(rows, user_id, list_id, summary, heartbeat=None):
+    """
+    Bổ sung các trường còn trống cho một đoạn dòng của file nhập và trả về các dict để bulk insert vào VocabularyEntry.
+    - Dòng không có từ, hoặc từ đã có trong danh sách đích (kể cả đã nhập ở đoạn trước) bị bỏ qua.
+    - Dòng thiếu định nghĩa/IPA/câu ví dụ được tra qua enrich_new_words (dùng lại từ người dùng đã có trước),
+      theo từng nhóm JOB_CHUNK_SIZE từ; heartbeat() (nếu có) được gọi trước mỗi nhóm, để một đoạn dài gặp
+      upstream chậm không bị coi là worker đã chết.
+    - Dòng có sẵn definition_en nhưng thiếu definition_vi: dịch chính định nghĩa trong file.
+    `summary` (dict đếm) được cập nhật tại chỗ; 'enriched' chỉ đếm các từ thật sự được tra.
+    """
+    valid_rows = [row for row in rows if row['original_word']]
+    summary['skipped_invalid'] += len(rows) - len(valid_rows)
+
+    # 1. Bỏ từ đã có trong danh sách đích và từ lặp lại trong đoạn này (một truy vấn)
+    existing_keys = {
+        row.word_key for row in
+        db.session.query(VocabularyEntry.word_key).filter(
+            VocabularyEntry.user_id == user_id,
+            VocabularyEntry.list_id == list_id,
+            VocabularyEntry.word_key.in_({known_word_key(r['original_word']) for r in valid_rows})
+        ).all()
+    }
+    new_rows = []
+    for row in valid_rows:
+        key = known_word_key(row['original_word'])
+        if key in existing_keys:
+            summary['skipped_existing'] += 1
+            continue
+        existing_keys.add(key)
+        new_rows.append(row)
+
+    # 2. Tra bổ sung cho các dòng thiếu thông tin
+    cards = {}
+    translations = {}
+    if app.config['IMPORT_ENRICH_MISSING']:
+        lookup_words = list(dict.fromkeys(
+            row['original_word'] for row in new_rows
+            if not (row['definition_en'] and row['ipa'] and row['example_en'])
+        ))
+        group_size = max(1, app.config['JOB_CHUNK_SIZE'])
+        for start in range(0, len(lookup_words), group_size):
+            if heartbeat:
+                heartbeat()
+            group = lookup_words[start:start + group_size]
+            enriched_words, reused_count = enrich_new_words(group, user_id, list_id)
+            cards.update((word, word_results[0]) for word, word_results in enriched_words if word_results)
+            summary['enriched'] += len(group) - reused_count
+        own_definitions = [row['definition_en'] for row in new_rows if row['definition_en'] and not row['definition_vi']]
+        if own_definitions:
+            if heartbeat:
+                heartbeat()
+            translations = enrichment_engine.translate_texts(own_definitions, user_id=user_id)
+            summary['translated'] += len(translations)
+
+    # 3. Gộp: giá trị trong file luôn được ưu tiên, chỉ trường trống mới lấy từ kết quả tra
+    mappings = []
+    for row in new_rows:
+        card = cards.get(row['original_word'], {})
+        if row['definition_en']:
+            definition_vi = row['definition_vi'] or translations.get(row['definition_en'])
+        else:
+            definition_vi = row['definition_vi'] or card.get('definition_vi')
+        mappings.append({
+            'original_word': row['original_word'],
+            'word_type': row['word_type'] or card.get('type'),
+            'ipa': row['ipa'] or card.get('ipa'),
+            'definition_en': row['definition_en'] or card.get('definition_en'),
+            'definition_vi': definition_vi,
+            'example_en': row['example_en'] or card.get('example_sentence'),
+            'example_vi': row['example_vi'] or card.get('example_sentence_vi'),
+            'list_id': list_id,
+            'user_id': user_id,
+            'added_at': datetime.utcnow()
+        })
+    return mappings
+
+
+def run_import_words_job(job, runner):
+    """
+    Handler của công việc nền 'import_words': đọc file đã upload theo từng đoạn IMPORT_CHUNK_SIZE dòng,
+    bổ sung trường còn thiếu và insert hàng loạt vào VocabularyEntry.
+    Mỗi đoạn được insert trong CÙNG transaction với tiến độ (job.completed = số dòng đã xử lý), nên khi worker
+    khởi động lại, công việc đọc lướt qua các dòng đã xong và chạy tiếp mà không nhập trùng.
+
+    Returns:
+        dict: Thống kê của lần nhập (số dòng đã nhập, bỏ qua, đã tra bổ sung...).
+    """
+    payload = json.loads(job.payload)
+    summary = load_job_summary(job) or {'imported': 0, 'skipped_existing': 0, 'skipped_invalid': 0,
+                                        'enriched': 0, 'translated': 0}
+    processed = job.completed or 0
+    chunk_size = max(1, app.config['IMPORT_CHUNK_SIZE'])
+
+    rows = islice(iter_import_rows(payload['path'], payload['delimiter']), processed, None)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        mappings = fill_import_rows(chunk, job.user_id, payload['list_id'], summary,
+                                    heartbeat=lambda: runner.heartbeat(job))
+        if mappings:
+            db.session.execute(insert(VocabularyEntry), mappings)
+        summary['imported'] += len(mappings)
+        processed += len(chunk)
+        runner.save_progress(job, completed=processed, summary=summary)  # Commit cả các dòng vừa insert
+    return summary
+
+
+def remove_import_upload(job):
+    """
+    Finalizer của 'import_words': xóa file upload khi công việc đã xong hoặc thất bại hẳn.
+    Không được gọi khi công việc còn được chạy lại (worker mất/đưa lại hàng đợi), vì lần chạy sau vẫn cần file.
+    """
+    path = json.loads(job.payload).get('path')
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error("Không thể xóa file nhập '%s': %s", path, e)
+
+
+# Worker xử lý các công việc nền. Thread được khởi động ở request đầu tiên của mỗi tiến trình web
+# (xem start_background_job_workers) hoặc chạy trong tiến trình riêng bằng `flask jobs-worker`.
+job_runner = JobRunner(
+    app,
+    handlers={JOB_TYPE_ENRICH_WORDS: run_enrich_words_job, JOB_TYPE_IMPORT_WORDS: run_import_words_job},
+    finalizers={JOB_TYPE_IMPORT_WORDS: remove_import_upload},
+    num_workers=app.config['JOB_WORKER_THREADS'],
+    poll_interval=app.config['JOB_POLL_INTERVAL'],
+    heartbeat_timeout=app.config['JOB_HEARTBEAT_TIMEOUT'],
+    max_attempts=app.config['JOB_MAX_ATTEMPTS']
+)
+
+
+@app.before_request
+def start_background_job_workers():
+    job_runner.start()
+
+
+def serialize_job_status(job, since=0):
+    """Dữ liệu trạng thái công việc trả cho trình duyệt; chỉ gửi các kết quả từ vị trí `since` trở đi."""
+    if job.job_type == JOB_TYPE_IMPORT_WORDS:
+        # Công việc nhập file: kết quả là bảng thống kê, không phải danh sách thẻ từ vựng
+        return {"job_id": job.id, "status": job.status, "total": job.total, "completed": job.completed,
+                "summary": load_job_summary(job), "results": [],
+                "error": job.error_message if job.status == JOB_STATUS_FAILED else None}
+    since = max(0, since)
+    counters = load_job_summary(job)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "completed": job.completed,
+        # Số từ dùng lại tính tới đoạn đã xong; đầy đủ khi status là 'done'
+        "summary": lookup_summary(counters.get('input', job.total), counters.get('duplicates', 0),
+                                  counters.get('reused', 0)),
+        "results": [
+            {"index": index, "word": original_word, "definitions": word_results}
+            for index, (original_word, word_results) in enumerate(load_job_items(job, since), start=since)
+        ],
+        "error": job.error_message if job.status == JOB_STATUS_FAILED else None
+    }
+
+
 # --- CHỈNH SỬA HÀM enter_words_page ---
 @app.route('/enter-words', methods=['GET', 'POST'])
 @login_required
@@ -1106,72 +2085,43 @@ def enter_words_page():
 
     input_str = ""
     processed_results_dict = {}
+    job_id = None
+    summary = None
 
     if form.validate_on_submit():
         input_str = form.words_input.data
         session['last_processed_input'] = input_str
 
         words_list = [word.strip() for word in input_str.split(',') if word.strip()]
-
-        if words_list:
-            for original_word in words_list:
-                print(f"Đang xử lý từ: {original_word}")
-
-                # Khởi tạo các biến với giá trị mặc định
-                english_definition = "No English definition found."
-                word_type = "N/A"
-                ipa_text = "N/A"
-                example_en = "N/A"
-                vietnamese_example_sentence = "Không có câu ví dụ."
-
-                # --- BƯỚC 1: LẤY ĐỊNH NGHĨA & IPA TỪ DICTIONARYAPI.DEV (BỎ QUA OXFORD) ---
-                # Vẫn giữ logic này để lấy định nghĩa tiếng Anh và IPA.
-                print(f"DEBUG: Getting definition/IPA from dictionaryapi.dev for '{original_word}'.")
-                detailed_entries_from_dict_api = get_word_details_dictionaryapi(original_word)
-
-                if detailed_entries_from_dict_api:
-                    entry_detail = detailed_entries_from_dict_api[0]
-                    english_definition = entry_detail.get("definition_en", "No English definition found.")
-                    word_type = entry_detail.get("type", "N/A")
-                    ipa_text = entry_detail.get("ipa", "N/A")
-
-                # --- BƯỚC 2: CHỈ LẤY CÂU VÍ DỤ TỪ TATOEBA API ---
-                # Nếu Tatoeba không có, sẽ không có câu ví dụ.
-                print(f"DEBUG: Attempting Tatoeba API for example for '{original_word}'.")
-                tatoeba_example_data = get_tatoeba_examples(original_word)  # GỌI TATOEBA API
-
-                if tatoeba_example_data:
-                    example_en = tatoeba_example_data['example_en']
-                    vietnamese_example_sentence = tatoeba_example_data['example_vi']
-                    print(f"DEBUG: Successfully got example from Tatoeba for '{original_word}'.")
-                else:
-                    # Nếu Tatoeba không có, example_en và vietnamese_example_sentence sẽ giữ giá trị mặc định ("N/A", "Không có câu ví dụ.")
-                    print(f"DEBUG: Tatoeba failed to find example for '{original_word}'. No example will be provided.")
-
-                # --- BƯỚC 3: DỊCH ĐỊNH NGHĨA TIẾNG ANH SANG TIẾNG VIỆT ---
-                # Logic này giữ nguyên để dịch english_definition
-                vietnamese_explanation = "Không thể dịch giải thích này."
-                if english_definition and english_definition.strip() and english_definition.lower() != "n/a" and english_definition.lower() != "no english definition found.":
-                    if english_definition.lower() != original_word.lower():
-                        translated_definition = translate_with_deep_translator(english_definition)
-                        if translated_definition and translated_definition.strip().lower() != english_definition.strip().lower():
-                            vietnamese_explanation = translated_definition
-                    else:
-                        translated_word_meaning = translate_with_deep_translator(original_word)
-                        if translated_word_meaning and translated_word_meaning.strip().lower() != original_word.strip().lower():
-                            vietnamese_explanation = translated_word_meaning
-
-                # --- TỔNG HỢP KẾT QUẢ CUỐI CÙNG ---
-                processed_results_dict[original_word] = []
-                processed_results_dict[original_word].append({
-                    "type": word_type,
-                    "definition_en": english_definition,
-                    "definition_vi": vietnamese_explanation,
-                    "example_sentence": example_en,  # example_en đã được lấy từ Tatoeba
-                    "example_sentence_vi": vietnamese_example_sentence,  # example_sentence_vi đã được lấy từ Tatoeba
-                    "ipa": ipa_text
-                })
-                print(f"  Kết quả cho '{original_word}': {processed_results_dict[original_word]}")
+        # Bỏ từ nhập trùng (không phân biệt hoa thường) trước khi tra
+        unique_words, duplicate_indexes = dedupe_words(words_list)
+        target_list_id = form.target_list_id_on_post.data if form.target_list_id_on_post else None
+        target_list_id = int(target_list_id) if target_list_id and str(target_list_id).isdigit() else None
+
+        if words_list and len(unique_words) >= app.config['ENRICHMENT_ASYNC_THRESHOLD']:
+            # Danh sách dài: đưa vào hàng đợi và trả trang về ngay; trang sẽ hỏi trạng thái qua job_status_route.
+            # Từ đã có trong vocabulary của người dùng được worker lấy từ database (xem run_enrich_words_job).
+            # Số từ dùng lại chỉ biết được khi worker xử lý: được cộng dồn vào thống kê của công việc
+            # và trả về trong job_status_route (xem serialize_job_status).
+            job = enqueue_job(JOB_TYPE_ENRICH_WORDS, {'words': unique_words, 'target_list_id': target_list_id},
+                              user_id=current_user_db_id, total=len(unique_words),
+                              summary={'input': len(words_list), 'duplicates': len(duplicate_indexes), 'reused': 0})
+            job_runner.wake()
+            job_id = job.id
+            logger.info("Đã tạo công việc nền %s cho %s từ.", job_id, len(unique_words))
+
+        elif words_list:
+            # Từ đã có được lấy từ database; chỉ từ mới được tra song song qua enrichment_engine.
+            # user_id phải được lấy ở đây (request thread) vì worker thread không có session.
+            enriched_words, reused_count = enrich_new_words(unique_words, current_user_db_id, target_list_id)
+            summary = lookup_summary(len(words_list), len(duplicate_indexes), reused_count)
+
+            # --- TỔNG HỢP KẾT QUẢ CUỐI CÙNG (giữ đúng thứ tự từ người dùng nhập) ---
+            for original_word, word_results in enriched_words:
+                processed_results_dict[original_word] = word_results
+                logger.debug("Kết quả cho '%s': %s", original_word, word_results,
+                             extra={"word": original_word, "user_id": current_user_db_id})
+            logger.debug("Bước lọc trước khi tra: %s", summary)
 
         elif input_str:
             flash("Vui lòng nhập từ hợp lệ, cách nhau bằng dấu phẩy.", "info")
@@ -1189,9 +2139,160 @@ def enter_words_page():
                            user_info=display_user_info,
                            input_words_str=form.words_input.data or "",
                            results=processed_results_dict,
+                           job_id=job_id,
+                           lookup_summary=summary,
                            user_existing_lists=user_lists,
                            target_list_info=target_list_info)
 
+
+def format_sse_event(event, data):
+    """Định dạng một Server-Sent Event (data là JSON trên một dòng)."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/enter-words/stream')
+@login_required
+def enter_words_stream_route():
+    """
+    Server-Sent Events: gửi thẻ từ vựng của từng từ ngay khi từ đó xong (thứ tự hoàn thành, kèm `index`
+    là vị trí của từ trong danh sách), cuối cùng là một sự kiện 'summary'. Không dựng HTML phía server.
+    Tham số `words`: các từ cách nhau bằng dấu phẩy, giống ô nhập của GenerateWordsForm.
+    """
+    input_str = request.args.get('words', '')
+    words_list = [word.strip() for word in input_str.split(',') if word.strip()]
+    if not words_list:
+        return jsonify({"success": False, "message": "Vui lòng nhập từ hợp lệ, cách nhau bằng dấu phẩy."}), 400
+
+    current_user_db_id = session.get("db_user_id")  # Lấy trên request thread, generator không đọc session
+    session['last_processed_input'] = input_str
+
+    # Bước lọc: bỏ từ trùng, lấy từ đã có trong vocabulary của người dùng từ database (trên request thread)
+    duplicate_indexes = set(dedupe_words(words_list)[1])
+    positions = {}  # từ (sau khi bỏ trùng) -> vị trí trong words_list
+    for index, word in enumerate(words_list):
+        if index not in duplicate_indexes:
+            positions[word] = index
+    target_list_id = request.args.get('target_list_id', type=int)
+    known = find_known_words(current_user_db_id, list(positions), target_list_id)
+    new_words = [word for word in positions if word not in known]
+
+    def generate():
+        started = time.monotonic()
+        completed = 0
+        # Gửi ngay một comment để proxy/trình duyệt mở kết nối mà không phải chờ từ đầu tiên
+        yield ": stream started\n\n"
+        for original_word, word_results in known.items():
+            completed += 1
+            yield format_sse_event("word", {"index": positions[original_word], "word": original_word,
+                                            "definitions": word_results})
+        for index, original_word, word_results in enrichment_engine.enrich_iter(new_words,
+                                                                                user_id=current_user_db_id):
+            completed += 1
+            yield format_sse_event("word", {"index": positions[original_word], "word": original_word,
+                                            "definitions": word_results})
+        summary = lookup_summary(len(words_list), len(duplicate_indexes), len(known))
+        summary.update({"total": len(words_list), "completed": completed,
+                        "duplicate_indexes": sorted(duplicate_indexes),
+                        "elapsed_ms": int((time.monotonic() - started) * 1000)})
+        yield format_sse_event("summary", summary)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/jobs/<job_id>')
+@login_required
+def job_status_route(job_id):
+    """
+    Trạng thái và kết quả từng phần của một công việc nền (trang enter_words hỏi định kỳ).
+    Tham số `since`: chỉ trả các kết quả từ vị trí này trở đi (trình duyệt đã có các kết quả trước đó).
+    """
+    job = BackgroundJob.query.filter_by(id=job_id, user_id=session.get("db_user_id")).first()
+    if not job:
+        return jsonify({"success": False, "message": "Không tìm thấy công việc."}), 404
+    return jsonify(dict(serialize_job_status(job, since=request.args.get('since', 0, type=int)), success=True))
+
+
+@app.route('/import-words', methods=['GET', 'POST'])
+@login_required
+def import_words_page():
+    """
+    Nhập nhiều từ vựng từ file CSV/TSV vào một danh sách (mới hoặc có sẵn).
+    File được lưu xuống đĩa rồi xử lý bằng công việc nền 'import_words'; trang hiển thị tiến độ qua job_status_route.
+    Cột hỗ trợ (dòng tiêu đề): word, word_type, definition_en, definition_vi, ipa, examples, examples_vi
+    (xem HEADER_ALIASES trong word_import.py).
+    """
+    current_user_db_id = session.get("db_user_id")
+    log_user_activity(current_user_db_id, 'accessed_import_words_page')
+    form = ImportWordsForm()
+    user_lists = VocabularyList.query.filter_by(user_id=current_user_db_id).order_by(VocabularyList.name.asc()).all()
+    form.existing_list_id.choices = [(0, '-- Create a new list --')] + [(l.id, l.name) for l in user_lists]
+    if request.method == 'GET' and request.args.get('list_id', type=int):
+        form.existing_list_id.data = request.args.get('list_id', type=int)
+
+    job_id = request.args.get('job_id')
+    if form.validate_on_submit():
+        # 1. Kiểm tra danh sách đích (danh sách mới chỉ được tạo sau khi file hợp lệ)
+        list_name = None
+        if form.existing_list_id.data:
+            target_list = VocabularyList.query.filter_by(id=form.existing_list_id.data,
+                                                         user_id=current_user_db_id).first()
+            if not target_list:
+                flash("The selected list was not found or you do not have permission.", "warning")
+                return redirect(url_for('import_words_page'))
+        else:
+            list_name = (form.new_list_name.data or '').strip()
+            if not list_name:
+                flash("Please enter a name for the new list.", "warning")
+                return render_template('import_words.html', form=form, user_info=get_current_user_info(),
+                                       job_id=None)
+            if VocabularyList.query.filter_by(user_id=current_user_db_id, name=list_name).first():
+                flash(f"You already have a list named '{list_name}'. Please choose another name.", "warning")
+                return render_template('import_words.html', form=form, user_info=get_current_user_info(),
+                                       job_id=None)
+
+        # 2. Lưu file upload xuống đĩa (theo từng khối, không đọc cả file vào bộ nhớ), kiểm tra và đếm số dòng
+        upload = form.words_file.data
+        os.makedirs(app.config['IMPORT_UPLOAD_DIR'], exist_ok=True)
+        upload_path = os.path.join(app.config['IMPORT_UPLOAD_DIR'], f"{uuid.uuid4().hex}.upload")
+        upload.save(upload_path)
+        try:
+            delimiter = detect_delimiter(upload_path, upload.filename)
+            total_rows = count_import_rows(upload_path, delimiter)
+        except (OSError, UnicodeError, csv.Error) as e:
+            # csv.Error: file hỏng, ví dụ dấu nháy không đóng làm một ô dài quá giới hạn của module csv
+            os.remove(upload_path)
+            logger.warning("Lỗi khi đọc file nhập '%s': %s", upload.filename, e,
+                           extra={"user_id": current_user_db_id})
+            flash("Could not read the uploaded file. Please upload a valid UTF-8 CSV or TSV file.", "danger")
+            return redirect(url_for('import_words_page'))
+
+        if list_name is not None:
+            target_list = VocabularyList(name=list_name, user_id=current_user_db_id)
+            db.session.add(target_list)
+            db.session.commit()
+
+        # 3. Đưa vào hàng đợi
+        job = enqueue_job(JOB_TYPE_IMPORT_WORDS,
+                          {'path': upload_path, 'filename': upload.filename, 'delimiter': delimiter,
+                           'list_id': target_list.id},
+                          user_id=current_user_db_id, total=total_rows)
+        job_runner.wake()
+        logger.info("Đã tạo công việc nhập %s: %s dòng từ '%s' vào list %s.",
+                    job.id, total_rows, upload.filename, target_list.id)
+        return redirect(url_for('import_words_page', job_id=job.id))
+
+    job_info = None
+    if job_id:
+        job = BackgroundJob.query.filter_by(id=job_id, user_id=current_user_db_id,
+                                            job_type=JOB_TYPE_IMPORT_WORDS).first()
+        if job:
+            payload = json.loads(job.payload)
+            job_info = {"id": job.id, "filename": payload.get('filename'), "list_id": payload.get('list_id')}
+
+    return render_template('import_words.html', form=form, user_info=get_current_user_info(),
+                           job_id=job_info['id'] if job_info else None, job_info=job_info)
+
 # --- Sửa đổi hàm save_list_route ---
 @app.route('/save-list', methods=['POST'])
 # @login_required
@@ -1201,22 +2302,43 @@ def save_list_route():
         log_user_activity(current_user_db_id, 'words_saved',
                           details={'list_id': request.get_json().get('existing_list_id') or 'new'})
     if not current_user_db_id:
-        print("DEBUG: User not logged in for save_list_route.")  # DEBUG
+        logger.debug("User not logged in for save_list_route.")
         return jsonify({"success": False, "message": "Vui lòng đăng nhập để lưu danh sách."}), 401
 
     data = request.get_json()
     if not data:
-        print("DEBUG: No JSON data received in save_list_route.")  # DEBUG
+        logger.debug("No JSON data received in save_list_route.")
         return jsonify({"success": False, "message": "Không nhận được dữ liệu."}), 400
 
-    print(f"DEBUG: Data received by save_list_route: {data}")  # DEBUG: In toàn bộ payload
+    logger.debug("Data received by save_list_route: %s", data)  # In toàn bộ payload
 
     vocabulary_items_data = data.get('words')
     list_name_from_input = data.get('list_name')
     existing_list_id = data.get('existing_list_id')
+    job_id = data.get('job_id')
+
+    if job_id:
+        # Kết quả của công việc nền được lấy thẳng từ database, không tra lại từ nào.
+        job = BackgroundJob.query.filter_by(id=job_id, user_id=current_user_db_id).first()
+        if not job:
+            return jsonify({"success": False, "message": "Không tìm thấy công việc."}), 404
+        if job.status != JOB_STATUS_DONE:
+            return jsonify({"success": False, "message": "Công việc chưa hoàn tất, vui lòng chờ."}), 409
+        vocabulary_items_data = [
+            {
+                'original_word': original_word,
+                'word_type': word_results[0].get('type'),
+                'definition_en': word_results[0].get('definition_en'),
+                'definition_vi': word_results[0].get('definition_vi'),
+                'ipa': word_results[0].get('ipa'),
+                'example_en': word_results[0].get('example_sentence'),
+                'example_sentence_vi': word_results[0].get('example_sentence_vi')
+            }
+            for original_word, word_results in load_job_items(job) if word_results
+        ]
 
     if not vocabulary_items_data or not isinstance(vocabulary_items_data, list) or len(vocabulary_items_data) == 0:
-        print("DEBUG: No vocabulary items to save.")  # DEBUG
+        logger.debug("No vocabulary items to save.")
         return jsonify({"success": False, "message": "Không có từ vựng nào để lưu."}), 400
 
     target_list = None
@@ -1225,8 +2347,8 @@ def save_list_route():
     if existing_list_id:
         target_list = VocabularyList.query.filter_by(id=existing_list_id, user_id=current_user_db_id).first()
         if not target_list:
-            print(
-                f"DEBUG: Existing list ID {existing_list_id} not found or not owned by user {current_user_db_id}.")  # DEBUG
+            logger.debug("Existing list ID %s not found or not owned by user %s.",
+                         existing_list_id, current_user_db_id)
             return jsonify(
                 {"success": False, "message": "Không tìm thấy danh sách hiện có hoặc bạn không có quyền."}), 403
     elif list_name_from_input and list_name_from_input.strip():
@@ -1234,24 +2356,40 @@ def save_list_route():
         existing_list_with_same_name = VocabularyList.query.filter_by(user_id=current_user_db_id,
                                                                       name=cleaned_list_name).first()
         if existing_list_with_same_name:
-            print(f"DEBUG: List name '{cleaned_list_name}' already exists for user {current_user_db_id}.")  # DEBUG
+            logger.debug("List name '%s' already exists for user %s.", cleaned_list_name, current_user_db_id)
             return jsonify({"success": False,
                             "message": f"Bạn đã có một danh sách với tên '{cleaned_list_name}'. Vui lòng chọn tên khác."}), 400
 
         target_list = VocabularyList(name=cleaned_list_name, user_id=current_user_db_id)
         db.session.add(target_list)
         is_new_list = True
-        print(f"DEBUG: Creating new list: {cleaned_list_name} for user {current_user_db_id}.")  # DEBUG
+        logger.info("Creating new list: %s for user %s.", cleaned_list_name, current_user_db_id)
     else:
-        print("DEBUG: Invalid list name or no existing list ID provided.")  # DEBUG
+        logger.debug("Invalid list name or no existing list ID provided.")
         return jsonify({"success": False,
                         "message": "Vui lòng cung cấp tên cho danh sách mới hoặc chọn một danh sách hiện có."}), 400
 
+    skipped_count = 0
+    if existing_list_id:
+        # Không thêm lại từ đã có trong danh sách đích (một truy vấn cho cả danh sách từ)
+        item_keys = {known_word_key(item.get('original_word') or '') for item in vocabulary_items_data}
+        already_in_list = {
+            row.word_key for row in
+            db.session.query(VocabularyEntry.word_key).filter(
+                VocabularyEntry.user_id == current_user_db_id,
+                VocabularyEntry.list_id == target_list.id,
+                VocabularyEntry.word_key.in_(list(item_keys))).all()
+        }
+        remaining_items = [item for item in vocabulary_items_data
+                           if known_word_key(item.get('original_word') or '') not in already_in_list]
+        skipped_count = len(vocabulary_items_data) - len(remaining_items)
+        vocabulary_items_data = remaining_items
+
     try:
         for item_data in vocabulary_items_data:
-            print(f"DEBUG: Processing item_data for word: {item_data.get('original_word')}")  # DEBUG
-            print(
-                f"DEBUG: example_sentence_vi from item_data: {item_data.get('example_sentence_vi')}")  # DEBUG: RẤT QUAN TRỌNG
+            logger.debug("Processing item_data for word: %s (example_sentence_vi: %s)",
+                         item_data.get('original_word'), item_data.get('example_sentence_vi'),
+                         extra={"word": item_data.get('original_word'), "user_id": current_user_db_id})
 
             new_entry = VocabularyEntry(
                 original_word=item_data.get('original_word'),
@@ -1265,26 +2403,29 @@ def save_list_route():
                 vocabulary_list=target_list
             )
             db.session.add(new_entry)
-            print(
-                f"DEBUG: Added new_entry for '{new_entry.original_word}' with example_vi='{new_entry.example_vi}'.")  # DEBUG
+            logger.debug("Added new_entry for '%s' with example_vi='%s'.",
+                         new_entry.original_word, new_entry.example_vi,
+                         extra={"word": new_entry.original_word, "user_id": current_user_db_id})
 
         db.session.commit()
-        print("DEBUG: Database commit successful.")  # DEBUG
+        logger.debug("Database commit successful.")
 
         action_message = f"Đã thêm từ vào danh sách '{target_list.name}'." if existing_list_id else f"Đã tạo và lưu danh sách '{target_list.name}'."
+        if skipped_count:
+            action_message += f" Bỏ qua {skipped_count} từ đã có trong danh sách."
 
         return jsonify({
             "success": True,
             "message": action_message,
             "list_id": target_list.id,
-            "is_new_list": is_new_list
+            "is_new_list": is_new_list,
+            "skipped_existing": skipped_count
         })
 
     except Exception as e:
         db.session.rollback()
-        print(f"ERROR: Exception during saving list/words for user {current_user_db_id}: {e}")  # DEBUG Lỗi chi tiết
-        import traceback
-        traceback.print_exc()  # DEBUG: In đầy đủ traceback trên server console
+        logger.exception("Exception during saving list/words for user %s: %s", current_user_db_id, e,
+                         extra={"user_id": current_user_db_id})  # Lỗi chi tiết kèm traceback
 
         if "UNIQUE constraint failed" in str(e):
             return jsonify(
@@ -1324,7 +2465,7 @@ def my_lists_page():
         VocabularyList.created_at.desc()).all()
 
     # In ra thông báo debug ở server để theo dõi (tùy chọn)
-    print(f"Đang hiển thị {len(user_lists)} danh sách cho user_id {current_user_db_id}")
+    logger.debug("Đang hiển thị %d danh sách cho user_id %s", len(user_lists), current_user_db_id)
 
     # 4. Render template 'my_lists.html' và truyền các dữ liệu cần thiết vào:
     #    - user_info: Thông tin của người dùng đang đăng nhập (cho base.html và các phần chung).
@@ -1376,10 +2517,10 @@ def list_detail_page(list_id):
         VocabularyEntry.added_at.asc()).all()
 
     # In ra thông tin debug ở server (tùy chọn)
-    print(
-        f"Hiển thị chi tiết list '{vocab_list.name}' (ID: {vocab_list.id}) cho user {current_user_db_id} với {len(entries_in_list)} từ.")
+    logger.debug("Hiển thị chi tiết list '%s' (ID: %s) cho user %s với %d từ.",
+                 vocab_list.name, vocab_list.id, current_user_db_id, len(entries_in_list))
     if entries_in_list:
-        print(f"Entry đầu tiên trong list: {entries_in_list[0].original_word}")
+        logger.debug("Entry đầu tiên trong list: %s", entries_in_list[0].original_word)
 
     # 6. Render template 'list_detail.html' và truyền các dữ liệu cần thiết vào:
     #    - user_info: Thông tin của người dùng đang đăng nhập (cho base.html).
@@ -1448,7 +2589,7 @@ def delete_list_route(list_id):
         # Hiển thị thông báo thành công cho người dùng.
         flash(f"Successfully deleted list '{deleted_list_name}'.", "success")
         # Ghi log ở server (tùy chọn)
-        print(f"User {current_user_db_id} đã xóa list ID {list_id} ('{deleted_list_name}')")
+        logger.info("User %s đã xóa list ID %s ('%s')", current_user_db_id, list_id, deleted_list_name)
 
     except Exception as e:
         # 6. Nếu có bất kỳ lỗi nào xảy ra trong quá trình tương tác với database,
@@ -1457,7 +2598,7 @@ def delete_list_route(list_id):
         # Hiển thị thông báo lỗi cho người dùng.
         flash(f"An error occurred while deleting the list: {str(e)}", "danger")
         # Ghi log lỗi chi tiết ở server.
-        print(f"Lỗi khi user {current_user_db_id} xóa list ID {list_id}: {e}")
+        logger.error("Lỗi khi user %s xóa list ID %s: %s", current_user_db_id, list_id, e)
 
     # 7. Sau khi xóa (hoặc nếu có lỗi và đã flash thông báo),
     #    chuyển hướng người dùng trở lại trang danh sách của họ.
@@ -1526,15 +2667,15 @@ def rename_list_route(list_id):
         # Tuy nhiên, với AJAX, client thường tự cập nhật UI hoặc hiển thị thông báo.
         # flash(f"Đã đổi tên danh sách (ID: {list_id}) thành '{new_name}'.", "success_admin")
 
-        print(
-            f"Admin (ID: {admin_user_id}) đã đổi tên list ID {list_id} thành '{new_name}' cho user ID {owner_user_id}")  # Debug
+        logger.info("Admin (ID: %s) đã đổi tên list ID %s thành '%s' cho user ID %s",
+                    admin_user_id, list_id, new_name, owner_user_id)
 
         # 6. Trả về JSON báo thành công.
         return jsonify({"success": True, "message": "Đổi tên danh sách thành công!", "new_name": new_name})
 
     except Exception as e:
         db.session.rollback()  # Hoàn tác nếu có lỗi khi commit.
-        print(f"Lỗi khi Admin (ID: {admin_user_id}) đổi tên list ID {list_id}: {e}")  # Log lỗi chi tiết.
+        logger.error("Lỗi khi Admin (ID: %s) đổi tên list ID %s: %s", admin_user_id, list_id, e)  # Log lỗi chi tiết.
         return jsonify({"success": False, "message": f"Lỗi server khi đổi tên danh sách: {str(e)}"}), 500
 
 
@@ -1559,7 +2700,7 @@ def admin_delete_vocab_entry_route(entry_id):
     parent_list_owner_id = entry_to_delete.vocabulary_list.user_id
     entry_original_word = entry_to_delete.original_word  # <<< LẤY GIÁ TRỊ TẠI ĐÂY
 
-    print(f"DEBUG: Found entry '{entry_original_word}' (ID: {entry_id}) for deletion.")
+    logger.debug("Found entry '%s' (ID: %s) for deletion.", entry_original_word, entry_id)
 
     try:
         db.session.delete(entry_to_delete)
@@ -1567,10 +2708,8 @@ def admin_delete_vocab_entry_route(entry_id):
 
         flash(f"Đã xóa thành công mục từ '{entry_original_word}' khỏi danh sách.", "success")
         admin_email_for_log = admin_user_info.get('email') if admin_user_info else "Unknown Admin"
-        print(
-            f"Admin ({admin_email_for_log}) đã xóa entry ID {entry_id} ('{entry_original_word}') "
-            f"khỏi list ID {parent_list_id} của user ID {parent_list_owner_id}"
-        )
+        logger.info("Admin (%s) đã xóa entry ID %s ('%s') khỏi list ID %s của user ID %s",
+                    admin_email_for_log, entry_id, entry_original_word, parent_list_id, parent_list_owner_id)
 
         # Với AJAX, trả về JSON response
         return jsonify({
@@ -1583,9 +2722,7 @@ def admin_delete_vocab_entry_route(entry_id):
     except Exception as e:
         db.session.rollback()
         admin_email_for_log = admin_user_info.get('email') if admin_user_info else "Unknown Admin"
-        print(f"ERROR: Admin ({admin_email_for_log}) xóa entry ID {entry_id} failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Admin (%s) xóa entry ID %s failed: %s", admin_email_for_log, entry_id, e)
 
         # Với AJAX, trả về JSON lỗi
         return jsonify({"success": False, "message": f"Server error when deleting entry: {str(e)}"}), 500
@@ -1614,6 +2751,19 @@ class GenerateWordsForm(FlaskForm):
     submit = SubmitField('Generate')  # Nhãn của nút submit
 
 
+class ImportWordsForm(FlaskForm):
+    """Form upload file CSV/TSV để nhập nhiều từ vựng vào một danh sách."""
+
+    words_file = FileField('Word file (.csv or .tsv):', validators=[
+        FileRequired(message="Vui lòng chọn file để nhập."),
+        FileAllowed(['csv', 'tsv', 'tab', 'txt'], message="Chỉ hỗ trợ file .csv, .tsv hoặc .txt.")
+    ])
+    # 0 = tạo danh sách mới với tên ở new_list_name; các lựa chọn khác được gán trong route
+    existing_list_id = SelectField('Add to list:', coerce=int, default=0)
+    new_list_name = StringField('New list name:', validators=[Length(max=150)])
+    submit = SubmitField('Import')
+
+
 def calculate_time_difference(start_date):
     """
     Tính toán khoảng thời gian từ một ngày bắt đầu (start_date) đến hiện tại
@@ -1736,14 +2886,14 @@ def profile_page():
                         session['user_info']['has_password'] = True
                         session.modified = True  # Đánh dấu session đã thay đổi để Flask lưu lại
 
-                    print(f"User {user.email} đã cập nhật/đặt mật khẩu.")  # Debug log
+                    logger.info("User %s đã cập nhật/đặt mật khẩu.", user.email)
                     # Trả về JSON báo thành công cho client AJAX
                     # JavaScript sẽ nhận được và có thể đóng modal, reload trang (để flash message hiển thị)
                     return jsonify({"success": True, "message": "Đã cập nhật/đặt mật khẩu thành công!"})
                 except Exception as e:  # Bắt lỗi nếu có vấn đề khi commit vào DB
                     db.session.rollback()  # Hoàn tác thay đổi
                     error_message = f"Có lỗi xảy ra khi cập nhật mật khẩu: {str(e)}"
-                    print(f"Lỗi khi user {user.email} cập nhật mật khẩu: {e}")  # Log lỗi chi tiết
+                    logger.error("Lỗi khi user %s cập nhật mật khẩu: %s", user.email, e)  # Log lỗi chi tiết
 
         # 3c. Nếu có bất kỳ lỗi validation nào trong quá trình xử lý POST từ AJAX
         if error_message:
@@ -1817,10 +2967,10 @@ def admin_view_user_detail(user_id_to_view):
         VocabularyList.created_at.desc()).all()
 
     # In ra thông báo debug ở server để theo dõi (tùy chọn)
-    print(
-        f"Admin ({admin_user_info.get('email') if admin_user_info else 'Unknown Admin'}) "
-        f"đang xem chi tiết user '{user_to_view.email}' (ID: {user_id_to_view}) "
-        f"với {len(user_vocabulary_lists)} danh sách."
+    logger.debug(
+        "Admin (%s) đang xem chi tiết user '%s' (ID: %s) với %d danh sách.",
+        admin_user_info.get('email') if admin_user_info else 'Unknown Admin', user_to_view.email, user_id_to_view,
+        len(user_vocabulary_lists)
     )
 
     # 4. Render template 'admin/user_detail.html' và truyền các dữ liệu cần thiết vào:
@@ -1888,7 +3038,8 @@ def admin_delete_user_route(user_id_to_delete):
         # Hiển thị thông báo thành công cho Admin.
         flash(f"Successfully deleted user '{user_email_deleted}' and all related data.", "success")
         # Ghi log ở server (tùy chọn).
-        print(f"Admin (ID: {admin_user_id}) đã xóa user ID {user_id_to_delete} ('{user_email_deleted}')")
+        logger.info("Admin (ID: %s) đã xóa user ID %s ('%s')",
+                    admin_user_id, user_id_to_delete, user_email_deleted)
 
     except Exception as e:
         # 7. Nếu có bất kỳ lỗi nào xảy ra trong quá trình tương tác với database,
@@ -1897,7 +3048,7 @@ def admin_delete_user_route(user_id_to_delete):
         # Hiển thị thông báo lỗi cho Admin.
         flash(f"An error occurred while deleting the user: {str(e)}", "danger")
         # Ghi log lỗi chi tiết ở server.
-        print(f"Lỗi khi Admin (ID: {admin_user_id}) xóa user ID {user_id_to_delete}: {e}")
+        logger.error("Lỗi khi Admin (ID: %s) xóa user ID %s: %s", admin_user_id, user_id_to_delete, e)
         # Chuyển hướng về trang chi tiết của người dùng đó để Admin biết lỗi xảy ra với ai.
         return redirect(url_for('admin_view_user_detail', user_id_to_view=user_id_to_delete))
         # Hoặc 'admin_bp.view_user_detail'
@@ -1948,7 +3099,8 @@ def admin_toggle_block_user_route(user_id_to_toggle):
         # Hiển thị thông báo thành công.
         flash(f"Successfully {action} user '{user_to_toggle.email}'.", "success")
         # Ghi log ở server (tùy chọn).
-        print(f"Admin (ID: {admin_user_id}) đã {action} user ID {user_id_to_toggle} ('{user_to_toggle.email}')")
+        logger.info("Admin (ID: %s) đã %s user ID %s ('%s')",
+                    admin_user_id, action, user_id_to_toggle, user_to_toggle.email)
 
     except Exception as e:
         # 6. Nếu có lỗi xảy ra trong quá trình tương tác với database, hoàn tác lại.
@@ -1956,7 +3108,7 @@ def admin_toggle_block_user_route(user_id_to_toggle):
         # Hiển thị thông báo lỗi.
         flash(f"An error occurred while changing user status: {str(e)}", "danger")
         # Ghi log lỗi chi tiết ở server.
-        print(f"Lỗi khi Admin (ID: {admin_user_id}) toggle block user ID {user_id_to_toggle}: {e}")
+        logger.error("Lỗi khi Admin (ID: %s) toggle block user ID %s: %s", admin_user_id, user_id_to_toggle, e)
 
         # 7. Chuyển hướng người dùng trở lại trang phù hợp.
     #    Nếu request đến từ trang chi tiết của người dùng đó, quay lại trang đó.
@@ -2015,19 +3167,19 @@ def admin_view_list_entries_page(owner_user_id, list_id):
     entries_in_list = VocabularyEntry.query.filter_by(list_id=vocab_list.id).order_by(
         VocabularyEntry.added_at.asc()).all()
 
-    print(f"DEBUG: Preparing to render admin_list_entries.html for list ID: {list_id}")
-    print(f"DEBUG: Number of entries: {len(entries_in_list)}")
+    logger.debug("Preparing to render admin_list_entries.html for list ID %s with %d entries",
+                 list_id, len(entries_in_list))
 
     # THÊM VÒNG LẶP KIỂM TRA CHI TIẾT TRƯỚC KHI RENDER
     for i, entry in enumerate(entries_in_list):
         if entry is None:
-            print(f"CRITICAL ERROR DEBUG: Entry at index {i} is None in entries_in_list!")
+            logger.error("Entry at index %s is None in entries_in_list!", i)
         else:
-            print(
-                f"DEBUG: Entry {i}: ID={entry.id}, Type ID={type(entry.id).__name__}, Word='{entry.original_word}', Has_ID_Value={entry.id is not None}")
+            logger.debug("Entry %d: ID=%s, Type ID=%s, Word='%s'", i, entry.id, type(entry.id).__name__,
+                         entry.original_word)
             if not isinstance(entry.id, int):
-                print(
-                    f"CRITICAL ERROR DEBUG: Entry {i} has NON-INTEGER ID: Value='{entry.id}', Type='{type(entry.id).__name__}'")
+                logger.error(
+                    "Entry %d has NON-INTEGER ID: Value='%s', Type='%s'", i, entry.id, type(entry.id).__name__)
 
     # 5. Render template
     return render_template('admin/admin_list_entries.html',
@@ -2111,7 +3263,7 @@ def google_complete_setup_page():
             except Exception as e:
                 db.session.rollback()
                 flash(f"An error occurred while setting up the account: {str(e)}", "danger")
-                print(f"Error during Google setup for {email}: {e}")
+                logger.error("Error during Google setup for %s: %s", email, e)
 
     # 4. Xử lý GET request (hiển thị form)
     # Truyền thông tin người dùng từ Google (tạm thời) để hiển thị trên form
@@ -2139,10 +3291,10 @@ def log_user_activity(user_id, activity_type, details=None):
         try:
             db.session.add(activity)
             db.session.commit()
-            print(f"Logged activity for user {user_id}: {activity_type}")
+            logger.debug("Logged activity for user %s: %s", user_id, activity_type)
         except Exception as e:
             db.session.rollback()
-            print(f"Error logging activity for user {user_id}: {activity_type} - {e}")
+            logger.error("Error logging activity for user %s: %s - %s", user_id, activity_type, e)
 
 
 @app.route('/admin/entry/<int:entry_id>/edit', methods=['POST'])
@@ -2180,6 +3332,10 @@ def admin_edit_vocab_entry_route(entry_id):
         #    Từ gốc (original_word) thường không nên cho phép sửa đổi ở đây để tránh nhầm lẫn,
         #    nếu muốn sửa từ gốc, có thể coi như tạo một entry mới và xóa entry cũ.
 
+        # Ghi nhớ định nghĩa/bản dịch cũ để biết Admin có sửa chúng hay không
+        previous_definition_en = entry_to_edit.definition_en
+        previous_definition_vi = entry_to_edit.definition_vi
+
         entry_to_edit.word_type = data.get('word_type', entry_to_edit.word_type)
         entry_to_edit.definition_en = data.get('definition_en', entry_to_edit.definition_en)
         entry_to_edit.definition_vi = data.get('definition_vi', entry_to_edit.definition_vi)
@@ -2195,13 +3351,28 @@ def admin_edit_vocab_entry_route(entry_id):
         # 6. Lưu các thay đổi vào database.
         db.session.commit()
 
+        # 6b. Nếu Admin đã sửa định nghĩa/bản dịch, bản dịch máy cũ trong bộ nhớ dịch không còn đáng tin.
+        #     Bản dịch của định nghĩa cũ bị vô hiệu hóa; định nghĩa mới được ghi bản dịch Admin vừa sửa,
+        #     để lần tra sau dùng bản này thay vì dịch lại và lưu lại đúng bản dịch máy sai.
+        definition_en_changed = entry_to_edit.definition_en != previous_definition_en
+        if definition_en_changed and previous_definition_en:
+            translation_memo.invalidate_text(previous_definition_en, target_lang='vi')
+        if definition_en_changed or entry_to_edit.definition_vi != previous_definition_vi:
+            memo_text = text_to_translate_for(entry_to_edit.original_word, entry_to_edit.definition_en or "")
+            if memo_text:
+                if entry_to_edit.definition_vi and entry_to_edit.definition_vi != DEFAULT_DEFINITION_VI:
+                    translation_memo.override_translation(memo_text, 'vi', entry_to_edit.definition_vi)
+                else:
+                    translation_memo.invalidate_text(memo_text, target_lang='vi')
+
         # 7. (Tùy chọn) Gửi một thông báo flash. Thông báo này sẽ hiển thị cho Admin
         #    khi trang được tải lại (ví dụ, sau khi JavaScript nhận response thành công và reload trang).
         flash(f"Entry '{entry_to_edit.original_word}' successfully updated.", "success")
 
         # Ghi log ở server (tùy chọn).
         admin_email_for_log = admin_user_info.get('email') if admin_user_info else "Unknown Admin"
-        print(f"Admin ({admin_email_for_log}) đã sửa entry ID {entry_id} ('{entry_to_edit.original_word}')")
+        logger.info("Admin (%s) đã sửa entry ID %s ('%s')",
+                    admin_email_for_log, entry_id, entry_to_edit.original_word)
 
         # 8. Trả về JSON báo thành công cho client AJAX.
         return jsonify({"success": True, "message": "Cập nhật mục từ thành công!"})
@@ -2212,48 +3383,90 @@ def admin_edit_vocab_entry_route(entry_id):
         db.session.rollback()
         # Ghi log lỗi chi tiết ở server.
         admin_email_for_log = admin_user_info.get('email') if admin_user_info else "Unknown Admin"
-        print(f"Lỗi khi Admin ({admin_email_for_log}) sửa entry ID {entry_id}: {e}")
+        logger.error("Lỗi khi Admin (%s) sửa entry ID %s: %s", admin_email_for_log, entry_id, e)
         # Trả về JSON báo lỗi server.
         return jsonify({"success": False, "message": f"Lỗi server khi cập nhật mục từ: {str(e)}"}), 500
 
 
-@app.route('/admin/api-logs')
+@app.route('/admin/translation-memo/invalidate', methods=['POST'])
 @admin_required
-def admin_api_logs_page():
-    admin_user_info = get_current_user_info()
+def admin_invalidate_translation_memo_route():
+    """
+    Cho phép Admin vô hiệu hóa bản dịch đã lưu trong bộ nhớ dịch của một đoạn văn bản
+    (ví dụ: một định nghĩa bị máy dịch sai). Yêu cầu gửi qua AJAX với JSON {"text": "...", "target_lang": "vi"}.
+    """
+    data = request.get_json(silent=True)
+    if not data or not (data.get('text') or '').strip():
+        return jsonify({"success": False, "message": "Văn bản cần vô hiệu hóa không được cung cấp."}), 400
 
-    # --- PHÂN TRANG (PAGINATION) ---
-    page = request.args.get('page', 1, type=int)  # Lấy số trang từ URL (mặc định là 1)
-    per_page = 10  # Số lượng log trên mỗi trang (bạn có thể thay đổi, ví dụ 20, 50, 100)
-
-    # Lấy các bản ghi log API từ database với phân trang
-    # paginate() trả về một đối tượng Pagination
-    # .options(db.load_only(APILog.id, APILog.api_name, ...)) # Tùy chọn: chỉ tải các cột cần thiết để tối ưu
-    pagination = APILog.query.order_by(APILog.timestamp.desc()).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False  # Nếu page number không hợp lệ, không báo lỗi 404
-    )
+    deleted_rows = translation_memo.invalidate_text(data['text'], target_lang=data.get('target_lang'))
+    logger.info("Admin (ID: %s) đã vô hiệu hóa %s bản dịch trong bộ nhớ dịch",
+                session.get('db_user_id'), deleted_rows)
+    return jsonify({"success": True, "message": "Đã vô hiệu hóa bản dịch đã lưu.", "deleted": deleted_rows})
 
-    logs = pagination.items  # Lấy danh sách các log cho trang hiện tại
 
-    # --- THỐNG KÊ TỔNG QUAN (GIỮ NGUYÊN) ---
-    total_calls = APILog.query.count()
-    successful_calls = APILog.query.filter_by(success=True).count()
-    failed_calls = total_calls - successful_calls
+@app.route('/admin/api-logs')
+@admin_required
+def admin_api_logs_page():
+    admin_user_info = get_current_user_info()
 
-    calls_by_api_name = db.session.query(
-        APILog.api_name,
-        func.count(APILog.id).label('count'),
-        func.sum(case((APILog.success == True, 1), else_=0)).label('successful'),
-        func.sum(case((APILog.success == False, 1), else_=0)).label('failed')
-    ).group_by(APILog.api_name).all()
+    api_log_sink.flush(timeout=2)  # Ghi các log đang chờ của tiến trình này để trang hiển thị số liệu mới nhất
+
+    # --- BỘ LỌC VÀ PHÂN TRANG KEYSET (con trỏ (timestamp, id), không OFFSET, không COUNT(*) cả bảng) ---
+    filters, filter_errors = parse_api_log_filters(request.args)
+    for filter_error in filter_errors:
+        flash(filter_error, "warning")
+    log_page = fetch_api_log_page(filters, after=request.args.get('after'), before=request.args.get('before'))
+    logs = log_page['logs']
+    matching_count = count_api_logs(filters, call_count_rollup)
+
+    # --- THỐNG KÊ TỔNG QUAN (đọc từ bảng api_call_rollup, không đếm lại bảng api_log) ---
+    calls_by_api_name = call_count_rollup.totals()
+    total_calls = sum(row.count for row in calls_by_api_name)
+    successful_calls = sum(row.successful for row in calls_by_api_name)
+    failed_calls = sum(row.failed for row in calls_by_api_name)
+    # 24 giờ gần nhất, từ các dòng theo giờ
+    recent_calls_by_api_name = call_count_rollup.totals(
+        granularity=CALL_ROLLUP_HOUR, since=datetime.utcnow() - timedelta(hours=24))
+
+    # --- ĐỘ TRỄ THEO UPSTREAM (p50/p95/p99 từ bảng api_latency_rollup, không quét api_log) ---
+    latency_window = request.args.get('window', DEFAULT_LATENCY_WINDOW)
+    if latency_window not in LATENCY_WINDOWS:
+        latency_window = DEFAULT_LATENCY_WINDOW
+
+    # --- THỐNG KÊ CACHE (hit/miss), đặt cạnh thống kê APILog ---
+    cache_stats.flush()  # Ghi các bộ đếm đang chờ để số liệu hiển thị là mới nhất
+    cache_stat_rows = CacheStat.query.order_by(CacheStat.cache_name.asc()).all()
+
+    # --- THỐNG KÊ POOL KẾT NỐI HTTP (của tiến trình worker hiện tại) ---
+    http_client_stats = [client.stats() for client in upstream_clients.values()]
+    single_flight_stats = single_flight.stats()
+    breaker_stats = [dict(translator_breaker.stats(), name=translator_breaker.name)]  # Upstream không đi qua HTTP client
+    negative_cache_stats = negative_cache.stats() if app.config['NEGATIVE_CACHE_ENABLED'] else None
+    hedge_stats = None
+    if app.config['TRANSLATION_HEDGE_ENABLED']:
+        hedge_stats = translation_hedger.stats()
+        # Số lời gọi đã ghi theo vai trò hedge (toàn bộ log, mọi tiến trình; từ bảng api_call_rollup)
+        hedge_stats['logged_calls'] = call_count_rollup.totals(by_hedge_role=True)
 
     stats = {
         "total_calls": total_calls,
         "successful_calls": successful_calls,
         "failed_calls": failed_calls,
-        "calls_by_api_name": calls_by_api_name
+        "calls_by_api_name": calls_by_api_name,
+        "recent_calls_by_api_name": recent_calls_by_api_name,
+        "cache_stats": cache_stat_rows,
+        "http_client_stats": http_client_stats,
+        "single_flight_stats": single_flight_stats,
+        "breaker_stats": breaker_stats,
+        "negative_cache_stats": negative_cache_stats,
+        "hedge_stats": hedge_stats,
+        "log_sink_stats": api_log_sink.stats(),
+        "app_logging_stats": app_logging.stats(),
+        "latency_window": latency_window,
+        "latency_windows": list(LATENCY_WINDOWS),
+        "latency_by_api": latency_rollup.percentiles(LATENCY_WINDOWS[latency_window]),
+        "latency_bucket_bounds": LATENCY_BUCKET_BOUNDS_MS
     }
 
     # --- TRUYỀN DỮ LIỆU VÀO TEMPLATE ---
@@ -2261,7 +3474,41 @@ def admin_api_logs_page():
                            user_info=admin_user_info,
                            logs=logs,
                            stats=stats,
-                           pagination=pagination)  # TRUYỀN ĐỐI TƯỢNG PHÂN TRANG MỚI VÀO
+                           log_page=log_page,
+                           filters=filter_args_for_url(filters),
+                           matching_count=matching_count)
+
+
+@app.route('/admin/export/<source>')
+@admin_required
+def admin_export_logs_route(source):
+    """
+    Export api_log ('api-logs') hoặc user_activity ('user-activity') dạng NDJSON hoặc CSV (?format=ndjson|csv),
+    có thể nén gzip (?gzip=1). Dùng cùng bộ lọc với trang duyệt API log (user_activity: user_id, activity_type,
+    since, until). Dữ liệu được đọc và gửi theo từng đoạn, nên bộ nhớ không phụ thuộc số dòng export.
+    """
+    if source not in EXPORT_SOURCES:
+        return jsonify({"success": False, "message": "Unknown export source."}), 404
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"success": False, "message": "Format must be 'ndjson' or 'csv'."}), 400
+    use_gzip = request.args.get('gzip') in ('1', 'true', 'yes')
+
+    model, parse_filters, build_conditions = EXPORT_SOURCES[source]
+    filters, filter_errors = parse_filters(request.args)
+    if filter_errors:
+        return jsonify({"success": False, "message": " ".join(filter_errors)}), 400
+
+    if model is APILog:
+        api_log_sink.flush(timeout=2)  # Gồm cả các log đang chờ ghi của tiến trình này
+
+    filename = f"{model.__tablename__}-{datetime.utcnow():%Y%m%dT%H%M%S}.{export_format}" + (".gz" if use_gzip else "")
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"', 'X-Accel-Buffering': 'no'}
+    mimetype = 'application/gzip' if use_gzip else EXPORT_FORMATS[export_format]
+    logger.info("Admin (ID: %s) export %s (%s, gzip=%s) với bộ lọc %s",
+                session.get('db_user_id'), source, export_format, use_gzip, filters)
+    return Response(stream_with_context(export_stream(model, build_conditions(filters), export_format, use_gzip)),
+                    mimetype=mimetype, headers=headers)
 
 
 @app.route('/my-lists/<int:list_id_to_delete>/delete', methods=['POST'])
@@ -2312,9 +3559,8 @@ def delete_my_vocabulary_list(list_id_to_delete):
         # Hiển thị thông báo xóa thành công.
         flash(f"Successfully deleted list '{list_name_deleted}'.", "success")
         # Ghi log ở server (tùy chọn).
-        print(
-            f"User {current_user_db_id} đã xóa list ID {list_id_to_delete} ('{list_name_deleted}') của chính họ."
-        )
+        logger.info("User %s đã xóa list ID %s ('%s') của chính họ.",
+                    current_user_db_id, list_id_to_delete, list_name_deleted)
 
     except Exception as e:
         # 6. Nếu có bất kỳ lỗi nào xảy ra trong quá trình tương tác với database,
@@ -2323,7 +3569,7 @@ def delete_my_vocabulary_list(list_id_to_delete):
         # Hiển thị thông báo lỗi cho người dùng.
         flash(f"An error occurred while deleting the list: {str(e)}", "danger")
         # Ghi log lỗi chi tiết ở server.
-        print(f"Lỗi khi user {current_user_db_id} xóa list ID {list_id_to_delete}: {e}")
+        logger.error("Lỗi khi user %s xóa list ID %s: %s", current_user_db_id, list_id_to_delete, e)
 
     # 7. Sau khi xóa (hoặc nếu có lỗi và đã flash thông báo),
     #    chuyển hướng người dùng trở lại trang "My Lists" của họ.
@@ -2383,9 +3629,8 @@ def delete_my_vocab_entry(entry_id):
         # Hiển thị thông báo xóa thành công.
         flash(f"Successfully removed word '{entry_original_word}' from list.", "success")
         # Ghi log ở server (tùy chọn).
-        print(
-            f"User {current_user_db_id} đã xóa entry ID {entry_id} ('{entry_original_word}') khỏi list ID {parent_list_id}"
-        )
+        logger.info("User %s đã xóa entry ID %s ('%s') khỏi list ID %s",
+                    current_user_db_id, entry_id, entry_original_word, parent_list_id)
 
     except Exception as e:
         # 7. Nếu có bất kỳ lỗi nào xảy ra trong quá trình tương tác với database,
@@ -2394,7 +3639,7 @@ def delete_my_vocab_entry(entry_id):
         # Hiển thị thông báo lỗi cho người dùng.
         flash(f"An error occurred while deleting the word: {str(e)}", "danger")
         # Ghi log lỗi chi tiết ở server.
-        print(f"Lỗi khi user {current_user_db_id} xóa entry ID {entry_id}: {e}")
+        logger.error("Lỗi khi user %s xóa entry ID %s: %s", current_user_db_id, entry_id, e)
 
     # 8. Sau khi xóa (hoặc nếu có lỗi và đã flash thông báo),
     #    chuyển hướng người dùng trở lại trang chi tiết của danh sách mà từ đó vừa bị xóa.
@@ -2468,7 +3713,7 @@ def edit_my_vocab_entry(entry_id):
         flash(f"Entry '{entry_to_edit.original_word}' successfully updated.", "success")
 
         # Ghi log ở server (tùy chọn).
-        print(f"User {current_user_db_id} đã sửa entry ID {entry_id} ('{entry_to_edit.original_word}')")
+        logger.info("User %s đã sửa entry ID %s ('%s')", current_user_db_id, entry_id, entry_to_edit.original_word)
 
         # 9. Trả về JSON báo thành công cho client AJAX.
         return jsonify({"success": True, "message": "Updated item successfully!"})
@@ -2478,11 +3723,111 @@ def edit_my_vocab_entry(entry_id):
         #     hoàn tác lại các thay đổi (rollback).
         db.session.rollback()
         # Ghi log lỗi chi tiết ở server.
-        print(f"Lỗi khi User {current_user_db_id} sửa entry ID {entry_id}: {e}")
+        logger.error("Lỗi khi User %s sửa entry ID %s: %s", current_user_db_id, entry_id, e)
         # Trả về JSON báo lỗi server.
         return jsonify({"success": False, "message": f"Server error while updating item: {str(e)}"}), 500
 
 
+def load_entry_senses(entry, user_id=None, fetch_missing=False):
+    """
+    Các nghĩa của từ trong một VocabularyEntry: tra theo khóa tra cứu (lemma, giống enrichment_engine),
+    nếu không có thì theo chính từ đã lưu. Trả về kết quả của get_word_senses hoặc None.
+    """
+    normalize_word = lemmatize if app.config['LEMMATIZATION_ENABLED'] else normalize_surface
+    lookup_word = normalize_word(entry.original_word) or entry.original_word
+    word_senses = get_word_senses(lookup_word, user_id=user_id, fetch_missing=fetch_missing)
+    if word_senses is None and normalize_word_key(lookup_word) != normalize_word_key(entry.original_word):
+        word_senses = get_word_senses(entry.original_word, user_id=user_id, fetch_missing=fetch_missing)
+    return word_senses
+
+
+def get_owned_entry(entry_id, user_id):
+    """Trả về (entry, None) nếu entry thuộc về user_id, ngược lại (None, response JSON lỗi)."""
+    entry = db.session.get(VocabularyEntry, entry_id)
+    if not entry:
+        return None, (jsonify({"success": False, "message": "Vocabulary entry not found."}), 404)
+    if entry.user_id != user_id:
+        return None, (jsonify({"success": False, "message": "You do not have permission to change this entry."}), 403)
+    return entry, None
+
+
+@app.route('/my-lists/entry/<int:entry_id>/senses')
+@login_required
+def entry_senses_route(entry_id):
+    """
+    Các nghĩa khác của một từ đã lưu (thẻ từ trong list_detail gọi khi người dùng mở "Other senses").
+    Nghĩa lấy từ dictionary store / sense_store; chỉ gọi dictionaryapi.dev nếu từ này chưa từng được tra.
+    Định nghĩa và câu ví dụ được dịch một lần (bộ nhớ dịch + dịch batch) để việc đổi nghĩa sau đó
+    không phải gọi API nào.
+    """
+    current_user_db_id = session.get("db_user_id")
+    entry, error_response = get_owned_entry(entry_id, current_user_db_id)
+    if error_response:
+        return error_response
+
+    word_senses = load_entry_senses(entry, user_id=current_user_db_id, fetch_missing=True)
+    if not word_senses:
+        return jsonify({"success": True, "word": entry.original_word, "senses": [],
+                        "message": "No other senses were found for this word."})
+
+    senses = word_senses['senses']
+    texts = [sense['definition_en'] for sense in senses] + [sense['example_en'] for sense in senses if sense['example_en']]
+    translations = enrichment_engine.translate_texts(texts, user_id=current_user_db_id)
+    for sense in senses:
+        sense['definition_vi'] = translations.get(sense['definition_en'])
+        sense['example_vi'] = translations.get(sense['example_en']) if sense['example_en'] else None
+        sense['current'] = sense['definition_en'] == entry.definition_en and sense['type'] == entry.word_type
+
+    return jsonify({"success": True, "word": entry.original_word, "ipa": word_senses['ipa'],
+                    "phonetics": word_senses['phonetics'], "senses": senses})
+
+
+@app.route('/my-lists/entry/<int:entry_id>/sense', methods=['POST'])
+@login_required
+def switch_entry_sense_route(entry_id):
+    """
+    Đổi một VocabularyEntry sang nghĩa khác (JSON: {"sense_index": n}, vị trí trong danh sách của entry_senses_route).
+    Chỉ đọc sense_store và bộ nhớ dịch, không gọi API bên ngoài. Nghĩa không có câu ví dụ thì giữ câu ví dụ cũ.
+    """
+    current_user_db_id = session.get("db_user_id")
+    entry, error_response = get_owned_entry(entry_id, current_user_db_id)
+    if error_response:
+        return error_response
+
+    data = request.get_json(silent=True) or {}
+    sense_index = data.get('sense_index')
+    word_senses = load_entry_senses(entry, user_id=current_user_db_id)
+    if not word_senses or not isinstance(sense_index, int) or not 0 <= sense_index < len(word_senses['senses']):
+        return jsonify({"success": False, "message": "This sense is no longer available. Please reload the senses."}), 400
+
+    sense = word_senses['senses'][sense_index]
+    # Đọc bộ nhớ dịch trước khi sửa entry: entry chỉ bị thay đổi khi đã có đủ mọi giá trị mới
+    definition_vi = translation_memo.get_translation(sense['definition_en'], 'auto', 'vi') or DEFAULT_DEFINITION_VI
+    example_vi = None
+    if sense['example_en']:
+        example_vi = translation_memo.get_translation(sense['example_en'], 'auto', 'vi') \
+            or "Không thể dịch câu ví dụ này."
+    try:
+        entry.word_type = sense['type']
+        entry.definition_en = sense['definition_en']
+        entry.definition_vi = definition_vi
+        if sense['example_en']:
+            entry.example_en = sense['example_en']
+            entry.example_vi = example_vi
+        if word_senses['ipa'] != "N/A" and (not entry.ipa or entry.ipa == "N/A"):
+            entry.ipa = word_senses['ipa']
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Lỗi khi User %s đổi nghĩa của entry ID %s: %s", current_user_db_id, entry_id, e)
+        return jsonify({"success": False, "message": f"Server error while switching sense: {str(e)}"}), 500
+
+    return jsonify({"success": True, "message": "Sense updated.",
+                    "entry": {"word_type": entry.word_type, "definition_en": entry.definition_en,
+                              "definition_vi": entry.definition_vi, "example_en": entry.example_en,
+                              "example_vi": entry.example_vi, "ipa": entry.ipa}})
+
+
 @app.route('/dashboard')  # Định nghĩa route URL là /dashboard
 @login_required  # Nếu bạn có decorator này, hãy sử dụng nó ở đây
 def dashboard_page():
@@ -2534,9 +3879,9 @@ def dashboard_page():
         VocabularyEntry.added_at.desc()).limit(5).all()
 
     # In ra thông tin debug ở server để theo dõi (tùy chọn)
-    print(
-        f"Dashboard for user ID {current_user_db_id}: Stats: {stats}, "
-        f"{len(recent_lists)} recent lists, {len(recent_entries)} recent entries"
+    logger.debug(
+        "Dashboard for user ID %s: Stats: %s, %d recent lists, %d recent entries",
+        current_user_db_id, stats, len(recent_lists), len(recent_entries)
     )
 
     # 6. Render template 'dashboard.html' và truyền các dữ liệu cần thiết vào:
@@ -2669,7 +4014,7 @@ def update_profile_info_route():
         # 8. Nếu có lỗi khi commit vào database, hoàn tác lại thay đổi.
         db.session.rollback()
         flash(f"Error updating information: {str(e)}", "danger")
-        print(f"Lỗi khi user {user_to_update.email} cập nhật display_name: {e}")  # Log lỗi chi tiết.
+        logger.error("Lỗi khi user %s cập nhật display_name: %s", user_to_update.email, e)  # Log lỗi chi tiết.
 
     # 9. Sau khi xử lý (thành công hoặc lỗi), chuyển hướng người dùng trở lại trang Profile.
     return redirect(url_for('profile_page'))
@@ -2697,7 +4042,7 @@ def delete_my_list(list_id_to_delete):
     except Exception as e:
         db.session.rollback()
         flash(f"An error occurred while trying to delete the list: {str(e)}", "danger")
-        print(f"Error deleting list {list_id_to_delete} for user {current_user_db_id}: {e}")
+        logger.error("Error deleting list %s for user %s: %s", list_id_to_delete, current_user_db_id, e)
 
     return redirect(url_for('my_lists_page'))
 
@@ -2769,7 +4114,7 @@ def rename_my_list_ajax(list_id):
         # Không cần flash message ở đây vì đây là AJAX request.
         # Thông báo sẽ được xử lý bởi JavaScript ở client dựa trên JSON response.
 
-        print(f"User {current_user_db_id} đã đổi tên list ID {list_id} thành '{new_name}'")  # Debug log
+        logger.info("User %s đã đổi tên list ID %s thành '%s'", current_user_db_id, list_id, new_name)
 
         # 9. Trả về JSON báo thành công, kèm theo tên mới.
         #    Client JavaScript có thể sử dụng 'new_name' để cập nhật UI động mà không cần reload trang.
@@ -2780,11 +4125,237 @@ def rename_my_list_ajax(list_id):
         #     hoàn tác lại các thay đổi (rollback).
         db.session.rollback()
         # Ghi log lỗi chi tiết ở server.
-        print(f"Lỗi khi User {current_user_db_id} đổi tên list ID {list_id}: {e}")
+        logger.error("Lỗi khi User %s đổi tên list ID %s: %s", current_user_db_id, list_id, e)
         # Trả về JSON báo lỗi server.
         return jsonify({"success": False, "message": f"Lỗi server khi đổi tên danh sách: {str(e)}"}), 500
 
 
+@app.cli.command("tatoeba-import")
+@click.argument("sentences_path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("links_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--output", "index_path", default=None, help="File chỉ mục đích (mặc định: TATOEBA_INDEX_PATH).")
+@click.option("--source-lang", default="eng", show_default=True)
+@click.option("--target-lang", default="vie", show_default=True)
+def tatoeba_import_command(sentences_path, links_path, index_path, source_lang, target_lang):
+    """
+    Nạp file export Tatoeba (sentences.csv, links.csv; có thể nén .bz2/.gz) vào chỉ mục câu ví dụ cục bộ.
+    Tải tại https://tatoeba.org/en/downloads. Ứng dụng đang chạy sẽ tự dùng chỉ mục mới sau tối đa 60 giây.
+    """
+    index_path = index_path or app.config['TATOEBA_INDEX_PATH']
+    logger.info("Đang import Tatoeba (%s -> %s) vào %s ...", source_lang, target_lang, index_path)
+    result = import_tatoeba_export(sentences_path, links_path, index_path,
+                                   source_lang=source_lang, target_lang=target_lang)
+    logger.info("Hoàn tất: %s cặp câu, %s từ được đánh chỉ mục, FTS5: %s.",
+                result['pairs'], result['words'], 'có' if result['fts'] else 'không')
+
+
+@app.cli.command("dictionary-import")
+@click.argument("dump_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--output", "store_path", default=None, help="File store đích (mặc định: DICTIONARY_STORE_PATH).")
+def dictionary_import_command(dump_path, store_path):
+    """
+    Nạp file dump từ điển (JSON Lines hoặc mảng JSON theo định dạng entry của dictionaryapi.dev;
+    có thể nén .bz2/.gz) vào dictionary store cục bộ. Ứng dụng đang chạy sẽ tự dùng file mới sau tối đa 60 giây.
+    """
+    store_path = store_path or app.config['DICTIONARY_STORE_PATH']
+    logger.info("Đang import từ điển từ %s vào %s ...", dump_path, store_path)
+    result = import_dictionary_dump(dump_path, store_path)
+    logger.info("Hoàn tất: %s entry, %s từ, bỏ qua %s entry không hợp lệ.",
+                result['entries'], result['words'], result['skipped'])
+
+
+@app.cli.command("negative-cache-rebuild")
+def negative_cache_rebuild_command():
+    """
+    Xóa các mục negative cache đã hết hạn và dựng lại Bloom filter từ các mục còn lại
+    (kích thước theo NEGATIVE_CACHE_FP_RATE / NEGATIVE_CACHE_EXPECTED_ITEMS). Nên chạy định kỳ, ví dụ bằng cron.
+    """
+    logger.info("Đang dựng lại Bloom filter tại %s ...", negative_cache.filter_path)
+    result = negative_cache.rebuild()
+    logger.info("Hoàn tất: %s mục, xóa %s mục hết hạn, %s bit / %s hàm băm (%s byte).",
+                result['items'], result['expired_deleted'], result['num_bits'], result['num_hashes'], result['size_bytes'])
+
+
+@app.cli.command("log-rollups-rebuild")
+def log_rollups_rebuild_command():
+    """
+    Dựng lại các bảng rollup của APILog (api_call_rollup, api_latency_rollup) từ bảng api_log.
+    Chạy một lần sau khi nâng cấp lên phiên bản có rollup; các log ghi sau đó được cộng dồn tự động.
+    """
+    api_log_sink.flush()
+    logger.info("Đang dựng lại rollup từ bảng api_log ...")
+    processed = rebuild_rollups(app, [latency_rollup, call_count_rollup])
+    logger.info("Hoàn tất: đã đọc %s API log.", processed)
+
+
+def build_log_retention():
+    return LogRetention(
+        app,
+        archive_dir=app.config['LOG_ARCHIVE_DIR'],
+        retention_days={APILog.__tablename__: app.config['API_LOG_RETENTION_DAYS'],
+                        UserActivity.__tablename__: app.config['USER_ACTIVITY_RETENTION_DAYS']},
+        batch_size=app.config['LOG_RETENTION_BATCH_SIZE'],
+        batch_pause=app.config['LOG_RETENTION_BATCH_PAUSE'],
+        vacuum_pages=app.config['LOG_RETENTION_VACUUM_PAGES']
+    )
+
+
+@app.cli.command("logs-retention")
+@click.option("--dry-run", is_flag=True, help="Chỉ đếm số dòng sẽ được archive, không ghi/xóa gì.")
+@click.option("--enable-incremental-vacuum", is_flag=True,
+              help="Bật auto_vacuum=INCREMENTAL cho SQLite (một lần VACUUM toàn bộ, khóa database trong lúc chạy).")
+def logs_retention_command(dry_run, enable_incremental_vacuum):
+    """
+    Chuyển các dòng api_log / user_activity cũ hơn API_LOG_RETENTION_DAYS / USER_ACTIVITY_RETENTION_DAYS
+    sang archive NDJSON nén theo ngày trong LOG_ARCHIVE_DIR, xóa theo lô rồi incremental vacuum.
+    Nên chạy định kỳ, ví dụ mỗi đêm bằng cron.
+    """
+    log_retention = build_log_retention()
+    if enable_incremental_vacuum:
+        logger.info("Đang bật incremental vacuum (VACUUM toàn bộ database) ...")
+        logger.info("Hoàn tất." if log_retention.enable_incremental_vacuum() else "Chỉ áp dụng cho SQLite, bỏ qua.")
+
+    api_log_sink.flush()
+    for result in log_retention.run(dry_run=dry_run):
+        if dry_run:
+            logger.info("%s: %s dòng cũ hơn %s sẽ được archive.",
+                        result['table'], result['archived'], result['cutoff'].strftime('%Y-%m-%d %H:%M'))
+        else:
+            logger.info("%s: đã archive %s dòng, xóa %s dòng (cũ hơn %s) vào %d file.",
+                        result['table'], result['archived'], result['deleted'],
+                        result['cutoff'].strftime('%Y-%m-%d %H:%M'), len(result['files']))
+
+
+@app.cli.command("logs-reimport")
+@click.option("--table", "table_name", type=click.Choice(["api_log", "user_activity"]), required=True)
+@click.option("--since", required=True, type=click.DateTime(), help="Từ thời điểm (UTC), ví dụ 2024-05-01.")
+@click.option("--until", required=True, type=click.DateTime(), help="Tới trước thời điểm (UTC), ví dụ 2024-05-08.")
+def logs_reimport_command(table_name, since, until):
+    """
+    Đưa các dòng đã archive trong khoảng [since, until) trở lại bảng để điều tra.
+    Lần chạy logs-retention tiếp theo sẽ archive lại chúng nếu vẫn cũ hơn thời hạn.
+    """
+    logger.info("Đang import lại %s từ %s tới %s ...", table_name, since, until)
+    result = build_log_retention().reimport(table_name, since, until)
+    logger.info("Hoàn tất: đọc %s dòng từ %s file, thêm %s, bỏ qua %s dòng đã có.",
+                result['read'], result['files'], result['inserted'], result['skipped'])
+    if result['collisions']:
+        logger.warning("%s dòng có id đã bị dòng khác dùng lại, đã được thêm với id mới.", result['collisions'])
+
+
+@app.cli.command("jobs-worker")
+@click.option("--threads", default=1, show_default=True, help="Số worker thread.")
+def jobs_worker_command(threads):
+    """
+    Chạy worker xử lý công việc nền trong một tiến trình riêng (dùng cùng JOB_WORKER_THREADS=0 cho tiến trình web).
+    Dừng bằng Ctrl+C; công việc đang chạy dở sẽ được worker khác chạy tiếp sau JOB_HEARTBEAT_TIMEOUT giây.
+    """
+    runner = JobRunner(app, job_runner.handlers, num_workers=threads,
+                       poll_interval=app.config['JOB_POLL_INTERVAL'],
+                       heartbeat_timeout=app.config['JOB_HEARTBEAT_TIMEOUT'],
+                       max_attempts=app.config['JOB_MAX_ATTEMPTS'])
+    runner.start()
+    logger.info("Worker công việc nền đang chạy. Nhấn Ctrl+C để dừng.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        runner.stop()
+
+
+@app.cli.command("stub-server")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8765, show_default=True)
+@click.option("--latency-ms", default=50.0, show_default=True, help="Độ trễ cơ bản của mỗi request.")
+@click.option("--jitter-ms", default=10.0, show_default=True, help="Độ trễ dao động ± quanh giá trị cơ bản.")
+@click.option("--tail-rate", default=0.0, show_default=True, help="Tỉ lệ request bị thêm --tail-ms (đuôi độ trễ).")
+@click.option("--tail-ms", default=1000.0, show_default=True)
+@click.option("--error-rate", default=0.0, show_default=True, help="Tỉ lệ request trả 500.")
+@click.option("--throttle-rps", default=0.0, show_default=True, help="Giới hạn request/giây (0: không giới hạn); vượt -> 429.")
+@click.option("--throttle-burst", default=None, type=int, help="Số request được vượt giới hạn một lúc (mặc định: --throttle-rps).")
+@click.option("--seed", default=None, type=int, help="Seed cho độ trễ/lỗi ngẫu nhiên (để benchmark lặp lại được).")
+def stub_server_command(host, port, latency_ms, jitter_ms, tail_rate, tail_ms, error_rate, throttle_rps,
+                        throttle_burst, seed):
+    """
+    Chạy server giả lập dictionaryapi.dev, Tatoeba và LibreTranslate (xem stub_servers.py) để chạy/benchmark
+    không cần Internet. Trỏ ứng dụng về server này bằng UPSTREAM_BASE_URL=http://<host>:<port>
+    và TRANSLATION_PROVIDER=libre (Google Translate không đổi được địa chỉ).
+    """
+    from stub_servers import FaultInjector, make_stub_server
+
+    faults = FaultInjector(latency_ms=latency_ms, jitter_ms=jitter_ms, tail_rate=tail_rate, tail_ms=tail_ms,
+                           error_rate=error_rate, throttle_rps=throttle_rps, throttle_burst=throttle_burst, seed=seed)
+    server = make_stub_server(host, port, faults)
+    logger.info("Stub server đang chạy tại http://%s:%s (thống kê: /__stats). Nhấn Ctrl+C để dừng.", host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Đã dừng. Thống kê: %s", faults.stats())
+
+
+@app.cli.command("bench-enter-words")
+@click.option("--requests", "request_count", default=20, show_default=True, help="Tổng số request /enter-words/stream.")
+@click.option("--concurrency", default=4, show_default=True, help="Số request chạy đồng thời.")
+@click.option("--words-per-request", default=10, show_default=True)
+@click.option("--user-id", default=None, type=int, help="Người dùng chạy benchmark (mặc định: người dùng đầu tiên).")
+def bench_enter_words_command(request_count, concurrency, words_per_request, user_id):
+    """
+    Benchmark luồng nhập từ (/enter-words/stream) ngay trong tiến trình, với các từ mới sinh ngẫu nhiên
+    (không trúng cache nào) nên mọi từ đều đi tới các provider. Nên chạy với `flask stub-server` để
+    kết quả không phụ thuộc Internet; in ra throughput, độ trễ p50/p95/p99 và số APILog được ghi.
+    """
+    import random
+    import string
+    from concurrent.futures import ThreadPoolExecutor
+
+    user = db.session.get(User, user_id) if user_id else User.query.order_by(User.id.asc()).first()
+    if not user:
+        logger.warning("Không có người dùng nào để chạy benchmark (tạo tài khoản hoặc dùng --user-id).")
+        return
+    logger.info("Provider: %s, TRANSLATION_PROVIDER=%s",
+                [provider.describe() for provider in providers.values()], app.config['TRANSLATION_PROVIDER'])
+
+    run_tag = ''.join(random.choices(string.ascii_lowercase, k=4))
+    api_logs_before = APILog.query.count()
+
+    def one_request(request_number):
+        # Từ chỉ gồm chữ cái, khác nhau giữa các lần chạy (run_tag) để không trúng cache / vocabulary cũ
+        words = [f"bench{run_tag}{''.join(random.choices(string.ascii_lowercase, k=6))}"
+                 for _ in range(words_per_request)]
+        client = app.test_client()
+        with client.session_transaction() as client_session:
+            client_session["db_user_id"] = user.id
+        started = time.monotonic()
+        response = client.get('/enter-words/stream', query_string={"words": ",".join(words)})
+        body = response.get_data(as_text=True)
+        elapsed = time.monotonic() - started
+        ok = response.status_code == 200 and "event: summary" in body
+        return elapsed, ok, body.count("event: word")
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(one_request, range(request_count)))
+    total_elapsed = time.monotonic() - started
+
+    latencies = sorted(elapsed for elapsed, _, _ in results)
+    errors = sum(1 for _, ok, _ in results if not ok)
+    words_done = sum(words for _, _, words in results)
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+    logger.info("%s request x %s từ, đồng thời %s: %.2fs, %.2f request/s, %.1f từ/s",
+                request_count, words_per_request, concurrency, total_elapsed,
+                request_count / total_elapsed, words_done / total_elapsed)
+    logger.info("Độ trễ mỗi request: p50=%.0fms p95=%.0fms p99=%.0fms; lỗi: %s",
+                percentile(0.50) * 1000, percentile(0.95) * 1000, percentile(0.99) * 1000, errors)
+    api_log_sink.flush()
+    logger.info("APILog được ghi: %s (log sink: %s)", APILog.query.count() - api_logs_before, api_log_sink.stats())
+
+
 if __name__ == '__main__':
     with app.app_context():
         app.run(debug=True)
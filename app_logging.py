@@ -0,0 +1,236 @@
+# app_logging.py
+
+# --- Standard Library Imports ---
+import atexit  # Ghi nốt các log còn trong hàng đợi khi tiến trình thoát
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Các thuộc tính có sẵn của LogRecord; thuộc tính khác (truyền qua extra=...) được ghi thành trường JSON riêng
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+# Thuộc tính nội bộ của module này, không ghi ra
+_INTERNAL_ATTRS = {"sample"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Mỗi bản ghi là một dòng JSON: ts (UTC), level, logger, msg, các trường truyền qua extra=...
+    (ví dụ extra={"word": word, "user_id": user_id}), thông tin request (nếu có) và exc (traceback, nếu có).
+    """
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key in _STANDARD_RECORD_ATTRS or key in _INTERNAL_ATTRS or key.startswith("_"):
+                continue
+            payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Định dạng dễ đọc cho môi trường dev (LOG_FORMAT=text): các trường extra được nối vào cuối dòng."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {key: value for key, value in vars(record).items()
+                  if key not in _STANDARD_RECORD_ATTRS and key not in _INTERNAL_ATTRS and not key.startswith("_")}
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class RequestContextFilter(logging.Filter):
+    """Gắn method, path và user_id của request hiện tại (nếu có) vào bản ghi, ngay trên thread của request."""
+
+    def filter(self, record):
+        try:
+            from flask import has_request_context, request, session
+            if has_request_context():
+                record.method = request.method
+                record.path = request.path
+                if session.get("db_user_id") and not hasattr(record, "user_id"):
+                    record.user_id = session.get("db_user_id")
+        except Exception:
+            pass  # Log không bao giờ được làm hỏng request
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lấy mẫu các sự kiện nhiều: bản ghi DEBUG, hoặc bản ghi gắn extra={"sample": True}, chỉ giữ 1 trên mỗi
+    `every` bản ghi của cùng một câu lệnh log (logger + dòng code). every <= 1: giữ tất cả.
+    Bản ghi WARNING trở lên không bao giờ bị lấy mẫu.
+    """
+
+    def __init__(self, every=1):
+        super().__init__()
+        self.every = max(1, int(every))
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.sampled_out = 0
+
+    def filter(self, record):
+        if self.every <= 1 or record.levelno >= logging.WARNING:
+            return True
+        if record.levelno > logging.DEBUG and not getattr(record, "sample", False):
+            return True
+        key = (record.name, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+            if count % self.every == 0:
+                record.sample_rate = self.every  # Để người đọc log biết bản ghi này đại diện cho bao nhiêu sự kiện
+                return True
+            self.sampled_out += 1
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler không bao giờ chặn thread gọi: hàng đợi đầy thì bỏ bản ghi và đếm vào 'dropped'.
+    Nội dung message được tạo sẵn trên thread gọi (để tham số không bị thay đổi trước khi được ghi),
+    việc định dạng JSON và ghi I/O do QueueListener làm trên thread riêng.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class AppLogging:
+    """
+    Cấu hình log của ứng dụng: logger gốc ghi qua NonBlockingQueueHandler (kèm RequestContextFilter và
+    SamplingFilter), một QueueListener trên thread nền ghi ra stdout (hoặc LOG_FILE) theo JSON (hoặc text).
+    Mức log từng module đặt bằng LOG_LEVELS, ví dụ "enrichment=DEBUG,lookup_cache=WARNING".
+    Tiến trình con sau fork (Gunicorn) có hàng đợi và thread ghi log của riêng nó.
+    """
+
+    def __init__(self):
+        self.handler = None
+        self.listener = None
+        self.sampling_filter = None
+        self._output_handler = None
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def configure(self, config):
+        with self._lock:
+            self.shutdown()
+
+            if config.get('LOG_FORMAT', 'json') == 'text':
+                formatter = TextFormatter()
+            else:
+                formatter = JsonFormatter()
+            log_file = config.get('LOG_FILE')
+            if log_file:
+                output_handler = logging.handlers.WatchedFileHandler(log_file, encoding="utf-8")
+            else:
+                output_handler = logging.StreamHandler(sys.stdout)
+            output_handler.setFormatter(formatter)
+            self._output_handler = output_handler
+
+            self.handler = NonBlockingQueueHandler(queue.Queue(maxsize=max(1, int(config.get('LOG_QUEUE_SIZE', 10000)))))
+            self.handler.addFilter(RequestContextFilter())
+            self.sampling_filter = SamplingFilter(config.get('LOG_DEBUG_SAMPLE_EVERY', 1))
+            self.handler.addFilter(self.sampling_filter)
+
+            root_logger = logging.getLogger()
+            for existing_handler in list(root_logger.handlers):
+                if isinstance(existing_handler, NonBlockingQueueHandler):
+                    root_logger.removeHandler(existing_handler)
+            root_logger.addHandler(self.handler)
+            root_logger.setLevel(parse_level(config.get('LOG_LEVEL', 'INFO')))
+            for logger_name, level in parse_module_levels(config.get('LOG_LEVELS', '')).items():
+                logging.getLogger(logger_name).setLevel(level)
+
+            self.listener = logging.handlers.QueueListener(self.handler.queue, output_handler,
+                                                           respect_handler_level=True)
+            self.listener.start()
+
+    def _restart_after_fork(self):
+        """Thread ghi log không tồn tại trong tiến trình con (và khóa của hàng đợi cũ có thể đang bị giữ): tạo lại cả hai."""
+        if self.handler is None:
+            return
+        self._lock = threading.Lock()
+        self.sampling_filter._lock = threading.Lock()
+        self.handler.queue = queue.Queue(maxsize=self.handler.queue.maxsize)
+        self.listener = logging.handlers.QueueListener(self.handler.queue, self._output_handler,
+                                                       respect_handler_level=True)
+        self.listener.start()
+
+    def shutdown(self):
+        """Dừng thread ghi log sau khi ghi nốt các bản ghi còn trong hàng đợi."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def stats(self):
+        if self.handler is None:
+            return None
+        return {
+            "enqueued": self.handler.enqueued,
+            "dropped": self.handler.dropped,
+            "sampled_out": self.sampling_filter.sampled_out,
+            "sample_every": self.sampling_filter.every,
+            "queue_size": self.handler.queue.qsize(),
+            "max_queue": self.handler.queue.maxsize,
+        }
+
+
+def parse_level(level_name):
+    """'debug' / 'INFO' / '20' -> mức log của module logging (không hợp lệ: INFO)."""
+    level_name = str(level_name).strip().upper()
+    if level_name.isdigit():
+        return int(level_name)
+    level = logging.getLevelName(level_name)
+    return level if isinstance(level, int) else logging.INFO
+
+
+def parse_module_levels(spec):
+    """'enrichment=DEBUG, werkzeug=WARNING' -> {'enrichment': 10, 'werkzeug': 30}."""
+    levels = {}
+    for item in (spec or "").split(","):
+        logger_name, _, level_name = item.partition("=")
+        if logger_name.strip() and level_name.strip():
+            levels[logger_name.strip()] = parse_level(level_name)
+    return levels
+
+
+app_logging = AppLogging()
+atexit.register(app_logging.shutdown)
@@ -0,0 +1,299 @@
+# background_jobs.py
+
+# --- Standard Library Imports ---
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+# --- Application-Specific Imports ---
+from models import db, BackgroundJob, BackgroundJobChunk
+
+logger = logging.getLogger(__name__)
+
+# Các trạng thái của một công việc nền
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_DONE = "done"
+JOB_STATUS_FAILED = "failed"
+
+# Các loại công việc
+JOB_TYPE_ENRICH_WORDS = "enrich_words"
+JOB_TYPE_IMPORT_WORDS = "import_words"
+
+
+class JobLostError(Exception):
+    """Ném ra khi worker không còn giữ công việc (đã bị worker khác nhận lại sau khi hết hạn heartbeat)."""
+
+
+def enqueue_job(job_type, payload, user_id=None, total=0, summary=None):
+    """
+    Tạo một công việc mới ở trạng thái 'queued' và commit ngay (để worker ở tiến trình khác thấy được).
+
+    Args:
+        job_type (str): Loại công việc, phải có handler tương ứng trong JobRunner.
+        payload (dict): Dữ liệu đầu vào, được lưu dưới dạng JSON.
+        user_id (int, optional): Người tạo công việc.
+        total (int): Tổng số phần tử cần xử lý (để hiển thị tiến độ).
+        summary (dict, optional): Bảng thống kê ban đầu (handler cập nhật tiếp qua save_progress).
+
+    Returns:
+        BackgroundJob: Công việc vừa tạo.
+    """
+    job = BackgroundJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        job_type=job_type,
+        status=JOB_STATUS_QUEUED,
+        payload=json.dumps(payload, ensure_ascii=False),
+        results=json.dumps(summary, ensure_ascii=False) if summary is not None else None,
+        total=total,
+        completed=0
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def load_job_summary(job):
+    """Trả về bảng thống kê (dict, đã parse JSON) của công việc, hoặc {} nếu chưa có."""
+    if not job.results:
+        return {}
+    try:
+        summary = json.loads(job.results)
+    except ValueError:
+        return {}
+    return summary if isinstance(summary, dict) else {}
+
+
+def load_job_items(job, since=0):
+    """
+    Ghép kết quả từng phần (BackgroundJobChunk) của công việc theo thứ tự, bắt đầu từ vị trí `since`.
+    Chỉ đọc các đoạn chứa phần tử từ `since` trở đi, nên trình duyệt hỏi tiến độ không phải tải lại cả danh sách.
+    """
+    since = max(0, since)
+    chunks = BackgroundJobChunk.query.filter(
+        BackgroundJobChunk.job_id == job.id,
+        BackgroundJobChunk.start_index + BackgroundJobChunk.item_count > since
+    ).order_by(BackgroundJobChunk.start_index.asc()).all()
+    items = []
+    for chunk in chunks:
+        chunk_items = json.loads(chunk.results)
+        items.extend(chunk_items[max(0, since - chunk.start_index):])
+    return items
+
+
+class JobRunner:
+    """
+    Các worker thread lấy công việc từ bảng background_job và xử lý.
+
+    - Nhận việc nguyên tử: UPDATE ... WHERE status='queued' và kiểm tra rowcount, nên nhiều thread/tiến trình
+      (kể cả `flask jobs-worker`) có thể cùng lấy việc từ một hàng đợi mà không nhận trùng.
+    - Handler ghi tiến độ qua save_progress() (con trỏ, thống kê và kết quả của đoạn vừa xong, không ghi lại
+      các đoạn trước); mỗi lần ghi cũng là một heartbeat.
+    - Công việc 'running' không có heartbeat quá heartbeat_timeout giây (worker bị tắt/khởi động lại) được
+      đưa lại vào hàng đợi và chạy tiếp từ kết quả đã lưu; quá max_attempts lần thì đánh dấu 'failed'.
+
+    handlers: {job_type: hàm(job, runner)} trả về bảng thống kê cuối cùng (dict JSON được, hoặc None).
+    finalizers: {job_type: hàm(job)} dọn tài nguyên của công việc (ví dụ file upload), được gọi đúng khi công việc
+    đã ở trạng thái cuối ('done'/'failed'), không gọi khi công việc còn được chạy lại.
+    """
+
+    def __init__(self, app, handlers, num_workers=1, poll_interval=2.0, heartbeat_timeout=300, max_attempts=3,
+                 finalizers=None):
+        self.app = app
+        self.handlers = dict(handlers)
+        self.finalizers = dict(finalizers or {})
+        self.num_workers = max(0, int(num_workers))
+        self.poll_interval = poll_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max(1, int(max_attempts))
+
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._started_pid = None  # Tiến trình con sau fork (Gunicorn) phải tự khởi động thread của mình
+        self._lock = threading.Lock()
+
+    # --- Vòng đời worker ---
+
+    def start(self):
+        """Khởi động các worker thread trong tiến trình hiện tại (gọi nhiều lần cũng chỉ khởi động một lần)."""
+        if self.num_workers == 0 or self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._stop_event.clear()
+            self._threads = []
+            for number in range(self.num_workers):
+                thread = threading.Thread(target=self.run_forever, name=f"job-worker-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info("Đã khởi động %s worker xử lý công việc nền (pid %s).", self.num_workers, self._started_pid)
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def wake(self):
+        """Báo cho worker đang chờ có công việc mới (không phải đợi hết poll_interval)."""
+        self._wake_event.set()
+
+    def run_forever(self):
+        """Vòng lặp của một worker: phục hồi việc bị bỏ dở, nhận việc, xử lý; hết việc thì chờ."""
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        while not self._stop_event.is_set():
+            with self.app.app_context():
+                try:
+                    self.requeue_stale_jobs()
+                    job = self.claim_next(worker_id)
+                    if job is not None:
+                        self.run_job(job, worker_id)
+                        continue
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error("Lỗi trong worker công việc nền %s: %s", worker_id, e)
+                finally:
+                    db.session.remove()
+            self._wake_event.wait(self.poll_interval)
+            self._wake_event.clear()
+
+    # --- Các thao tác trên hàng đợi (cần app context) ---
+
+    def requeue_stale_jobs(self):
+        """Đưa các công việc 'running' đã mất heartbeat về lại hàng đợi (hoặc 'failed' nếu đã thử quá nhiều lần)."""
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=self.heartbeat_timeout)
+        stale_filter = (BackgroundJob.status == JOB_STATUS_RUNNING) & (BackgroundJob.heartbeat_at < stale_before)
+
+        # Các công việc sắp bị đánh dấu 'failed' được lấy ra trước để chạy finalizer sau khi commit
+        failed_jobs = BackgroundJob.query.filter(stale_filter, BackgroundJob.attempts >= self.max_attempts).all()
+        failed = 0
+        if failed_jobs:
+            failed = BackgroundJob.query.filter(stale_filter,
+                                                BackgroundJob.id.in_([job.id for job in failed_jobs])).update(
+                {"status": JOB_STATUS_FAILED, "finished_at": now, "worker_id": None,
+                 "error_message": f"Worker stopped responding {self.max_attempts} times"},
+                synchronize_session=False
+            )
+        requeued = BackgroundJob.query.filter(stale_filter).update(
+            {"status": JOB_STATUS_QUEUED, "worker_id": None},
+            synchronize_session=False
+        )
+        db.session.commit()
+        for job in failed_jobs:
+            self.finalize(job)
+        if failed or requeued:
+            logger.warning("Phục hồi công việc nền bị bỏ dở: %s đưa lại hàng đợi, %s đánh dấu thất bại.",
+                           requeued, failed)
+        return requeued
+
+    def claim_next(self, worker_id):
+        """Nhận công việc 'queued' cũ nhất. Trả về BackgroundJob đã chuyển sang 'running', hoặc None."""
+        candidate_ids = [row.id for row in db.session.query(BackgroundJob.id)
+                         .filter(BackgroundJob.status == JOB_STATUS_QUEUED)
+                         .order_by(BackgroundJob.created_at.asc())
+                         .limit(5).all()]
+        for job_id in candidate_ids:
+            now = datetime.utcnow()
+            claimed = BackgroundJob.query.filter_by(id=job_id, status=JOB_STATUS_QUEUED).update(
+                {"status": JOB_STATUS_RUNNING, "worker_id": worker_id, "heartbeat_at": now,
+                 "started_at": now, "attempts": BackgroundJob.attempts + 1},
+                synchronize_session=False
+            )
+            db.session.commit()
+            if claimed == 1:
+                return db.session.get(BackgroundJob, job_id)
+            # Worker khác đã nhận trước: thử công việc tiếp theo
+        return None
+
+    def save_progress(self, job, completed, summary=None, chunk_results=None):
+        """
+        Ghi tiến độ và heartbeat. Handler gọi hàm này sau mỗi đoạn công việc.
+        - completed: con trỏ, số phần tử đầu tiên đã xử lý xong (công việc chạy tiếp từ đây sau khi khởi động lại).
+        - summary: bảng thống kê (dict nhỏ, kích thước không đổi) thay cho bảng đã lưu.
+        - chunk_results: kết quả của đoạn vừa xong, tức các phần tử [completed - len(chunk_results), completed);
+          được thêm thành một BackgroundJobChunk mới, các đoạn trước không bị ghi lại.
+        Các thay đổi handler đã thêm vào db.session (ví dụ các dòng vừa insert) được commit CÙNG transaction
+        với tiến độ, nên sau khi khởi động lại không có đoạn nào bị ghi hai lần.
+        Ném JobLostError (và rollback) nếu công việc đã không còn thuộc về worker này.
+        """
+        values = {"completed": completed, "heartbeat_at": datetime.utcnow()}
+        if summary is not None:
+            values["results"] = json.dumps(summary, ensure_ascii=False)
+        updated = BackgroundJob.query.filter_by(id=job.id, worker_id=job.worker_id,
+                                                status=JOB_STATUS_RUNNING).update(values, synchronize_session=False)
+        if updated != 1:
+            db.session.rollback()
+            raise JobLostError(f"Job {job.id} is no longer owned by {job.worker_id}")
+        if chunk_results:
+            db.session.add(BackgroundJobChunk(job_id=job.id, start_index=completed - len(chunk_results),
+                                              item_count=len(chunk_results),
+                                              results=json.dumps(chunk_results, ensure_ascii=False)))
+        db.session.commit()
+
+    def heartbeat(self, job):
+        """
+        Chỉ cập nhật heartbeat (không lưu kết quả), trên kết nối riêng để không commit các thay đổi đang dở
+        trong db.session của handler. Handler gọi hàm này trong các bước dài giữa hai lần save_progress().
+        Ném JobLostError nếu công việc đã không còn thuộc về worker này.
+        """
+        table = BackgroundJob.__table__
+        with db.engine.begin() as connection:
+            updated = connection.execute(
+                table.update().where(table.c.id == job.id, table.c.worker_id == job.worker_id,
+                                     table.c.status == JOB_STATUS_RUNNING)
+                .values(heartbeat_at=datetime.utcnow())).rowcount
+        if updated != 1:
+            raise JobLostError(f"Job {job.id} is no longer owned by {job.worker_id}")
+
+    def run_job(self, job, worker_id):
+        """Chạy handler của công việc và ghi trạng thái cuối cùng."""
+        handler = self.handlers.get(job.job_type)
+        if handler is None:
+            self._finish(job, worker_id, {"status": JOB_STATUS_FAILED, "finished_at": datetime.utcnow(),
+                                          "error_message": f"No handler for job type '{job.job_type}'"})
+            return
+
+        try:
+            summary = handler(job, self)
+        except JobLostError as e:
+            # Worker khác đã nhận lại công việc: không phải trạng thái cuối, không dọn tài nguyên
+            db.session.rollback()
+            logger.warning("Bỏ công việc nền %s: %s", job.id, e)
+            return
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Lỗi khi chạy công việc nền %s (%s): %s", job.id, job.job_type, e)
+            # Kết quả từng phần đã lưu vẫn giữ nguyên để người dùng xem/lưu được phần đã xong
+            self._finish(job, worker_id, {"status": JOB_STATUS_FAILED, "finished_at": datetime.utcnow(),
+                                          "error_message": str(e)[:1000]})
+            return
+
+        values = {"status": JOB_STATUS_DONE, "finished_at": datetime.utcnow(), "heartbeat_at": datetime.utcnow()}
+        if summary is not None:
+            values["results"] = json.dumps(summary, ensure_ascii=False)
+        self._finish(job, worker_id, values)
+
+    def _finish(self, job, worker_id, values):
+        """Ghi trạng thái cuối (nếu worker còn giữ công việc), rồi chạy finalizer của loại công việc."""
+        finished = BackgroundJob.query.filter_by(id=job.id, worker_id=worker_id, status=JOB_STATUS_RUNNING) \
+            .update(values, synchronize_session=False)
+        db.session.commit()
+        if finished == 1:
+            self.finalize(job)
+
+    def finalize(self, job):
+        """Chạy finalizer của công việc đã ở trạng thái cuối. Lỗi chỉ được ghi log."""
+        finalizer = self.finalizers.get(job.job_type)
+        if finalizer is None:
+            return
+        try:
+            finalizer(job)
+        except Exception as e:
+            logger.error("Lỗi khi dọn dẹp công việc nền %s (%s): %s", job.id, job.job_type, e)
@@ -0,0 +1,161 @@
+# circuit_breaker.py
+
+# --- Standard Library Imports ---
+import logging
+import threading
+import time
+from collections import deque  # Cửa sổ trượt các kết quả/độ trễ gần nhất
+
+# --- Third-party Library Imports ---
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Các trạng thái của circuit breaker
+STATE_CLOSED = "closed"  # Bình thường: mọi lời gọi đều được đi qua
+STATE_OPEN = "open"  # Upstream đang hỏng: từ chối ngay, không chờ timeout
+STATE_HALF_OPEN = "half_open"  # Hết thời gian chờ: cho vài lời gọi thử (probe) để xem upstream đã hồi phục chưa
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Ném ra khi circuit breaker của upstream đang mở.
+    Kế thừa RequestException để các fetcher hiện có xử lý như một lỗi request thông thường.
+    """
+
+
+class LatencyTracker:
+    """
+    Lưu độ trễ của các lời gọi thành công gần nhất và tính timeout thích ứng từ p95.
+
+    timeout = clamp(p95 * multiplier, min_timeout, max_timeout). Khi chưa đủ min_samples mẫu
+    thì dùng max_timeout (giá trị cấu hình cố định trước đây).
+    """
+
+    def __init__(self, sample_size=200, min_samples=20, multiplier=3.0, min_timeout=2.0):
+        self.samples = deque(maxlen=max(1, int(sample_size)))
+        self.min_samples = min_samples
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        """Trả về phân vị (0..1) của các mẫu hiện có, hoặc None nếu chưa đủ mẫu."""
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def timeout(self, max_timeout):
+        p95 = self.percentile(0.95)
+        if p95 is None:
+            return max_timeout
+        return max(self.min_timeout, min(max_timeout, p95 * self.multiplier))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker cho MỘT upstream.
+
+    - CLOSED: ghi lại kết quả của window_size lời gọi gần nhất. Khi có ít nhất min_calls lời gọi và
+      tỉ lệ lỗi >= error_rate_threshold, hoặc tỉ lệ lời gọi chậm (> slow_call_seconds) >= slow_rate_threshold,
+      breaker chuyển sang OPEN.
+    - OPEN: mọi lời gọi bị từ chối ngay bằng CircuitOpenError trong open_seconds giây.
+    - HALF_OPEN: cho tối đa half_open_probes lời gọi thử. Thử thành công -> CLOSED; thất bại -> OPEN lại.
+
+    on_state_change(name, old_state, new_state, reason) được gọi (ngoài khóa) mỗi khi đổi trạng thái;
+    `reason` bằng tiếng Anh giống các error_message khác trong APILog.
+    """
+
+    def __init__(self, name, window_size=20, min_calls=10, error_rate_threshold=0.5,
+                 slow_call_seconds=None, slow_rate_threshold=0.8, open_seconds=30, half_open_probes=1,
+                 on_state_change=None):
+        self.name = name
+        self.window = deque(maxlen=max(1, int(window_size)))  # (thành công?, chậm?)
+        self.min_calls = max(1, int(min_calls))
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, int(half_open_probes))
+        self.on_state_change = on_state_change
+
+        self.state = STATE_CLOSED
+        self.last_reason = None
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _transition(self, new_state, reason):
+        """Đổi trạng thái (phải giữ self._lock). Trả về thông tin để báo ra ngoài sau khi nhả khóa."""
+        old_state = self.state
+        self.state = new_state
+        self.last_reason = reason
+        if new_state == STATE_OPEN:
+            self._opened_at = time.monotonic()
+        if new_state != STATE_HALF_OPEN:
+            self._probes_in_flight = 0
+        if new_state == STATE_CLOSED:
+            self.window.clear()
+        return (old_state, new_state, reason)
+
+    def _notify(self, change):
+        if change and self.on_state_change:
+            try:
+                self.on_state_change(self.name, *change)
+            except Exception as e:
+                logger.error("Lỗi khi ghi nhận đổi trạng thái circuit breaker '%s': %s", self.name, e)
+
+    def before_call(self):
+        """Gọi trước mỗi lời gọi upstream. Ném CircuitOpenError nếu breaker không cho đi qua."""
+        change = None
+        with self._lock:
+            if self.state == STATE_OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self._rejected += 1
+                    raise CircuitOpenError(f"Circuit breaker for {self.name} is open ({self.last_reason})")
+                change = self._transition(STATE_HALF_OPEN, f"Open for {self.open_seconds}s, sending probe")
+
+            if self.state == STATE_HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self._rejected += 1
+                    raise CircuitOpenError(f"Circuit breaker for {self.name} is half-open (probe in progress)")
+                self._probes_in_flight += 1
+        self._notify(change)
+
+    def record(self, success, latency_seconds):
+        """Ghi nhận kết quả một lời gọi đã được before_call() cho phép."""
+        slow = self.slow_call_seconds is not None and latency_seconds > self.slow_call_seconds
+        change = None
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if success and not slow:
+                    change = self._transition(STATE_CLOSED, f"Probe succeeded ({latency_seconds:.2f}s)")
+                else:
+                    change = self._transition(STATE_OPEN, "Probe failed" if not success
+                                              else f"Probe too slow ({latency_seconds:.2f}s)")
+            elif self.state == STATE_CLOSED:
+                self.window.append((success, slow))
+                if len(self.window) >= self.min_calls:
+                    calls = len(self.window)
+                    error_rate = sum(1 for ok, _ in self.window if not ok) / calls
+                    slow_rate = sum(1 for _, is_slow in self.window if is_slow) / calls
+                    if error_rate >= self.error_rate_threshold:
+                        change = self._transition(STATE_OPEN, f"Error rate {error_rate:.0%} over last {calls} calls")
+                    elif self.slow_call_seconds is not None and slow_rate >= self.slow_rate_threshold:
+                        change = self._transition(
+                            STATE_OPEN,
+                            f"{slow_rate:.0%} of last {calls} calls slower than {self.slow_call_seconds}s"
+                        )
+        self._notify(change)
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "reason": self.last_reason, "rejected": self._rejected}
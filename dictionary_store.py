@@ -0,0 +1,252 @@
+# dictionary_store.py
+
+# --- Standard Library Imports ---
+import bz2
+import gzip
+import json  # Các mục từ điển được lưu dưới dạng JSON (đúng định dạng của dictionaryapi.dev)
+import logging
+import mmap  # Ánh xạ file vào bộ nhớ: các worker Gunicorn dùng chung page cache của hệ điều hành
+import os
+import shutil
+import struct  # Đọc/ghi header và bảng chỉ mục nhị phân có kích thước cố định
+import tempfile
+import threading
+import time
+import zlib  # Nén từng mục để file gọn hơn
+
+# --- Application-Specific Imports ---
+from lookup_cache import normalize_word_key
+
+logger = logging.getLogger(__name__)
+
+# === ĐỊNH DẠNG FILE ===
+# [header][bảng chỉ mục][vùng khóa][vùng dữ liệu]
+#   header:     magic (8 byte), số bản ghi (uint32), offset bảng chỉ mục, vùng khóa, vùng dữ liệu (uint64)
+#   chỉ mục:    mảng các bản ghi cố định, SẮP XẾP theo khóa (bytes UTF-8) -> tra bằng tìm kiếm nhị phân
+#               mỗi bản ghi: offset khóa (uint32), độ dài khóa (uint16), offset dữ liệu (uint64), độ dài dữ liệu (uint32)
+#   vùng khóa:  các khóa (từ đã chuẩn hóa) nối liền nhau
+#   vùng dữ liệu: mỗi mục là JSON của một entry dictionaryapi.dev đã nén zlib
+# Một từ có nhiều entry thì có nhiều bản ghi liên tiếp trong chỉ mục cùng một khóa.
+STORE_MAGIC = b"PVDSTR01"
+HEADER_FORMAT = "<8sIQQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RECORD_FORMAT = "<IHQI"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+
+def _open_text(path):
+    """Mở file văn bản, tự giải nén nếu là .bz2/.gz."""
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def _iter_dump_entries(dump_path):
+    """
+    Đọc lần lượt các entry từ file dump. Hỗ trợ hai dạng:
+        - JSON Lines: mỗi dòng là một entry (hoặc một mảng entry như response của dictionaryapi.dev).
+        - Một mảng JSON duy nhất chứa các entry.
+    Mỗi entry phải có key "word".
+    """
+    with _open_text(dump_path) as f:
+        first_char = f.read(1)
+        while first_char and first_char.isspace():
+            first_char = f.read(1)
+        if first_char == '[':
+            # Mảng JSON: phải nạp cả file (nên dùng JSON Lines cho dump lớn)
+            items = json.loads(first_char + f.read())
+        else:
+            items = None
+
+        if items is not None:
+            for item in items:
+                if isinstance(item, list):
+                    yield from item
+                else:
+                    yield item
+            return
+
+        line = first_char + f.readline()
+        while line:
+            line = line.strip()
+            if line:
+                item = json.loads(line)
+                if isinstance(item, list):
+                    yield from item
+                else:
+                    yield item
+            line = f.readline()
+
+
+def import_dictionary_dump(dump_path, store_path):
+    """
+    Nạp một file dump từ điển (định dạng entry của dictionaryapi.dev) vào file store nhị phân.
+
+    Dữ liệu được ghi thẳng ra file tạm theo luồng; trong bộ nhớ chỉ giữ bảng chỉ mục (khóa + offset).
+    File hoàn chỉnh được đổi tên vào vị trí đích nên tiến trình đang đọc không bao giờ thấy file dở dang.
+
+    Returns:
+        dict: {'entries': số entry đã nạp, 'words': số từ khác nhau, 'skipped': số entry không hợp lệ}.
+    """
+    store_dir = os.path.dirname(os.path.abspath(store_path))
+    os.makedirs(store_dir, exist_ok=True)
+
+    index = []  # (khóa bytes, offset dữ liệu, độ dài dữ liệu)
+    skipped = 0
+
+    # 1. Ghi dữ liệu nén của từng entry ra file tạm
+    with tempfile.TemporaryFile(dir=store_dir) as data_file:
+        data_size = 0
+        for entry in _iter_dump_entries(dump_path):
+            word_key = normalize_word_key(entry.get("word") if isinstance(entry, dict) else None)
+            key_bytes = word_key.encode("utf-8")
+            if not word_key or len(key_bytes) > 0xFFFF:
+                skipped += 1
+                continue
+            blob = zlib.compress(json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode("utf-8"))
+            data_file.write(blob)
+            index.append((key_bytes, data_size, len(blob)))
+            data_size += len(blob)
+
+        # 2. Sắp xếp chỉ mục theo khóa (giữ thứ tự gốc của các entry cùng một từ)
+        index.sort(key=lambda record: (record[0], record[1]))
+
+        # 3. Dựng vùng khóa (mỗi khóa chỉ lưu một lần) và bảng chỉ mục
+        keys_blob = bytearray()
+        key_offsets = {}
+        records = bytearray()
+        for key_bytes, data_offset, data_len in index:
+            key_offset = key_offsets.get(key_bytes)
+            if key_offset is None:
+                key_offset = key_offsets[key_bytes] = len(keys_blob)
+                keys_blob += key_bytes
+            records += struct.pack(RECORD_FORMAT, key_offset, len(key_bytes), data_offset, data_len)
+
+        index_offset = HEADER_SIZE
+        keys_offset = index_offset + len(records)
+        data_offset_base = keys_offset + len(keys_blob)
+
+        # 4. Ghi file đích: header + chỉ mục + khóa + sao chép vùng dữ liệu
+        tmp_path = store_path + '.tmp'
+        with open(tmp_path, 'wb') as out:
+            out.write(struct.pack(HEADER_FORMAT, STORE_MAGIC, len(index), index_offset, keys_offset,
+                                  data_offset_base))
+            out.write(records)
+            out.write(keys_blob)
+            data_file.seek(0)
+            shutil.copyfileobj(data_file, out)
+        os.replace(tmp_path, store_path)
+
+    return {'entries': len(index), 'words': len(key_offsets), 'skipped': skipped}
+
+
+class _MappedStore:
+    """Một file store đã được mmap. Mở file chỉ đọc header (O(1)); các trang được nạp khi cần."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # File rỗng không mmap được
+            self._file.close()
+            raise
+        magic, self.count, self.index_offset, self.keys_offset, self.data_offset = \
+            struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if magic != STORE_MAGIC:
+            self.close()
+            raise ValueError(f"File {path} không phải dictionary store hợp lệ.")
+
+    def _record(self, position):
+        return struct.unpack_from(RECORD_FORMAT, self._mm, self.index_offset + position * RECORD_SIZE)
+
+    def _key_at(self, position):
+        key_offset, key_len, _, _ = self._record(position)
+        start = self.keys_offset + key_offset
+        return self._mm[start:start + key_len]
+
+    def lookup(self, key_bytes):
+        """Tìm kiếm nhị phân; trả về list các entry (dict) của từ, hoặc [] nếu không có."""
+        # 1. lower_bound: vị trí đầu tiên có khóa >= key_bytes
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key_bytes:
+                low = middle + 1
+            else:
+                high = middle
+
+        # 2. Đọc tất cả các bản ghi liên tiếp có cùng khóa
+        entries = []
+        position = low
+        while position < self.count:
+            key_offset, key_len, data_offset, data_len = self._record(position)
+            start = self.keys_offset + key_offset
+            if self._mm[start:start + key_len] != key_bytes:
+                break
+            data_start = self.data_offset + data_offset
+            entries.append(json.loads(zlib.decompress(self._mm[data_start:data_start + data_len])))
+            position += 1
+        return entries
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class DictionaryStore:
+    """
+    Tra từ trong file store do import_dictionary_dump() tạo ra.
+
+    File được mở lười ở lần tra đầu tiên và mở lại nếu file bị thay thế (import lại).
+    Nếu file chưa tồn tại, lookup() trả về None và kiểm tra lại sau recheck_seconds.
+    """
+
+    def __init__(self, store_path, recheck_seconds=60):
+        self.store_path = store_path
+        self.recheck_seconds = recheck_seconds
+        self._store = None
+        self._store_mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _current_store(self):
+        """Trả về _MappedStore hiện tại (có giới hạn tần suất kiểm tra file), hoặc None nếu chưa có store."""
+        now = time.monotonic()
+        if self._last_check and now - self._last_check < self.recheck_seconds:
+            return self._store
+
+        with self._lock:
+            self._last_check = now
+            try:
+                mtime = os.path.getmtime(self.store_path)
+            except OSError:
+                mtime = None
+
+            if mtime != self._store_mtime:
+                # File mới xuất hiện/bị thay thế: mmap lại. Bản cũ không close ngay vì thread khác có thể đang đọc.
+                try:
+                    self._store = _MappedStore(self.store_path) if mtime is not None else None
+                except (OSError, ValueError) as e:
+                    logger.error("Không thể mở dictionary store '%s': %s", self.store_path, e)
+                    self._store = None
+                self._store_mtime = mtime
+            return self._store
+
+    def is_available(self):
+        return self._current_store() is not None
+
+    def lookup(self, word):
+        """
+        Returns:
+            list | None: Các entry (định dạng dictionaryapi.dev) của từ; [] nếu store không có từ này;
+                         None nếu chưa có file store.
+        """
+        store = self._current_store()
+        if store is None:
+            return None
+        word_key = normalize_word_key(word)
+        if not word_key:
+            return []
+        return store.lookup(word_key.encode("utf-8"))
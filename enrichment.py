@@ -0,0 +1,470 @@
+# enrichment.py
+
+# --- Standard Library Imports ---
+import logging
+import threading  # Semaphore giới hạn số lời gọi đồng thời tới từng API bên ngoài
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED  # Pool worker dùng chung để chạy các lời gọi API song song
+
+logger = logging.getLogger(__name__)
+
+# === GIÁ TRỊ MẶC ĐỊNH CHO MỘT THẺ TỪ VỰNG ===
+# Giữ nguyên các chuỗi mà enter_words_page trước đây dùng, để template và JavaScript không phải thay đổi.
+DEFAULT_DEFINITION_EN = "No English definition found."
+DEFAULT_WORD_TYPE = "N/A"
+DEFAULT_IPA = "N/A"
+DEFAULT_EXAMPLE_EN = "N/A"
+DEFAULT_EXAMPLE_VI = "Không có câu ví dụ."
+DEFAULT_DEFINITION_VI = "Không thể dịch giải thích này."
+
+# Tên upstream dùng làm khóa cho giới hạn đồng thời. Trùng với api_name đã ghi trong APILog.
+UPSTREAM_DICTIONARY = "dictionary_api"
+UPSTREAM_TATOEBA = "tatoeba_api"
+UPSTREAM_TRANSLATOR = "deep_translator_google"
+UPSTREAM_LIBRE_BATCH = "libretranslate_batch"
+UPSTREAM_LIBRETRANSLATE = "libretranslate"  # Host LibreTranslate (dùng chung cho dịch batch và dịch đơn lẻ)
+
+# Cách dịch định nghĩa trong một lần enrich
+TRANSLATION_MODE_BATCH = "batch"  # Gom tất cả định nghĩa của request rồi dịch theo batch
+TRANSLATION_MODE_SINGLE = "single"  # Mỗi từ một lời gọi dịch, ngay khi có định nghĩa
+
+
+def needs_translation(english_definition):
+    """Kiểm tra định nghĩa tiếng Anh có phải là nội dung thật (không phải placeholder) để đem đi dịch không."""
+    if not english_definition or not english_definition.strip():
+        return False
+    return english_definition.lower() not in ("n/a", DEFAULT_DEFINITION_EN.lower())
+
+
+def text_to_translate_for(original_word, english_definition):
+    """
+    Chọn văn bản cần dịch cho một từ theo đúng logic cũ của enter_words_page:
+    - Nếu định nghĩa trùng với chính từ gốc thì dịch từ gốc.
+    - Định nghĩa placeholder thì không dịch (trả về None).
+    """
+    if not needs_translation(english_definition):
+        return None
+    if english_definition.lower() == original_word.lower():
+        return original_word
+    return english_definition
+
+
+def split_translation_batches(texts, max_items, max_bytes):
+    """
+    Chia danh sách văn bản thành các batch không vượt quá max_items phần tử và max_bytes byte (UTF-8).
+    Một văn bản dài hơn max_bytes vẫn được gửi, nhưng nằm riêng trong một batch.
+    """
+    max_items = max(1, int(max_items))
+    batch, batch_bytes = [], 0
+    for text in texts:
+        text_bytes = len(text.encode("utf-8"))
+        if batch and (len(batch) >= max_items or batch_bytes + text_bytes > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(text)
+        batch_bytes += text_bytes
+    if batch:
+        yield batch
+
+
+def parse_libre_batch_response(data, expected_count):
+    """
+    Lấy danh sách bản dịch từ phản hồi của LibreTranslate cho một batch (q là list).
+
+    LibreTranslate trả về {"translatedText": [...]} (cùng key với dịch đơn lẻ, giá trị là list);
+    vẫn nhận key "translatedTexts" mà một số bản fork dùng.
+
+    Returns:
+        list[str] | None: Các bản dịch theo đúng thứ tự đầu vào, hoặc None nếu sai định dạng / số lượng không khớp.
+    """
+    if not isinstance(data, dict):
+        return None
+    translated_texts = data.get("translatedText")
+    if not isinstance(translated_texts, list):
+        translated_texts = data.get("translatedTexts")
+    if not isinstance(translated_texts, list) or len(translated_texts) != expected_count:
+        return None
+    return translated_texts
+
+
+def build_word_result(details, example_data, definition_vi):
+    """
+    Gộp kết quả từ các nguồn thành một thẻ từ vựng đúng định dạng mà enter_words.html đang dùng.
+
+    Args:
+        details (dict | None): Phần tử đầu tiên trả về từ get_word_details_dictionaryapi (hoặc None).
+        example_data (dict | None): Kết quả của get_tatoeba_examples (hoặc None).
+        definition_vi (str | None): Bản dịch tiếng Việt của định nghĩa (hoặc None nếu không dịch được).
+
+    Returns:
+        dict: Thẻ từ vựng với các key type, definition_en, definition_vi, example_sentence, example_sentence_vi, ipa.
+    """
+    details = details or {}
+    return {
+        "type": details.get("type", DEFAULT_WORD_TYPE),
+        "definition_en": details.get("definition_en", DEFAULT_DEFINITION_EN),
+        "definition_vi": definition_vi or DEFAULT_DEFINITION_VI,
+        "example_sentence": example_data['example_en'] if example_data else DEFAULT_EXAMPLE_EN,
+        "example_sentence_vi": example_data['example_vi'] if example_data else DEFAULT_EXAMPLE_VI,
+        "ipa": details.get("ipa", DEFAULT_IPA)
+    }
+
+
+class WordEnrichmentEngine:
+    """
+    Bộ máy lấy thông tin (định nghĩa, IPA, câu ví dụ, bản dịch) cho nhiều từ cùng lúc.
+
+    Thay vì gọi tuần tự từng API cho từng từ trên request thread, các lời gọi được rải ra
+    một pool worker có giới hạn. Mỗi upstream có thêm một semaphore riêng để không dồn quá nhiều
+    request đồng thời vào một API. Bản dịch định nghĩa được gọi ngay khi kết quả từ điển của từ đó về,
+    không phải chờ các từ khác.
+
+    Ở chế độ 'batch', bản dịch không được gọi riêng cho từng từ: sau khi có đủ định nghĩa,
+    tất cả được gom lại và dịch qua `translate_batch` (vài request cho cả danh sách). Đoạn nào batch
+    không dịch được sẽ được dịch lại từng đoạn bằng `translate`.
+
+    Các hàm fetcher được truyền vào từ app.py (tránh import vòng tròn) và phải nhận tham số
+    keyword `user_id` để APILog vẫn ghi đúng người dùng khi chạy ngoài request thread.
+    """
+
+    def __init__(self, app, fetch_details, fetch_example, translate, translate_batch=None,
+                 translation_mode=TRANSLATION_MODE_SINGLE, max_workers=8, upstream_limits=None,
+                 normalize_word=None):
+        """
+        Args:
+            app (Flask): Ứng dụng Flask, dùng để mở app context trong các worker thread (cần cho db.session).
+            fetch_details (callable): Hàm lấy định nghĩa/IPA, ví dụ get_word_details_dictionaryapi.
+            fetch_example (callable): Hàm lấy câu ví dụ, ví dụ get_tatoeba_examples.
+            translate (callable): Hàm dịch một đoạn văn bản, ví dụ translate_with_deep_translator.
+            translate_batch (callable, optional): Hàm dịch nhiều đoạn, trả về dict {gốc: bản dịch},
+                                                  ví dụ translate_texts_batched.
+            translation_mode (str, optional): 'batch' hoặc 'single'. 'batch' cần có translate_batch.
+            max_workers (int, optional): Số worker tối đa của pool dùng chung. Mặc định 8.
+            upstream_limits (dict, optional): {tên upstream: số lời gọi đồng thời tối đa}.
+                                              Upstream không có trong dict sẽ chỉ bị giới hạn bởi max_workers.
+            normalize_word (callable, optional): Hàm đổi từ người dùng nhập thành khóa tra cứu,
+                                                 ví dụ lemmatizer.lemmatize. None -> tra đúng từ đã nhập.
+        """
+        self.app = app
+        self.fetch_details = fetch_details
+        self.fetch_example = fetch_example
+        self.translate = translate
+        self.translate_batch = translate_batch
+        self.normalize_word = normalize_word
+        self.translation_mode = translation_mode if translate_batch else TRANSLATION_MODE_SINGLE
+        self.max_workers = max(1, int(max_workers))
+        self._upstream_semaphores = {
+            name: threading.BoundedSemaphore(max(1, int(limit)))
+            for name, limit in (upstream_limits or {}).items()
+        }
+        self._executor = None  # Tạo lười (lazy) ở lần dùng đầu tiên
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        """Trả về pool worker dùng chung, tạo mới nếu chưa có."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="word-enrich")
+        return self._executor
+
+    def _call_upstream(self, upstream_name, fn, *args, **kwargs):
+        """Gọi fn trong giới hạn đồng thời của upstream tương ứng (nếu có cấu hình)."""
+        semaphore = self._upstream_semaphores.get(upstream_name)
+        if semaphore is None:
+            return fn(*args, **kwargs)
+        with semaphore:
+            return fn(*args, **kwargs)
+
+    def _translate_definition(self, original_word, english_definition, user_id):
+        """
+        Dịch định nghĩa sang tiếng Việt theo đúng logic cũ của enter_words_page:
+        - Nếu định nghĩa trùng với chính từ gốc thì dịch từ gốc.
+        - Chỉ nhận bản dịch nếu nó khác văn bản gốc.
+        Trả về None nếu không có bản dịch dùng được.
+        """
+        text_to_translate = text_to_translate_for(original_word, english_definition)
+        if text_to_translate is None:
+            return None
+        return self._translate_text(text_to_translate, user_id)
+
+    def _translate_text(self, text_to_translate, user_id):
+        """Dịch một đoạn văn bản; chỉ nhận bản dịch khác văn bản gốc."""
+        translated = self._call_upstream(UPSTREAM_TRANSLATOR, self.translate, text_to_translate, user_id=user_id)
+        if translated and translated.strip().lower() != text_to_translate.strip().lower():
+            return translated
+        return None
+
+    def _fetch_details(self, lookup_word, user_id, fallback_word=None):
+        """
+        Tra từ điển theo khóa tra cứu (lemma). Nếu lemma không có trong từ điển (quy tắc tách hậu tố
+        đoán sai, ví dụ tên riêng) thì tra lại bằng chính từ người dùng nhập.
+        """
+        detailed_entries = self._call_upstream(UPSTREAM_DICTIONARY, self.fetch_details, lookup_word, user_id=user_id)
+        if not detailed_entries and fallback_word:
+            detailed_entries = self._call_upstream(UPSTREAM_DICTIONARY, self.fetch_details,
+                                                   fallback_word, user_id=user_id)
+        return detailed_entries[0] if detailed_entries else None
+
+    def _details_then_translate(self, original_word, user_id, fallback_word=None):
+        """Task cho worker: lấy định nghĩa từ từ điển rồi dịch ngay trong cùng worker."""
+        with self.app.app_context():
+            details = self._fetch_details(original_word, user_id, fallback_word)
+            english_definition = (details or {}).get("definition_en", DEFAULT_DEFINITION_EN)
+            definition_vi = self._translate_definition(original_word, english_definition, user_id)
+            return details, definition_vi
+
+    def _details(self, original_word, user_id, fallback_word=None):
+        """Task cho worker (chế độ batch): chỉ lấy định nghĩa, việc dịch để dành cho bước dịch batch."""
+        with self.app.app_context():
+            return self._fetch_details(original_word, user_id, fallback_word)
+
+    def _translate_batch(self, texts, user_id):
+        """Task cho worker: dịch cả danh sách văn bản bằng translate_batch."""
+        with self.app.app_context():
+            return self._call_upstream(UPSTREAM_LIBRE_BATCH, self.translate_batch, texts, user_id=user_id)
+
+    def _translate_single(self, text_to_translate, user_id):
+        """Task cho worker: dịch lại một đoạn mà bước dịch batch không dịch được."""
+        with self.app.app_context():
+            return self._translate_text(text_to_translate, user_id)
+
+    def _translate_all(self, texts, user_id):
+        """
+        Bước dịch của chế độ batch. Trả về dict {văn bản gốc: bản dịch}.
+        Lỗi của cả batch không làm hỏng request: mọi đoạn sẽ được dịch lại từng đoạn.
+        """
+        executor = self._get_executor()
+        unique_texts = list(dict.fromkeys(texts))
+        if not unique_texts:
+            return {}
+
+        # 1. Dịch batch
+        try:
+            translations = executor.submit(self._translate_batch, unique_texts, user_id).result() or {}
+        except Exception as e:
+            logger.error("Lỗi khi dịch batch %s đoạn văn bản: %s", len(unique_texts), e, extra={"user_id": user_id})
+            translations = {}
+
+        # 2. Đoạn nào chưa có bản dịch thì gọi dịch từng đoạn (song song, trong giới hạn của upstream dịch)
+        fallback_futures = {
+            text: executor.submit(self._translate_single, text, user_id)
+            for text in unique_texts if not translations.get(text)
+        }
+        for text, future in fallback_futures.items():
+            try:
+                translated = future.result()
+            except Exception as e:
+                logger.error("Lỗi khi dịch lại '%s': %s", text[:50], e, extra={"user_id": user_id})
+                translated = None
+            if translated:
+                translations[text] = translated
+        return translations
+
+    def translate_texts(self, texts, user_id=None):
+        """
+        Dịch nhiều đoạn văn bản (ví dụ định nghĩa có sẵn trong file nhập) theo cùng cách với bước dịch batch.
+
+        Returns:
+            dict: {văn bản gốc: bản dịch} cho các đoạn dịch được.
+        """
+        return self._translate_all(texts, user_id)
+
+    def _example(self, original_word, user_id, fallback_word=None):
+        """
+        Task cho worker: lấy câu ví dụ Anh - Việt. Giống _fetch_details, nếu lemma không có câu ví dụ
+        thì tra lại bằng chính từ người dùng nhập.
+        """
+        with self.app.app_context():
+            example_data = self._call_upstream(UPSTREAM_TATOEBA, self.fetch_example, original_word, user_id=user_id)
+            if not example_data and fallback_word:
+                example_data = self._call_upstream(UPSTREAM_TATOEBA, self.fetch_example, fallback_word,
+                                                   user_id=user_id)
+            return example_data
+
+    def _plan_lookups(self, words):
+        """
+        Bước chuẩn hóa ở đầu pipeline: mỗi từ người dùng nhập được đổi thành khóa tra cứu (lemma),
+        để "running", "Ran", "runs " và "RUN" chỉ tạo ra MỘT lần tra (cùng khóa cache, cùng lời gọi API).
+
+        Returns:
+            tuple: (danh sách khóa tra cứu theo thứ tự của words,
+                    {khóa: từ người dùng nhập, dùng để tra lại khi lemma không có trong từ điển}).
+        """
+        if self.normalize_word is None:
+            return list(words), {}
+        lookup_keys = []
+        fallbacks = {}
+        for original_word in words:
+            lookup_key = self.normalize_word(original_word) or original_word
+            lookup_keys.append(lookup_key)
+            if lookup_key != " ".join(original_word.split()).casefold():
+                fallbacks.setdefault(lookup_key, original_word)
+        return lookup_keys, fallbacks
+
+    def enrich(self, words, user_id=None):
+        """
+        Lấy thông tin cho danh sách từ và trả về kết quả theo ĐÚNG thứ tự đầu vào.
+        Việc tra cứu dùng khóa đã chuẩn hóa (lemma); kết quả vẫn gắn với đúng từ người dùng đã nhập.
+
+        Args:
+            words (list): Danh sách từ (đã strip) người dùng nhập.
+            user_id (int, optional): ID người dùng để ghi vào APILog. Phải lấy từ session trên request thread
+                                     trước khi gọi hàm này, vì worker thread không có request context.
+
+        Returns:
+            list: Danh sách tuple (từ gốc, [thẻ từ vựng]) theo thứ tự của `words`.
+        """
+        lookup_keys, fallbacks = self._plan_lookups(words)
+        unique_keys = list(dict.fromkeys(lookup_keys))
+        if self.translation_mode == TRANSLATION_MODE_BATCH:
+            cards_by_key = dict(self._enrich_batched(unique_keys, fallbacks, user_id))
+        else:
+            cards_by_key = dict(self._enrich_single(unique_keys, fallbacks, user_id))
+        # Mỗi từ nhận một bản sao riêng của thẻ (hai từ có cùng lemma không dùng chung dict)
+        return [(original_word, [dict(card) for card in cards_by_key[lookup_key]])
+                for original_word, lookup_key in zip(words, lookup_keys)]
+
+    def _enrich_single(self, words, fallbacks, user_id):
+        """Chế độ 'single': mỗi từ được dịch ngay khi có định nghĩa. Trả về [(khóa, [thẻ])] theo thứ tự words."""
+        executor = self._get_executor()
+
+        # 1. Rải tất cả các task ra pool trước, sau đó mới chờ kết quả
+        pending = []
+        for original_word in words:
+            details_future = executor.submit(self._details_then_translate, original_word, user_id,
+                                             fallbacks.get(original_word))
+            example_future = executor.submit(self._example, original_word, user_id,
+                                             fallbacks.get(original_word))
+            pending.append((original_word, details_future, example_future))
+
+        # 2. Thu kết quả theo thứ tự đầu vào. Lỗi không mong muốn của một từ không làm hỏng cả request.
+        results = []
+        for original_word, details_future, example_future in pending:
+            try:
+                details, definition_vi = details_future.result()
+            except Exception as e:
+                logger.error("Lỗi khi lấy định nghĩa cho '%s': %s", original_word, e,
+                             extra={"word": original_word, "user_id": user_id})
+                details, definition_vi = None, None
+            try:
+                example_data = example_future.result()
+            except Exception as e:
+                logger.error("Lỗi khi lấy câu ví dụ cho '%s': %s", original_word, e,
+                             extra={"word": original_word, "user_id": user_id})
+                example_data = None
+
+            results.append((original_word, [build_word_result(details, example_data, definition_vi)]))
+        return results
+
+    def enrich_iter(self, words, user_id=None):
+        """
+        Giống enrich() nhưng trả kết quả của từng từ NGAY khi từ đó xong (theo thứ tự hoàn thành),
+        kèm vị trí của từ trong `words` để phía hiển thị đặt đúng chỗ.
+
+        Ở chế độ 'batch', các từ xong cùng lúc được dịch chung một batch, nên số lời gọi dịch vẫn ít
+        trong khi từ đầu tiên không phải chờ cả danh sách.
+
+        Yields:
+            tuple: (vị trí trong words, từ gốc, [thẻ từ vựng]).
+        """
+        executor = self._get_executor()
+        batch_mode = self.translation_mode == TRANSLATION_MODE_BATCH
+        details_task = self._details if batch_mode else self._details_then_translate
+
+        # Các từ có cùng khóa tra cứu (lemma) chỉ được tra một lần
+        lookup_keys, fallbacks = self._plan_lookups(words)
+        positions = {}  # khóa -> các vị trí trong words
+        for index, lookup_key in enumerate(lookup_keys):
+            positions.setdefault(lookup_key, []).append(index)
+
+        # 1. Rải tất cả các task ra pool; mỗi future biết nó thuộc khóa nào và là phần nào
+        future_slots = {}
+        parts = {}  # khóa -> {'details': ..., 'example': ...}
+        for lookup_key in positions:
+            future_slots[executor.submit(details_task, lookup_key, user_id,
+                                         fallbacks.get(lookup_key))] = (lookup_key, 'details')
+            future_slots[executor.submit(self._example, lookup_key, user_id,
+                                         fallbacks.get(lookup_key))] = (lookup_key, 'example')
+            parts[lookup_key] = {}
+
+        # 2. Mỗi khi có future xong, trả về các từ đã đủ cả hai phần
+        pending = set(future_slots)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            ready = []
+            for future in done:
+                lookup_key, part = future_slots[future]
+                try:
+                    parts[lookup_key][part] = future.result()
+                except Exception as e:
+                    logger.error("Lỗi khi lấy %s cho '%s': %s",
+                                 'định nghĩa' if part == 'details' else 'câu ví dụ', lookup_key, e,
+                                 extra={"word": lookup_key, "user_id": user_id})
+                    parts[lookup_key][part] = None
+                if len(parts[lookup_key]) == 2:
+                    ready.append(lookup_key)
+            if not ready:
+                continue
+
+            cards_by_key = {}
+            if batch_mode:
+                texts = {}
+                for lookup_key in ready:
+                    english_definition = (parts[lookup_key]['details'] or {}).get("definition_en",
+                                                                                  DEFAULT_DEFINITION_EN)
+                    texts[lookup_key] = text_to_translate_for(lookup_key, english_definition)
+                translations = self._translate_all([text for text in texts.values() if text], user_id)
+                for lookup_key in ready:
+                    word_parts = parts.pop(lookup_key)
+                    definition_vi = translations.get(texts[lookup_key]) if texts[lookup_key] else None
+                    cards_by_key[lookup_key] = [build_word_result(word_parts['details'], word_parts['example'],
+                                                                  definition_vi)]
+            else:
+                for lookup_key in ready:
+                    word_parts = parts.pop(lookup_key)
+                    details, definition_vi = word_parts['details'] or (None, None)
+                    cards_by_key[lookup_key] = [build_word_result(details, word_parts['example'], definition_vi)]
+
+            for lookup_key, cards in cards_by_key.items():
+                for index in positions[lookup_key]:
+                    yield index, words[index], [dict(card) for card in cards]
+
+    def _enrich_batched(self, words, fallbacks, user_id):
+        """Chế độ 'batch': tất cả định nghĩa được dịch chung trong một bước dịch batch. Trả về [(khóa, [thẻ])]."""
+        executor = self._get_executor()
+
+        # 1. Lấy định nghĩa và câu ví dụ song song cho tất cả các từ
+        pending = [
+            (original_word,
+             executor.submit(self._details, original_word, user_id, fallbacks.get(original_word)),
+             executor.submit(self._example, original_word, user_id, fallbacks.get(original_word)))
+            for original_word in words
+        ]
+
+        collected = []
+        for original_word, details_future, example_future in pending:
+            try:
+                details = details_future.result()
+            except Exception as e:
+                logger.error("Lỗi khi lấy định nghĩa cho '%s': %s", original_word, e,
+                             extra={"word": original_word, "user_id": user_id})
+                details = None
+            try:
+                example_data = example_future.result()
+            except Exception as e:
+                logger.error("Lỗi khi lấy câu ví dụ cho '%s': %s", original_word, e,
+                             extra={"word": original_word, "user_id": user_id})
+                example_data = None
+            english_definition = (details or {}).get("definition_en", DEFAULT_DEFINITION_EN)
+            collected.append((original_word, details, example_data,
+                              text_to_translate_for(original_word, english_definition)))
+
+        # 2. Dịch tất cả định nghĩa (và các từ gốc dùng thay định nghĩa) trong một bước
+        translations = self._translate_all([text for _, _, _, text in collected if text], user_id)
+
+        # 3. Dựng thẻ từ vựng theo thứ tự đầu vào
+        return [
+            (original_word, [build_word_result(details, example_data, translations.get(text) if text else None)])
+            for original_word, details, example_data, text in collected
+        ]
@@ -0,0 +1,140 @@
+# hedging.py
+
+# --- Standard Library Imports ---
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# --- Application-Specific Imports ---
+from circuit_breaker import LatencyTracker  # Cửa sổ trượt độ trễ, dùng để tính độ trễ phân vị của provider chính
+
+logger = logging.getLogger(__name__)
+
+# Vai trò của một lần gọi trong một yêu cầu hedged (ghi vào APILog.hedge_role)
+HEDGE_ROLE_PRIMARY = "primary"
+HEDGE_ROLE_SECONDARY = "secondary"
+
+
+class HedgedRequester:
+    """
+    Gửi một yêu cầu tới provider chính; nếu sau `delay` giây chưa có câu trả lời tốt thì gửi thêm
+    CÙNG yêu cầu đó tới provider phụ. Câu trả lời tốt đầu tiên được dùng; lời gọi còn lại bị hủy nếu
+    chưa chạy, hoặc bị bỏ qua (vẫn chạy xong và tự ghi log) nếu đã chạy.
+
+    - delay = độ trễ phân vị `percentile` (ví dụ p95) của provider chính, lấy từ các lần gọi gần nhất,
+      kẹp trong [min_delay, max_delay]. Khi chưa đủ mẫu thì dùng default_delay.
+    - Provider chính trả lời nhanh nhưng không dùng được (lỗi, circuit breaker đang mở) -> gửi ngay sang provider phụ,
+      không chờ hết delay.
+    - Các lời gọi chạy trong pool riêng (không dùng pool của enrichment_engine, tránh tự chờ chính mình).
+
+    stats() cho biết giá của việc hedge (tỉ lệ yêu cầu phải gọi thêm provider phụ) và cái được
+    (độ trễ p50/p95/p99 của yêu cầu hedged so với riêng provider chính).
+    """
+
+    def __init__(self, name, max_workers=8, percentile=0.95, min_delay=0.1, max_delay=5.0, default_delay=1.0,
+                 sample_size=200, min_samples=20):
+        self.name = name
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.default_delay = default_delay
+        self.max_workers = max(2, int(max_workers))
+
+        self.primary_latency = LatencyTracker(sample_size=sample_size, min_samples=min_samples)
+        self.request_latency = LatencyTracker(sample_size=sample_size, min_samples=1)
+        self._counters = {"requests": 0, "hedged": 0, "primary_wins": 0, "secondary_wins": 0, "no_answer": 0}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix=f"hedge-{self.name}")
+        return self._executor
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def current_delay(self):
+        """Thời gian chờ provider chính trước khi gửi sang provider phụ (giây)."""
+        observed = self.primary_latency.percentile(self.percentile)
+        if observed is None:
+            return self.default_delay
+        return max(self.min_delay, min(self.max_delay, observed))
+
+    def call(self, primary, secondary, is_good):
+        """
+        Args:
+            primary (callable): Hàm không tham số gọi provider chính.
+            secondary (callable): Hàm không tham số gọi provider phụ.
+            is_good (callable): is_good(kết quả) -> True nếu kết quả dùng được.
+
+        Returns:
+            tuple: (kết quả, vai trò thắng) — vai trò là HEDGE_ROLE_PRIMARY/SECONDARY, hoặc None nếu không
+                   provider nào cho kết quả tốt (khi đó kết quả là của provider chính nếu có).
+        """
+        executor = self._get_executor()
+        started = time.monotonic()
+        self._count("requests")
+
+        def timed_primary():
+            call_started = time.monotonic()
+            result = primary()
+            if is_good(result):
+                # Ghi cả khi provider chính thua: phân vị không bị lệch về phía các lời gọi nhanh
+                self.primary_latency.add(time.monotonic() - call_started)
+            return result
+
+        # 1. Gửi tới provider chính và chờ tối đa `delay`
+        futures = {executor.submit(timed_primary): HEDGE_ROLE_PRIMARY}
+        done, _ = wait(futures, timeout=self.current_delay())
+
+        fallback_result = None
+        secondary_sent = False
+        while True:
+            # 2. Lấy câu trả lời tốt đầu tiên trong các lời gọi đã xong
+            for future in done:
+                role = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning("Hedged request '%s' (%s) lỗi: %s", self.name, role, e)
+                    continue
+                if is_good(result):
+                    for loser in futures:
+                        loser.cancel()  # Chỉ hủy được nếu chưa chạy; đang chạy thì bỏ qua kết quả
+                    self._count("primary_wins" if role == HEDGE_ROLE_PRIMARY else "secondary_wins")
+                    self.request_latency.add(time.monotonic() - started)
+                    return result, role
+                if role == HEDGE_ROLE_PRIMARY:
+                    fallback_result = result
+
+            # 3. Chưa có câu trả lời tốt: gửi sang provider phụ (chỉ một lần)
+            if not secondary_sent:
+                secondary_sent = True
+                self._count("hedged")
+                futures[executor.submit(secondary)] = HEDGE_ROLE_SECONDARY
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+        self._count("no_answer")
+        self.request_latency.add(time.monotonic() - started)
+        return fallback_result, None
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters["name"] = self.name
+        counters["hedge_rate"] = counters["hedged"] / counters["requests"] if counters["requests"] else 0.0
+        counters["current_delay"] = self.current_delay()
+        counters["primary_latency"] = {label: self.primary_latency.percentile(q)
+                                       for label, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))}
+        counters["request_latency"] = {label: self.request_latency.percentile(q)
+                                       for label, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))}
+        return counters
@@ -0,0 +1,278 @@
+# lemmatizer.py
+
+# --- Standard Library Imports ---
+import re
+import unicodedata  # Chuẩn hóa Unicode (NFKC) cho từ người dùng nhập
+from functools import lru_cache  # Từ người dùng nhập lặp lại rất nhiều: nhớ kết quả đã tính
+from types import MappingProxyType  # Bảng tra chỉ đọc, được dựng một lần khi import module
+
+# === BẢNG NGOẠI LỆ ===
+# Viết gọn dạng "gốc: dạng1 dạng2 ..." và được dựng thành dict chỉ đọc một lần khi import.
+
+# Động từ bất quy tắc: gốc -> quá khứ, quá khứ phân từ, (và các dạng khác không theo quy tắc)
+_IRREGULAR_VERBS = """
+be: am is are was were been being
+have: has had having
+do: does did done doing
+go: goes went gone going
+say: says said
+make: made making
+take: took taken taking
+come: came coming
+see: saw seen seeing
+know: knew known
+get: got gotten getting
+give: gave given giving
+find: found
+think: thought
+tell: told
+become: became becoming
+show: showed shown
+leave: left leaving
+feel: felt
+put: putting
+bring: brought
+begin: began begun beginning
+keep: kept
+hold: held
+write: wrote written writing
+stand: stood
+hear: heard
+let: letting
+mean: meant
+set: setting
+meet: met
+run: ran running
+pay: paid
+sit: sat sitting
+speak: spoke spoken
+lie: lay lain lying lied
+lead: led
+read: reading
+grow: grew grown
+lose: lost losing
+fall: fell fallen
+send: sent
+build: built
+understand: understood
+draw: drew drawn
+break: broke broken
+spend: spent
+cut: cutting
+rise: rose risen rising
+drive: drove driven driving
+buy: bought
+wear: wore worn
+choose: chose chosen choosing
+seek: sought
+throw: threw thrown
+catch: caught
+deal: dealt
+win: won winning
+forget: forgot forgotten forgetting
+sell: sold
+fight: fought
+teach: taught
+eat: ate eaten
+sing: sang sung
+swim: swam swum swimming
+drink: drank drunk
+fly: flew flown flies
+sleep: slept
+ride: rode ridden riding
+hide: hid hidden hiding
+shake: shook shaken shaking
+steal: stole stolen
+forgive: forgave forgiven forgiving
+freeze: froze frozen freezing
+bite: bit bitten biting
+blow: blew blown
+feed: fed
+flee: fled
+hang: hung
+light: lit
+shoot: shot
+shine: shone shining
+slide: slid sliding
+stick: stuck
+strike: struck striking
+swear: swore sworn
+tear: tore torn
+wake: woke woken waking
+bear: bore borne
+beat: beaten
+bend: bent
+bind: bound
+bleed: bled
+breed: bred
+dig: dug digging
+lay: laid
+lend: lent
+ring: rang rung
+shrink: shrank shrunk
+sink: sank sunk
+spin: spun spinning
+spring: sprang sprung
+sting: stung
+swing: swung
+weep: wept
+wind: wound
+add: added adding
+agree: agreed agreeing
+free: freed freeing
+create: created creating
+die: died dying
+tie: tied tying
+use: used using
+"""
+
+# Danh từ số nhiều bất quy tắc
+_IRREGULAR_NOUNS = """
+child: children
+man: men
+woman: women
+person: people
+foot: feet
+tooth: teeth
+goose: geese
+mouse: mice
+ox: oxen
+leaf: leaves
+life: lives
+knife: knives
+wife: wives
+wolf: wolves
+half: halves
+shelf: shelves
+thief: thieves
+loaf: loaves
+calf: calves
+self: selves
+potato: potatoes
+tomato: tomatoes
+hero: heroes
+analysis: analyses
+crisis: crises
+thesis: theses
+phenomenon: phenomena
+criterion: criteria
+datum: data
+cactus: cacti
+fungus: fungi
+bus: buses busses
+gas: gases
+lens: lenses
+bias: biases
+focus: focuses
+"""
+
+# Động từ có quy tắc kết thúc bằng 'e' câm mà quy tắc hậu tố không dựng lại được (excit -> excite, unit -> unite)
+_SILENT_E_VERBS = """
+excite unite invite recite ignite incite complete compete delete promote devote
+refuse confuse amuse accuse excuse abuse oppose suppose propose compose expose impose dispose purchase
+"""
+
+# Dạng biến đổi nhưng cũng là một từ độc lập trong từ điển (rose, left, found, data...):
+# giữ nguyên, không đổi về gốc của động từ/danh từ kia
+_STANDALONE_HEADWORDS = frozenset("""
+rose left saw found wound bit felt lay data bore bound shot fell broke drunk woke lit
+""".split())
+
+# Các từ trông như có hậu tố nhưng chính là dạng gốc (không được cắt)
+_INVARIANT_WORDS = frozenset("""
+is was has this thus us yes its his hers ours yours theirs less unless always perhaps news series species
+means lens bus gas plus bias chaos sometimes
+during morning evening nothing something anything everything building ceiling wedding clothing pudding
+lightning sibling king ring thing wing string spring bring sing
+need feed seed speed indeed weed bleed breed greed deed exceed proceed succeed
+tired bored red bed shed wed hundred sacred naked wicked
+""".split())
+
+_VOWELS = frozenset("aeiou")
+_ONE_SYLLABLE_CVC = re.compile(r"^[^aeiou]*[aeiou][^aeiouwxy]$")  # mak, hop, writ, us -> thêm 'e'
+_VOWEL_PAIR_SZ = re.compile(r"[aeiou][aeiou][sz]$")  # caus, pleas, squeez -> thêm 'e'
+
+
+def _build_exception_table(*tables, silent_e_verbs=""):
+    """
+    Dựng bảng {dạng biến đổi: gốc} chỉ đọc từ các chuỗi dạng "gốc: dạng1 dạng2"
+    và danh sách động từ 'e' câm (excite -> excited, exciting). Bỏ qua các dạng là từ độc lập.
+    """
+    exceptions = {}
+    for table in tables:
+        for line in table.strip().splitlines():
+            lemma, _, forms = line.partition(":")
+            for form in forms.split():
+                exceptions.setdefault(form, lemma.strip())
+    for lemma in silent_e_verbs.split():
+        exceptions.setdefault(lemma + "d", lemma)
+        exceptions.setdefault(lemma[:-1] + "ing", lemma)
+    for form in _STANDALONE_HEADWORDS:
+        exceptions.pop(form, None)
+    return MappingProxyType(exceptions)
+
+
+EXCEPTIONS = _build_exception_table(_IRREGULAR_VERBS, _IRREGULAR_NOUNS, silent_e_verbs=_SILENT_E_VERBS)
+
+
+def normalize_surface(word):
+    """Chuẩn hóa dạng từ người dùng nhập: Unicode NFKC, gộp khoảng trắng, casefold ('RUN ' -> 'run')."""
+    return " ".join(unicodedata.normalize("NFKC", word or "").split()).casefold()
+
+
+def _restore_stem(stem):
+    """Dựng lại dạng gốc sau khi bỏ -ed/-ing: running -> run, making -> make, related -> relate."""
+    if not any(ch in _VOWELS for ch in stem):
+        return None  # Không còn nguyên âm: hậu tố là một phần của từ (ví dụ "string")
+    if len(stem) >= 4 and stem[-1] == stem[-2] and stem[-1] not in _VOWELS and stem[-1] not in "lsz":
+        return stem[:-1]  # Phụ âm bị gấp đôi: runn -> run, stopp -> stop (giữ fall, pass, buzz)
+    if stem.endswith(("bl", "pl", "gl", "dl", "tl", "kl", "fl", "iz", "yz", "rg", "dg", "v", "c")):
+        return stem + "e"  # troubl -> trouble, organiz -> organize, charg -> charge, liv -> live, danc -> dance
+    if _VOWEL_PAIR_SZ.search(stem) and not stem.endswith("ias"):
+        return stem + "e"  # caus -> cause, increas -> increase, pleas -> please (nhưng bias giữ nguyên)
+    if len(stem) >= 3 and stem.endswith("at") and stem[-3] not in _VOWELS:
+        return stem + "e"  # relat -> relate, translat -> translate (nhưng treat, beat giữ nguyên)
+    if _ONE_SYLLABLE_CVC.match(stem):
+        return stem + "e"  # mak -> make, hop -> hope, writ -> write
+    return stem
+
+
+def _apply_rules(word):
+    """Các quy tắc hậu tố tiếng Anh (thận trọng: chỉ cắt khi phần còn lại đủ dài)."""
+    length = len(word)
+    # 1. Số nhiều / ngôi thứ ba số ít
+    if word.endswith("ies") and length > 4:
+        return word[:-3] + "y"  # studies -> study
+    if word.endswith(("sses", "shes", "ches", "xes", "zzes")) and length > 4:
+        return word[:-2]  # classes -> class, watches -> watch, boxes -> box
+    if word.endswith(("ics", "as")):
+        return word  # physics, politics, whereas, atlas: không phải số nhiều của physic, wherea...
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")) and length > 3:
+        return word[:-1]  # cats -> cat, makes -> make, days -> day
+    # 2. Quá khứ / quá khứ phân từ
+    if word.endswith("ied") and length > 4:
+        return word[:-3] + "y"  # studied -> study
+    if word.endswith("eed"):
+        return word  # agreed/freed nằm trong bảng ngoại lệ; need/speed... là dạng gốc
+    if word.endswith("ed") and length > 4:
+        return _restore_stem(word[:-2]) or word
+    # 3. Dạng -ing
+    if word.endswith("ing") and length > 5:
+        return _restore_stem(word[:-3]) or word
+    return word
+
+
+@lru_cache(maxsize=50000)
+def lemmatize(word):
+    """
+    Trả về dạng gốc (lemma) đã chuẩn hóa của một từ: 'Running' -> 'run', 'ran' -> 'run', 'children' -> 'child'.
+    Cụm nhiều từ hoặc có dấu gạch nối được giữ nguyên (chỉ chuẩn hóa).
+    """
+    normalized = normalize_surface(word)
+    if not normalized or not normalized.isalpha():
+        return normalized  # Cụm từ, từ có gạch nối/số: chỉ chuẩn hóa
+    if normalized in EXCEPTIONS:
+        return EXCEPTIONS[normalized]
+    if normalized in _INVARIANT_WORDS or normalized in _STANDALONE_HEADWORDS or len(normalized) <= 3:
+        return normalized
+    return _apply_rules(normalized)
@@ -0,0 +1,118 @@
+# log_export.py
+
+# --- Standard Library Imports ---
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, date
+
+# --- Application-Specific Imports ---
+from models import db, APILog, UserActivity
+from api_log_browser import parse_api_log_filters, filter_conditions, keyset_condition
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_CHUNK_SIZE = 1000
+
+
+def parse_user_activity_filters(args):
+    """
+    Bộ lọc cho export user_activity: user_id, since, until (giống trang duyệt API log) và activity_type.
+
+    Returns:
+        tuple: (filters, errors) như parse_api_log_filters.
+    """
+    shared_filters, errors = parse_api_log_filters(args)
+    filters = {name: value for name, value in shared_filters.items() if name in ("user_id", "since", "until")}
+    activity_type = (args.get("activity_type") or "").strip()
+    if activity_type:
+        filters["activity_type"] = activity_type
+    return filters, errors
+
+
+def user_activity_filter_conditions(filters):
+    conditions = []
+    if "user_id" in filters:
+        conditions.append(UserActivity.user_id == filters["user_id"])
+    if "activity_type" in filters:
+        conditions.append(UserActivity.activity_type == filters["activity_type"])
+    if "since" in filters:
+        conditions.append(UserActivity.timestamp >= filters["since"])
+    if "until" in filters:
+        conditions.append(UserActivity.timestamp < filters["until"])
+    return conditions
+
+
+def iter_rows_in_chunks(model, conditions, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Đọc các dòng khớp điều kiện theo thứ tự (timestamp, id) tăng dần, mỗi lần một đoạn chunk_size dòng.
+    Mỗi đoạn là một truy vấn keyset ngắn trên một kết nối riêng, đóng ngay sau khi đọc: bộ nhớ không phụ thuộc
+    tổng số dòng, và không giữ transaction đọc (khóa SHARED của SQLite) suốt thời gian client tải về.
+    Cần app context (stream_with_context giữ context cho generator).
+    """
+    table = model.__table__
+    cursor_key = None
+    while True:
+        statement = table.select().where(*conditions)
+        if cursor_key is not None:
+            statement = statement.where(keyset_condition(cursor_key, older=False, model=model))
+        statement = statement.order_by(table.c.timestamp.asc(), table.c.id.asc()).limit(chunk_size)
+        with db.engine.connect() as connection:
+            rows = [dict(row._mapping) for row in connection.execute(statement)]
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        cursor_key = (rows[-1]['timestamp'], rows[-1]['id'])
+
+
+def _export_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_encoded(model, chunks, export_format):
+    """Mã hóa từng đoạn dòng thành text NDJSON (một object JSON mỗi dòng) hoặc CSV (có dòng tiêu đề)."""
+    columns = [column.key for column in model.__table__.columns]
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        for rows in chunks:
+            buffer.seek(0)
+            buffer.truncate()
+            for row in rows:
+                writer.writerow(["" if row[key] is None else _export_value(row[key]) for key in columns])
+            yield buffer.getvalue()
+        return
+
+    for rows in chunks:
+        yield "".join(json.dumps({key: _export_value(row[key]) for key in columns}, ensure_ascii=False,
+                                 separators=(",", ":")) + "\n" for row in rows)
+
+
+def iter_gzip(text_chunks):
+    """Nén gzip ngay khi stream (zlib với header gzip), mỗi đoạn text vào là một lần nén, không gom cả file."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: định dạng gzip
+    for text in text_chunks:
+        compressed = compressor.compress(text.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(model, conditions, export_format, use_gzip=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Generator các khối bytes/str của file export (dùng với Response(stream_with_context(...)))."""
+    text_chunks = iter_encoded(model, iter_rows_in_chunks(model, conditions, chunk_size), export_format)
+    if use_gzip:
+        return iter_gzip(text_chunks)
+    return (text.encode("utf-8") for text in text_chunks)
+
+
+EXPORT_SOURCES = {
+    "api-logs": (APILog, parse_api_log_filters, filter_conditions),
+    "user-activity": (UserActivity, parse_user_activity_filters, user_activity_filter_conditions),
+}
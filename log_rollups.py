@@ -0,0 +1,276 @@
+# log_rollups.py
+
+# --- Standard Library Imports ---
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# --- Third-party Library Imports ---
+from sqlalchemy import func
+
+# --- Application-Specific Imports ---
+from models import db, APILog, APILatencyRollup, APICallRollup
+
+# Cận trên (ms) của các bucket độ trễ; bucket cuối cùng (chỉ số = len) là "lớn hơn cận cuối"
+LATENCY_BUCKET_BOUNDS_MS = (25, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000, 20000, 45000)
+
+# Các cửa sổ thời gian mà trang admin cho chọn (nhãn -> giây)
+LATENCY_WINDOWS = {"1h": 3600, "6h": 6 * 3600, "24h": 24 * 3600, "7d": 7 * 24 * 3600}
+DEFAULT_LATENCY_WINDOW = "24h"
+
+# Độ chi tiết của bảng api_call_rollup
+CALL_ROLLUP_HOUR = "hour"
+CALL_ROLLUP_DAY = "day"
+
+
+def latency_bucket_index(duration_ms):
+    """Chỉ số bucket của một độ trễ: bucket i chứa các giá trị trong (cận i-1, cận i]."""
+    return bisect_left(LATENCY_BUCKET_BOUNDS_MS, duration_ms)
+
+
+def percentile_from_histogram(bucket_counts, quantile):
+    """
+    Ước lượng phân vị từ histogram {chỉ số bucket: số lời gọi}, nội suy tuyến tính trong bucket chứa phân vị.
+    Bucket cuối (không có cận trên) trả về cận dưới của nó. Trả về None nếu histogram rỗng.
+    """
+    total = sum(bucket_counts.values())
+    if not total:
+        return None
+    target = quantile * total
+    cumulative = 0
+    for index in sorted(bucket_counts):
+        count = bucket_counts[index]
+        if cumulative + count >= target:
+            lower = LATENCY_BUCKET_BOUNDS_MS[index - 1] if index > 0 else 0
+            if index >= len(LATENCY_BUCKET_BOUNDS_MS):
+                return float(lower)
+            upper = LATENCY_BUCKET_BOUNDS_MS[index]
+            return lower + (upper - lower) * ((target - cumulative) / count)
+        cumulative += count
+    return float(LATENCY_BUCKET_BOUNDS_MS[-1])
+
+
+def upsert_increments(connection, table, key_values, increments):
+    """
+    Cộng `increments` ({cột: số cần cộng}) vào dòng có khóa `key_values` ({cột: giá trị}) của `table`;
+    chưa có dòng thì tạo mới. UPDATE trước rồi mới INSERT nên chạy được trên cả SQLite lẫn các database khác.
+    """
+    conditions = [table.c[column] == value for column, value in key_values.items()]
+    updated = connection.execute(
+        table.update().where(*conditions)
+        .values({column: table.c[column] + amount for column, amount in increments.items()})
+    ).rowcount
+    if not updated:
+        connection.execute(table.insert().values(dict(key_values, **increments)))
+
+
+class PeriodicPruner:
+    """Sau mỗi prune_every lần gọi tick(), xóa các dòng có period_start cũ hơn retention (None: giữ mãi)."""
+
+    def __init__(self, retention_days, prune_every=500):
+        self.retention = timedelta(days=retention_days) if retention_days else None
+        self.prune_every = prune_every
+        self._ticks = 0
+        self._lock = threading.Lock()
+
+    def tick(self, connection, table, *conditions):
+        if self.retention is None:
+            return
+        with self._lock:
+            self._ticks += 1
+            if self._ticks < self.prune_every:
+                return
+            self._ticks = 0
+        connection.execute(table.delete().where(table.c.period_start < datetime.utcnow() - self.retention, *conditions))
+
+
+class LatencyHistogramRollup:
+    """
+    Histogram độ trễ theo từng api_name, cộng dồn theo từng khoảng thời gian (period_seconds) trong bảng
+    api_latency_rollup. Được api_log_sink cập nhật trong CÙNG transaction với lệnh insert các APILog,
+    nên trang admin tính p50/p95/p99 từ vài trăm dòng rollup thay vì quét bảng api_log.
+    Log không có duration_ms (ví dụ log trạng thái circuit breaker) không được tính.
+    """
+
+    def __init__(self, period_seconds=300, retention_days=30, prune_every=500):
+        self.period_seconds = max(60, int(period_seconds))
+        self.pruner = PeriodicPruner(retention_days, prune_every)
+
+    def period_start(self, timestamp):
+        """Đầu khoảng thời gian chứa timestamp."""
+        epoch_seconds = int((timestamp - datetime(1970, 1, 1)).total_seconds())
+        return datetime(1970, 1, 1) + timedelta(seconds=epoch_seconds - epoch_seconds % self.period_seconds)
+
+    def apply(self, connection, rows):
+        """Cộng các dòng APILog vừa insert vào histogram (chạy trên kết nối/transaction của api_log_sink)."""
+        increments = defaultdict(lambda: [0, 0, 0])  # (api, period, bucket) -> [số lời gọi, tổng ms, tổng byte]
+        for row in rows:
+            if row.get('duration_ms') is None or not row.get('api_name'):
+                continue
+            key = (row['api_name'], self.period_start(row['timestamp']), latency_bucket_index(row['duration_ms']))
+            increments[key][0] += 1
+            increments[key][1] += row['duration_ms']
+            increments[key][2] += row.get('bytes_received') or 0
+
+        table = APILatencyRollup.__table__
+        for (api_name, period_start, bucket_index), (calls, duration_total, bytes_total) in increments.items():
+            upsert_increments(connection, table,
+                              {"api_name": api_name, "period_start": period_start, "bucket_index": bucket_index},
+                              {"call_count": calls, "duration_ms_total": duration_total,
+                               "bytes_received_total": bytes_total})
+        self.pruner.tick(connection, table)
+
+    def clear(self, connection):
+        connection.execute(APILatencyRollup.__table__.delete())
+
+    def percentiles(self, window_seconds, quantiles=(0.50, 0.95, 0.99)):
+        """
+        p50/p95/p99 (ms) của từng api_name trong window_seconds gần nhất. Cần app context.
+
+        Returns:
+            list: [{'api_name', 'calls', 'mean_ms', 'avg_bytes', 'p50', 'p95', 'p99'}], sắp theo p95 giảm dần.
+        """
+        since = self.period_start(datetime.utcnow() - timedelta(seconds=window_seconds))
+        rows = db.session.query(
+            APILatencyRollup.api_name, APILatencyRollup.bucket_index,
+            func.sum(APILatencyRollup.call_count), func.sum(APILatencyRollup.duration_ms_total),
+            func.sum(APILatencyRollup.bytes_received_total)
+        ).filter(APILatencyRollup.period_start >= since).group_by(
+            APILatencyRollup.api_name, APILatencyRollup.bucket_index).all()
+
+        histograms = defaultdict(dict)
+        totals = defaultdict(lambda: [0, 0, 0])
+        for api_name, bucket_index, calls, duration_total, bytes_total in rows:
+            histograms[api_name][bucket_index] = calls
+            totals[api_name][0] += calls
+            totals[api_name][1] += duration_total or 0
+            totals[api_name][2] += bytes_total or 0
+
+        result = []
+        for api_name, histogram in histograms.items():
+            calls, duration_total, bytes_total = totals[api_name]
+            item = {"api_name": api_name, "calls": calls,
+                    "mean_ms": duration_total / calls if calls else None,
+                    "avg_bytes": bytes_total / calls if calls else None}
+            for quantile in quantiles:
+                item[f"p{int(round(quantile * 100))}"] = percentile_from_histogram(histogram, quantile)
+            result.append(item)
+        result.sort(key=lambda item: item.get("p95") or 0, reverse=True)
+        return result
+
+
+class ApiCallCountRollup:
+    """
+    Số lời gọi / thành công / thất bại theo api_name (và vai trò hedge), cộng dồn theo giờ và theo ngày
+    trong bảng api_call_rollup. Được api_log_sink cập nhật trong cùng transaction với lệnh insert APILog,
+    nên các con số tổng trên trang admin chỉ đọc vài dòng rollup; bảng api_log chỉ cần khi xem chi tiết.
+    Dòng theo giờ được giữ hourly_retention_days ngày, dòng theo ngày được giữ mãi (kể cả khi log gốc đã bị xóa).
+    """
+
+    def __init__(self, hourly_retention_days=14, prune_every=500):
+        self.pruner = PeriodicPruner(hourly_retention_days, prune_every)
+
+    @staticmethod
+    def period_start(timestamp, granularity):
+        if granularity == CALL_ROLLUP_DAY:
+            return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+
+    def apply(self, connection, rows):
+        """Cộng các dòng APILog vừa insert vào rollup theo giờ và theo ngày."""
+        increments = defaultdict(lambda: [0, 0])  # (độ chi tiết, api, vai trò hedge, period) -> [thành công, thất bại]
+        for row in rows:
+            if not row.get('api_name'):
+                continue
+            for granularity in (CALL_ROLLUP_HOUR, CALL_ROLLUP_DAY):
+                key = (granularity, row['api_name'], row.get('hedge_role') or "",
+                       self.period_start(row['timestamp'], granularity))
+                increments[key][0 if row.get('success') else 1] += 1
+
+        table = APICallRollup.__table__
+        for (granularity, api_name, hedge_role, period_start), (successes, failures) in increments.items():
+            upsert_increments(connection, table,
+                              {"granularity": granularity, "api_name": api_name, "hedge_role": hedge_role,
+                               "period_start": period_start},
+                              {"call_count": successes + failures, "success_count": successes,
+                               "failure_count": failures})
+        self.pruner.tick(connection, table, table.c.granularity == CALL_ROLLUP_HOUR)
+
+    def clear(self, connection):
+        connection.execute(APICallRollup.__table__.delete())
+
+    def totals(self, granularity=CALL_ROLLUP_DAY, since=None, by_hedge_role=False):
+        """
+        Tổng số lời gọi theo api_name (hoặc theo (api_name, hedge_role) nếu by_hedge_role) từ bảng rollup.
+        Mặc định cộng các dòng theo ngày: toàn bộ lịch sử. Cần app context.
+
+        Returns:
+            list: các dòng có .api_name, (.hedge_role), .count, .successful, .failed; sắp theo api_name.
+        """
+        columns = [APICallRollup.api_name]
+        if by_hedge_role:
+            columns.append(APICallRollup.hedge_role)
+        query = db.session.query(
+            *columns,
+            func.sum(APICallRollup.call_count).label('count'),
+            func.sum(APICallRollup.success_count).label('successful'),
+            func.sum(APICallRollup.failure_count).label('failed')
+        ).filter(APICallRollup.granularity == granularity)
+        if since is not None:
+            query = query.filter(APICallRollup.period_start >= self.period_start(since, granularity))
+        if by_hedge_role:
+            query = query.filter(APICallRollup.hedge_role != "")
+        return query.group_by(*columns).order_by(*columns).all()
+
+    def estimate_count(self, api_name=None, success=None, since=None, until=None):
+        """
+        Ước lượng số APILog khớp bộ lọc từ bảng rollup (không đụng tới api_log). Khoảng thời gian được làm tròn
+        theo giờ nếu còn dòng theo giờ cho khoảng đó, nếu không thì theo ngày. Cần app context.
+        """
+        granularity = CALL_ROLLUP_DAY
+        if since is not None or until is not None:
+            hourly_floor = None if self.pruner.retention is None else datetime.utcnow() - self.pruner.retention
+            if hourly_floor is None or (since is not None and since >= hourly_floor):
+                granularity = CALL_ROLLUP_HOUR
+
+        if success is None:
+            column = APICallRollup.call_count
+        else:
+            column = APICallRollup.success_count if success else APICallRollup.failure_count
+        query = db.session.query(func.sum(column)).filter(APICallRollup.granularity == granularity)
+        if api_name:
+            query = query.filter(APICallRollup.api_name == api_name)
+        if since is not None:
+            query = query.filter(APICallRollup.period_start >= self.period_start(since, granularity))
+        if until is not None:
+            query = query.filter(APICallRollup.period_start < until)
+        return int(query.scalar() or 0)
+
+
+def rebuild_rollups(app, rollups, chunk_size=5000):
+    """
+    Dựng lại các bảng rollup từ bảng api_log (ví dụ sau khi nâng cấp từ phiên bản chưa có rollup,
+    hoặc nếu nghi ngờ rollup bị lệch). Đọc api_log theo từng đoạn chunk_size dòng, trong một transaction.
+    Dòng theo ngày/giờ của các log đã bị xóa khỏi api_log cũng mất, nên chỉ chạy khi cần.
+
+    Returns:
+        int: số dòng api_log đã đọc.
+    """
+    table = APILog.__table__
+    processed = 0
+    with app.app_context():
+        with db.engine.begin() as connection:
+            for rollup in rollups:
+                rollup.clear(connection)
+            last_id = 0
+            while True:
+                rows = [dict(row._mapping) for row in connection.execute(
+                    table.select().where(table.c.id > last_id).order_by(table.c.id).limit(chunk_size))]
+                if not rows:
+                    break
+                for rollup in rollups:
+                    rollup.apply(connection, rows)
+                processed += len(rows)
+                last_id = rows[-1]['id']
+    return processed
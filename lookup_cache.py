@@ -0,0 +1,401 @@
+# lookup_cache.py
+
+# --- Standard Library Imports ---
+import hashlib  # Hash văn bản để làm khóa cho bộ nhớ dịch
+import json  # Lưu kết quả đã phân tích dưới dạng JSON trong database
+import logging
+import threading  # Khóa để dùng cache an toàn từ nhiều worker thread
+import time  # Thời điểm hết hạn của các mục trong cache bộ nhớ
+import unicodedata  # Chuẩn hóa Unicode trước khi hash văn bản
+from collections import OrderedDict  # Cấu trúc dữ liệu cho LRU cache
+from datetime import datetime, timedelta
+
+# --- Third-party Library Imports ---
+from sqlalchemy import func, select
+
+# --- Application-Specific Imports ---
+from models import db, WordLookupCacheEntry, CacheStat, TranslationMemoEntry
+from log_rollups import upsert_increments
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_word_key(word):
+    """Chuẩn hóa một từ thành khóa cache: bỏ khoảng trắng thừa và chuyển về chữ thường."""
+    return " ".join((word or "").split()).lower()
+
+
+def normalize_translation_text(text):
+    """Chuẩn hóa văn bản trước khi dịch: Unicode NFC và gộp khoảng trắng. Giữ nguyên chữ hoa/thường."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+def hash_translation_text(text):
+    """SHA-256 (hex) của văn bản đã chuẩn hóa, dùng làm một phần khóa của bộ nhớ dịch."""
+    return hashlib.sha256(normalize_translation_text(text).encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    Cache trong bộ nhớ tiến trình (hot tier), giới hạn số mục và có TTL.
+    Khi đầy, mục ít được dùng gần đây nhất sẽ bị loại bỏ. An toàn khi dùng từ nhiều thread.
+    """
+
+    def __init__(self, max_entries=5000, ttl_seconds=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Trả về giá trị đã lưu hoặc None nếu không có/đã hết hạn."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)  # Đánh dấu vừa được dùng
+            return value
+
+    def set(self, key, value):
+        """Lưu giá trị, loại bỏ mục cũ nhất nếu vượt quá giới hạn."""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Xóa mọi mục có key thỏa predicate(key)."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheStatsRecorder:
+    """
+    Gom bộ đếm hit/miss trong bộ nhớ và ghi dồn vào bảng cache_stat,
+    để mỗi lần trúng cache không phải tốn một lần commit database.
+    Việc ghi dùng kết nối riêng (không đụng tới db.session của request đang gọi get()).
+    """
+
+    def __init__(self, flush_every=50, flush_interval_seconds=60):
+        self.flush_every = flush_every
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending = {}  # cache_name -> {'hot_hits': n, 'db_hits': n, 'misses': n}
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, cache_name, field):
+        """Tăng bộ đếm `field` ('hot_hits' | 'db_hits' | 'misses') của cache_name, ghi DB khi đủ ngưỡng."""
+        with self._lock:
+            counters = self._pending.setdefault(cache_name, {'hot_hits': 0, 'db_hits': 0, 'misses': 0})
+            counters[field] += 1
+            self._pending_count += 1
+            should_flush = (self._pending_count >= self.flush_every or
+                            time.monotonic() - self._last_flush >= self.flush_interval_seconds)
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Ghi các bộ đếm đang chờ vào database. Cần được gọi trong app context."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._pending_count = 0
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+
+        try:
+            with db.engine.begin() as connection:
+                for cache_name, counters in pending.items():
+                    upsert_increments(connection, CacheStat.__table__, {"cache_name": cache_name}, counters)
+        except Exception as e:
+            logger.error("Lỗi khi ghi thống kê cache vào database: %s", e)
+
+    def snapshot(self):
+        """Trả về bản sao các bộ đếm chưa được ghi xuống database (để hiển thị cho admin)."""
+        with self._lock:
+            return {name: dict(counters) for name, counters in self._pending.items()}
+
+
+class TwoTierCache:
+    """
+    Khung chung cho cache hai tầng: LRU trong bộ nhớ tiến trình đứng trước một bảng trong database.
+    Lớp con cài đặt _db_get/_db_set/_db_delete/_prune cho bảng cụ thể, trên `connection` được truyền vào.
+
+    Mọi lần đọc/ghi bảng cache chạy trên kết nối riêng (db.engine.begin(), giống api_log_sink), không bao giờ
+    commit/rollback db.session: cache được gọi giữa lúc request đang sửa dữ liệu của người dùng.
+    """
+
+    def __init__(self, cache_name, stats, ttl_seconds, max_rows, hot_size, prune_every=100, hot_ttl_seconds=None):
+        self.cache_name = cache_name
+        self.stats = stats
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        # hot_ttl_seconds ngắn hơn ttl_seconds khi mục có thể bị sửa/xóa từ worker khác: tầng bộ nhớ của các
+        # tiến trình khác không được báo, nên chỉ tin nó trong khoảng thời gian này rồi đọc lại từ database
+        self.hot = LRUCache(max_entries=hot_size,
+                            ttl_seconds=hot_ttl_seconds if hot_ttl_seconds is not None else ttl_seconds)
+        self._writes_since_prune = 0
+        self._prune_lock = threading.Lock()
+
+    def _db_get(self, connection, key):
+        raise NotImplementedError
+
+    def _db_set(self, connection, key, value):
+        raise NotImplementedError
+
+    def _db_delete(self, connection, key):
+        raise NotImplementedError
+
+    def _prune(self, connection):
+        raise NotImplementedError
+
+    def _prune_oldest(self, connection, table, *conditions):
+        """Xóa các dòng có last_accessed_at cũ nhất để bảng (lọc theo conditions) còn tối đa max_rows dòng."""
+        total = connection.execute(select(func.count()).select_from(table).where(*conditions)).scalar()
+        overflow = total - self.max_rows
+        if overflow <= 0:
+            return
+        oldest_ids = select(table.c.id).where(*conditions) \
+            .order_by(table.c.last_accessed_at.asc()).limit(overflow).scalar_subquery()
+        connection.execute(table.delete().where(table.c.id.in_(oldest_ids)))
+
+    def _touch(self, connection, table, row, now, count_hit=True):
+        """Cập nhật last_accessed_at (và hit_count) khi đã cũ hơn touch_interval, để không ghi DB ở mỗi lần đọc."""
+        if row.last_accessed_at >= now - self.touch_interval:
+            return
+        values = {"last_accessed_at": now}
+        if count_hit:
+            values["hit_count"] = table.c.hit_count + 1
+        connection.execute(table.update().where(table.c.id == row.id).values(values))
+
+    def get(self, key):
+        """Tra cache: tầng bộ nhớ trước, sau đó tới database. Trả về None nếu miss."""
+        value = self.hot.get(key)
+        if value is not None:
+            self.stats.record(self.cache_name, 'hot_hits')
+            return value
+
+        try:
+            with db.engine.begin() as connection:
+                value = self._db_get(connection, key)
+        except Exception as e:
+            logger.error("Lỗi khi đọc cache '%s' từ database: %s", self.cache_name, e)
+            value = None
+
+        if value is not None:
+            self.hot.set(key, value)
+            self.stats.record(self.cache_name, 'db_hits')
+            return value
+
+        self.stats.record(self.cache_name, 'misses')
+        return None
+
+    def set(self, key, value):
+        """Lưu giá trị vào cả hai tầng. Lỗi database không được làm hỏng luồng xử lý chính."""
+        self.hot.set(key, value)
+        self._write_db(key, value)
+
+    def _write_db(self, key, db_value):
+        """Ghi db_value xuống bảng (transaction riêng), rồi dọn bảng nếu tới lượt."""
+        try:
+            with db.engine.begin() as connection:
+                self._db_set(connection, key, db_value)
+        except Exception as e:
+            logger.error("Lỗi khi ghi cache '%s' vào database: %s", self.cache_name, e)
+            return
+        self._maybe_prune()
+
+    def _maybe_prune(self):
+        """Chạy _prune() sau mỗi prune_every lần ghi để giữ bảng trong giới hạn max_rows."""
+        with self._prune_lock:
+            self._writes_since_prune += 1
+            should_prune = self._writes_since_prune >= self.prune_every
+            if should_prune:
+                self._writes_since_prune = 0
+        if should_prune:
+            try:
+                with db.engine.begin() as connection:
+                    self._prune(connection)
+            except Exception as e:
+                logger.error("Lỗi khi dọn dẹp cache '%s': %s", self.cache_name, e)
+
+    def delete(self, key):
+        """Xóa một mục khỏi cả hai tầng (ví dụ khi dữ liệu đã được admin sửa)."""
+        self.hot.delete(key)
+        try:
+            with db.engine.begin() as connection:
+                self._db_delete(connection, key)
+        except Exception as e:
+            logger.error("Lỗi khi xóa cache '%s': %s", self.cache_name, e)
+
+
+class WordLookupCache(TwoTierCache):
+    """
+    Cache kết quả tra từ điển, khóa bởi (nguồn, từ đã chuẩn hóa), lưu trong bảng word_lookup_cache.
+    - TTL: mục cũ hơn ttl_seconds được coi như không có.
+    - Giới hạn kích thước kiểu LRU: khi vượt max_rows, xóa các mục có last_accessed_at cũ nhất.
+      last_accessed_at chỉ được cập nhật khi đã cũ hơn touch_interval để tránh ghi DB ở mỗi lần đọc.
+    """
+
+    def __init__(self, source, stats, ttl_seconds, max_rows, hot_size, touch_interval_seconds=3600):
+        super().__init__(cache_name=source, stats=stats, ttl_seconds=ttl_seconds,
+                         max_rows=max_rows, hot_size=hot_size)
+        self.source = source
+        self.touch_interval = timedelta(seconds=touch_interval_seconds)
+
+    def _key_condition(self, key):
+        table = WordLookupCacheEntry.__table__
+        return (table.c.source == self.source) & (table.c.word_key == key)
+
+    def _db_get(self, connection, key):
+        table = WordLookupCacheEntry.__table__
+        row = connection.execute(select(table.c.id, table.c.payload, table.c.created_at, table.c.last_accessed_at)
+                                 .where(self._key_condition(key))).first()
+        if row is None:
+            return None
+
+        now = datetime.utcnow()
+        if self.ttl_seconds and row.created_at < now - timedelta(seconds=self.ttl_seconds):
+            return None  # Đã hết hạn, sẽ được ghi đè ở lần set tiếp theo
+
+        self._touch(connection, table, row, now)
+        return json.loads(row.payload)
+
+    def _db_set(self, connection, key, value):
+        table = WordLookupCacheEntry.__table__
+        now = datetime.utcnow()
+        payload = json.dumps(value, ensure_ascii=False)
+        updated = connection.execute(table.update().where(self._key_condition(key))
+                                     .values(payload=payload, created_at=now, last_accessed_at=now)).rowcount
+        if not updated:
+            connection.execute(table.insert().values(source=self.source, word_key=key, payload=payload,
+                                                     created_at=now, last_accessed_at=now, hit_count=0))
+
+    def _db_delete(self, connection, key):
+        connection.execute(WordLookupCacheEntry.__table__.delete().where(self._key_condition(key)))
+
+    def _prune(self, connection):
+        table = WordLookupCacheEntry.__table__
+        self._prune_oldest(connection, table, table.c.source == self.source)
+
+    def get_word(self, word):
+        return self.get(normalize_word_key(word))
+
+    def set_word(self, word, value):
+        self.set(normalize_word_key(word), value)
+
+
+class TranslationMemo(TwoTierCache):
+    """
+    Bộ nhớ dịch hai tầng cho translate_with_deep_translator.
+    Khóa: (ngôn ngữ nguồn, ngôn ngữ đích, SHA-256 của văn bản đã chuẩn hóa).
+    Bản dịch sai có thể bị vô hiệu hóa bằng invalidate_text(), hoặc thay bằng bản admin đã sửa (override_translation).
+    Tầng bộ nhớ chỉ sống hot_ttl_seconds: thay đổi từ worker khác được thấy sau tối đa khoảng thời gian đó.
+    """
+
+    def __init__(self, stats, ttl_seconds, max_rows, hot_size, touch_interval_seconds=3600, hot_ttl_seconds=300):
+        super().__init__(cache_name="translation_memo", stats=stats, ttl_seconds=ttl_seconds,
+                         max_rows=max_rows, hot_size=hot_size, hot_ttl_seconds=hot_ttl_seconds)
+        self.touch_interval = timedelta(seconds=touch_interval_seconds)
+
+    @staticmethod
+    def make_key(text, source_lang, target_lang):
+        return source_lang, target_lang, hash_translation_text(text)
+
+    @staticmethod
+    def _key_condition(key):
+        table = TranslationMemoEntry.__table__
+        source_lang, target_lang, text_hash = key
+        return (table.c.source_lang == source_lang) & (table.c.target_lang == target_lang) & \
+            (table.c.text_hash == text_hash)
+
+    def _db_get(self, connection, key):
+        table = TranslationMemoEntry.__table__
+        row = connection.execute(select(table.c.id, table.c.translated_text, table.c.created_at,
+                                        table.c.last_accessed_at).where(self._key_condition(key))).first()
+        if row is None:
+            return None
+
+        now = datetime.utcnow()
+        if self.ttl_seconds and row.created_at < now - timedelta(seconds=self.ttl_seconds):
+            return None
+
+        self._touch(connection, table, row, now)
+        return row.translated_text
+
+    def _db_set(self, connection, key, value):
+        table = TranslationMemoEntry.__table__
+        source_text, translated_text = value
+        now = datetime.utcnow()
+        updated = connection.execute(table.update().where(self._key_condition(key))
+                                     .values(source_text=source_text, translated_text=translated_text,
+                                             created_at=now, last_accessed_at=now)).rowcount
+        if not updated:
+            source_lang, target_lang, text_hash = key
+            connection.execute(table.insert().values(source_lang=source_lang, target_lang=target_lang,
+                                                     text_hash=text_hash, source_text=source_text,
+                                                     translated_text=translated_text,
+                                                     created_at=now, last_accessed_at=now, hit_count=0))
+
+    def _db_delete(self, connection, key):
+        connection.execute(TranslationMemoEntry.__table__.delete().where(self._key_condition(key)))
+
+    def _prune(self, connection):
+        self._prune_oldest(connection, TranslationMemoEntry.__table__)
+
+    def get_translation(self, text, source_lang, target_lang):
+        """Trả về bản dịch đã lưu hoặc None."""
+        return self.get(self.make_key(text, source_lang, target_lang))
+
+    def set_translation(self, text, source_lang, target_lang, translated_text):
+        """Lưu bản dịch. Tầng bộ nhớ chỉ giữ bản dịch, tầng database giữ cả văn bản gốc."""
+        key = self.make_key(text, source_lang, target_lang)
+        self.hot.set(key, translated_text)
+        self._write_db(key, (normalize_translation_text(text), translated_text))
+
+    def invalidate_text(self, text, target_lang=None):
+        """
+        Vô hiệu hóa mọi bản dịch đã lưu của `text` (với mọi ngôn ngữ nguồn),
+        ví dụ sau khi admin sửa lại bản dịch tiếng Việt của một định nghĩa.
+        Trả về số dòng đã xóa trong database.
+        """
+        text_hash = hash_translation_text(text)
+        self.hot.delete_where(lambda key: key[2] == text_hash and (target_lang is None or key[1] == target_lang))
+        table = TranslationMemoEntry.__table__
+        conditions = [table.c.text_hash == text_hash]
+        if target_lang:
+            conditions.append(table.c.target_lang == target_lang)
+        try:
+            with db.engine.begin() as connection:
+                return connection.execute(table.delete().where(*conditions)).rowcount
+        except Exception as e:
+            logger.error("Lỗi khi vô hiệu hóa bộ nhớ dịch: %s", e)
+            return 0
+
+    def override_translation(self, text, target_lang, translated_text, source_lang="auto"):
+        """
+        Thay mọi bản dịch máy đã lưu của `text` (với mọi ngôn ngữ nguồn) bằng bản dịch admin đã sửa,
+        để lần tra sau dùng bản đã sửa thay vì dịch lại và lưu lại đúng bản dịch sai cũ.
+        """
+        self.invalidate_text(text, target_lang=target_lang)
+        self.set_translation(text, source_lang, target_lang, translated_text)
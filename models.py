@@ -102,14 +102,31 @@ class VocabularyList(db.Model):
         return f'<VocabularyList {self.id} - "{self.name}" by User ID {self.user_id}>'
 
 
+def vocabulary_word_key(word):
+    """
+    Khóa so khớp từ vựng: gộp/bỏ khoảng trắng thừa và casefold ("Straße" và "STRASSE" cùng một khóa).
+    Được tính trong Python (lower() của SQLite chỉ đổi chữ ASCII) và lưu sẵn trong VocabularyEntry.word_key.
+    """
+    return " ".join((word or "").split()).casefold()
+
+
+def _default_word_key(context):
+    return vocabulary_word_key(context.get_current_parameters().get('original_word'))
+
+
 class VocabularyEntry(db.Model):
     """
     Định nghĩa model VocabularyEntry, đại diện cho bảng 'vocabulary_entry'.
     Mỗi đối tượng là một mục từ vựng cụ thể.
     """
     __tablename__ = 'vocabulary_entry'
+    __table_args__ = (
+        db.Index('ix_vocabulary_entry_user_id_word_key', 'user_id', 'word_key'),  # Tìm từ người dùng đã có
+    )
     id = db.Column(db.Integer, primary_key=True)
     original_word = db.Column(db.String(200), nullable=False)  # Từ gốc tiếng Anh, bắt buộc
+    # vocabulary_word_key(original_word), tự tính khi insert (kể cả bulk insert); original_word không bị sửa sau đó
+    word_key = db.Column(db.String(200), nullable=True, default=_default_word_key)
     word_type = db.Column(db.String(50), nullable=True)  # Loại từ (noun, verb, adj, ...)
     ipa = db.Column(db.String(100), nullable=True)  # Phiên âm IPA
     definition_en = db.Column(db.Text, nullable=True)  # Giải thích nghĩa bằng tiếng Anh
@@ -138,6 +155,14 @@ class APILog(db.Model):
     Lưu trữ thông tin về các lần ứng dụng gọi đến API bên ngoài.
     """
     __tablename__ = 'api_log'
+    # Index ghép cho trang duyệt log: sắp theo (timestamp, id) kiểu keyset, có hoặc không kèm một bộ lọc
+    __table_args__ = (
+        db.Index('ix_api_log_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_api_log_api_name_timestamp_id', 'api_name', 'timestamp', 'id'),
+        db.Index('ix_api_log_success_timestamp_id', 'success', 'timestamp', 'id'),
+        db.Index('ix_api_log_user_id_timestamp_id', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_api_log_status_code_timestamp_id', 'status_code', 'timestamp', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     api_name = db.Column(db.String(100),
                          nullable=False)  # Tên của API được gọi (ví dụ: 'deep_translator', 'dictionary_api')
@@ -148,6 +173,10 @@ class APILog(db.Model):
     request_details = db.Column(db.Text, nullable=True)  # Một phần thông tin của request (ví dụ: từ cần dịch)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'),
                         nullable=True)  # ID của người dùng gây ra lời gọi API (nếu có)
+    # Vai trò trong một yêu cầu dịch hedged: 'primary' hoặc 'secondary' (NULL nếu không phải yêu cầu hedged)
+    hedge_role = db.Column(db.String(20), nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)  # Thời gian của lời gọi (kể cả retry), tính bằng mili giây
+    bytes_received = db.Column(db.Integer, nullable=True)  # Kích thước body của response (nếu có)
 
     # nullable=True vì có thể API được gọi bởi hệ thống.
 
@@ -159,6 +188,51 @@ class APILog(db.Model):
         return f'<APILog ID {self.id} - API: {self.api_name} at {self.timestamp} Success: {self.success}>'
 
 
+class APILatencyRollup(db.Model):
+    """
+    Histogram độ trễ của các lời gọi API bên ngoài: số lời gọi theo (api_name, khoảng thời gian, bucket độ trễ).
+    Được cập nhật dần mỗi khi APILog được ghi (xem log_rollups.py), để trang admin không phải quét bảng api_log.
+    """
+    __tablename__ = 'api_latency_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('api_name', 'period_start', 'bucket_index', name='uq_api_latency_rollup_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    api_name = db.Column(db.String(100), nullable=False)
+    period_start = db.Column(db.DateTime, nullable=False, index=True)  # Đầu khoảng thời gian (UTC)
+    bucket_index = db.Column(db.Integer, nullable=False)  # Xem log_rollups.LATENCY_BUCKET_BOUNDS_MS
+    call_count = db.Column(db.Integer, default=0, nullable=False)
+    duration_ms_total = db.Column(db.BigInteger, default=0, nullable=False)  # Để tính độ trễ trung bình
+    bytes_received_total = db.Column(db.BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<APILatencyRollup {self.api_name} {self.period_start} bucket={self.bucket_index} n={self.call_count}>'
+
+
+class APICallRollup(db.Model):
+    """
+    Số lời gọi API bên ngoài (tổng / thành công / thất bại) theo api_name, vai trò hedge và khoảng thời gian
+    (theo giờ hoặc theo ngày). Được cập nhật dần mỗi khi APILog được ghi (xem log_rollups.py), để các con số
+    tổng trên trang admin không phải đếm lại bảng api_log.
+    """
+    __tablename__ = 'api_call_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'api_name', 'hedge_role', 'period_start', name='uq_api_call_rollup_key'),
+        db.Index('ix_api_call_rollup_granularity_period', 'granularity', 'period_start'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # 'hour' hoặc 'day'
+    api_name = db.Column(db.String(100), nullable=False)
+    hedge_role = db.Column(db.String(20), default="", nullable=False)  # "" nếu không phải lời gọi hedged
+    period_start = db.Column(db.DateTime, nullable=False)  # Đầu giờ/ngày (UTC)
+    call_count = db.Column(db.Integer, default=0, nullable=False)
+    success_count = db.Column(db.Integer, default=0, nullable=False)
+    failure_count = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<APICallRollup {self.granularity} {self.api_name} {self.period_start} n={self.call_count}>'
+
+
 # === FORM DEFINITIONS (Sử dụng Flask-WTF) ===
 
 class RegistrationForm(FlaskForm):
@@ -190,6 +264,10 @@ class UserActivity(db.Model):
     Theo dõi các hoạt động quan trọng của người dùng để đánh dấu "lần học".
     """
     __tablename__ = 'user_activity'
+    __table_args__ = (
+        db.Index('ix_user_activity_timestamp_id', 'timestamp', 'id'),  # Retention: chọn các dòng cũ theo lô
+        db.Index('ix_user_activity_user_id_timestamp', 'user_id', 'timestamp'),  # Hoạt động của một user theo thời gian
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     activity_type = db.Column(db.String(100), nullable=False) # Ví dụ: 'session_start', 'words_added', 'list_reviewed'
@@ -198,3 +276,149 @@ class UserActivity(db.Model):
 
     def __repr__(self):
         return f'<UserActivity {self.id} - User {self.user_id} - Type: {self.activity_type} at {self.timestamp}>'
+
+
+class WordLookupCacheEntry(db.Model):
+    """
+    Bộ nhớ đệm (cache) dùng chung cho kết quả tra từ điển đã được phân tích.
+    Một từ (đã chuẩn hóa) chỉ cần gọi API bên ngoài một lần, mọi người dùng sau đó đọc lại từ bảng này.
+    """
+    __tablename__ = 'word_lookup_cache'
+    __table_args__ = (
+        db.UniqueConstraint('source', 'word_key', name='uq_word_lookup_cache_source_word'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(50), nullable=False)  # Nguồn dữ liệu, ví dụ: 'dictionary_api'
+    word_key = db.Column(db.String(200), nullable=False)  # Từ đã chuẩn hóa (strip + lowercase)
+    payload = db.Column(db.Text, nullable=False)  # Kết quả đã phân tích, lưu dưới dạng JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Dùng để tính TTL
+    last_accessed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False,
+                                 index=True)  # Dùng để loại bỏ mục ít dùng nhất (LRU) khi bảng quá lớn
+    hit_count = db.Column(db.Integer, default=0, nullable=False)  # Số lần được đọc lại từ cache
+
+    def __repr__(self):
+        return f'<WordLookupCacheEntry {self.source}:{self.word_key}>'
+
+
+class WordSenseEntry(db.Model):
+    """
+    Tất cả các nghĩa (loại từ, định nghĩa, ví dụ, từ đồng nghĩa, phiên âm) của một từ lấy từ dictionaryapi.dev,
+    lưu gọn dưới dạng JSON (xem sense_store.py). Dùng để hiện các nghĩa khác của một từ đã lưu
+    và đổi sang nghĩa khác mà không phải gọi lại API.
+    """
+    __tablename__ = 'word_sense'
+    id = db.Column(db.Integer, primary_key=True)
+    word_key = db.Column(db.String(200), nullable=False, unique=True)  # Từ đã chuẩn hóa (strip + lowercase)
+    payload = db.Column(db.Text, nullable=False)  # Các nghĩa ở dạng gọn, xem sense_store.pack_senses
+    sense_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_accessed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<WordSenseEntry {self.word_key} ({self.sense_count} senses)>'
+
+
+class CacheStat(db.Model):
+    """
+    Bộ đếm hit/miss của các lớp cache, hiển thị cùng thống kê APILog trên trang admin.
+    """
+    __tablename__ = 'cache_stat'
+    cache_name = db.Column(db.String(100), primary_key=True)  # Ví dụ: 'dictionary_api'
+    hot_hits = db.Column(db.Integer, default=0, nullable=False)  # Số lần trúng cache trong bộ nhớ tiến trình
+    db_hits = db.Column(db.Integer, default=0, nullable=False)  # Số lần trúng cache trong database
+    misses = db.Column(db.Integer, default=0, nullable=False)  # Số lần phải gọi API bên ngoài
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CacheStat {self.cache_name} hot={self.hot_hits} db={self.db_hits} miss={self.misses}>'
+
+
+class NegativeLookupEntry(db.Model):
+    """
+    Các từ mà upstream đã trả lời chắc chắn là "không có" (ví dụ dictionaryapi.dev trả 404), giữ trong thời gian ngắn
+    (TTL) để lần tra lại không phải gọi mạng. Bloom filter trong negative_cache.py được dựng lại từ bảng này.
+    """
+    __tablename__ = 'negative_lookup'
+    __table_args__ = (
+        db.UniqueConstraint('source', 'word_key', name='uq_negative_lookup_source_word'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(50), nullable=False)  # Upstream, ví dụ: 'dictionary_api', 'tatoeba_api'
+    word_key = db.Column(db.String(200), nullable=False)  # Khóa đã chuẩn hóa (xem các hàm gọi add_missing)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Sau thời điểm này thì gọi lại upstream
+    miss_count = db.Column(db.Integer, default=1, nullable=False)  # Số lần upstream trả lời "không có"
+
+    def __repr__(self):
+        return f'<NegativeLookupEntry {self.source}:{self.word_key}>'
+
+
+class TranslationMemoEntry(db.Model):
+    """
+    Bộ nhớ dịch (translation memo): lưu lại bản dịch của các đoạn văn bản đã từng dịch,
+    khóa bởi (ngôn ngữ nguồn, ngôn ngữ đích, hash của văn bản đã chuẩn hóa).
+    """
+    __tablename__ = 'translation_memo'
+    __table_args__ = (
+        db.UniqueConstraint('source_lang', 'target_lang', 'text_hash', name='uq_translation_memo_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    source_lang = db.Column(db.String(10), nullable=False)  # Ví dụ: 'auto', 'en'
+    target_lang = db.Column(db.String(10), nullable=False)  # Ví dụ: 'vi'
+    text_hash = db.Column(db.String(64), nullable=False, index=True)  # SHA-256 của văn bản đã chuẩn hóa
+    source_text = db.Column(db.Text, nullable=False)  # Văn bản gốc (để admin tra cứu/kiểm tra)
+    translated_text = db.Column(db.Text, nullable=False)  # Bản dịch
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_accessed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    hit_count = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<TranslationMemoEntry {self.source_lang}->{self.target_lang} {self.text_hash[:12]}>'
+
+
+class BackgroundJob(db.Model):
+    """
+    Hàng đợi công việc chạy nền (bền vững trong database), ví dụ lấy thông tin cho một danh sách từ dài.
+    Công việc được worker (thread trong tiến trình web hoặc tiến trình `flask jobs-worker` riêng) nhận và xử lý;
+    kết quả từng phần được ghi lại sau mỗi đoạn nên công việc có thể chạy tiếp sau khi worker khởi động lại.
+    """
+    __tablename__ = 'background_job'
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, trả về cho trình duyệt để hỏi trạng thái
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)  # Người tạo công việc
+    job_type = db.Column(db.String(50), nullable=False)  # Ví dụ: 'enrich_words'
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued/running/done/failed
+    payload = db.Column(db.Text, nullable=False)  # Dữ liệu đầu vào (JSON)
+    # Bảng thống kê (JSON, kích thước cố định) được cập nhật dần trong lúc chạy; danh sách kết quả từng phần
+    # nằm trong BackgroundJobChunk
+    results = db.Column(db.Text, nullable=True)
+    total = db.Column(db.Integer, default=0, nullable=False)  # Tổng số phần tử cần xử lý
+    completed = db.Column(db.Integer, default=0, nullable=False)  # Số phần tử đã xử lý xong
+    attempts = db.Column(db.Integer, default=0, nullable=False)  # Số lần đã được worker nhận
+    error_message = db.Column(db.Text, nullable=True)
+    worker_id = db.Column(db.String(100), nullable=True)  # Worker đang giữ công việc
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Lần cuối worker báo còn sống (sau mỗi đoạn)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.id} {self.job_type} {self.status} {self.completed}/{self.total}>'
+
+
+class BackgroundJobChunk(db.Model):
+    """
+    Kết quả của một đoạn công việc nền (ví dụ thẻ từ vựng của JOB_CHUNK_SIZE từ), chỉ được thêm, không sửa.
+    Mỗi đoạn ghi một dòng mới thay vì ghi lại toàn bộ kết quả; khi đọc thì ghép các dòng theo start_index.
+    """
+    __tablename__ = 'background_job_chunk'
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'start_index', name='uq_background_job_chunk_job_start'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), db.ForeignKey('background_job.id'), nullable=False)
+    start_index = db.Column(db.Integer, nullable=False)  # Vị trí (trong payload) của phần tử đầu tiên của đoạn
+    item_count = db.Column(db.Integer, nullable=False)
+    results = db.Column(db.Text, nullable=False)  # Danh sách kết quả của đoạn (JSON)
+
+    def __repr__(self):
+        return f'<BackgroundJobChunk {self.job_id} [{self.start_index}:{self.start_index + self.item_count}]>'
@@ -0,0 +1,271 @@
+# negative_cache.py
+
+# --- Standard Library Imports ---
+import hashlib  # Tạo các vị trí bit của Bloom filter
+import logging
+import math
+import mmap  # Ánh xạ file filter vào bộ nhớ: mọi worker process dùng chung một bản
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+
+# --- Third-party Library Imports ---
+from sqlalchemy import select
+
+# --- Application-Specific Imports ---
+from models import db, NegativeLookupEntry
+
+logger = logging.getLogger(__name__)
+
+# === ĐỊNH DẠNG FILE BLOOM FILTER ===
+# [header][mảng bit]
+#   header: magic (8 byte), số bit (uint64), số hàm băm (uint32), số phần tử dự kiến (uint64), tỉ lệ dương tính giả (double)
+BLOOM_MAGIC = b"PVBLOOM1"
+HEADER_FORMAT = "<8sQIQd"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+
+def bloom_parameters(expected_items, fp_rate):
+    """
+    Kích thước tối ưu cho n phần tử với tỉ lệ dương tính giả p:
+        m = -n * ln(p) / (ln 2)^2 bit,  k = (m / n) * ln 2 hàm băm.
+    """
+    expected_items = max(1, int(expected_items))
+    fp_rate = min(max(fp_rate, 1e-9), 0.5)
+    num_bits = max(64, int(math.ceil(-expected_items * math.log(fp_rate) / (math.log(2) ** 2))))
+    num_hashes = max(1, int(round(num_bits / expected_items * math.log(2))))
+    return num_bits, num_hashes
+
+
+def _bit_positions(item, num_bits, num_hashes):
+    """k vị trí bit của một phần tử (double hashing trên BLAKE2b 128 bit)."""
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % num_bits for i in range(num_hashes)]
+
+
+def build_bloom_filter(path, items, expected_items, fp_rate):
+    """
+    Dựng file Bloom filter chứa `items` rồi đổi tên vào vị trí đích (tiến trình đang đọc không thấy file dở dang).
+
+    Returns:
+        dict: {'items', 'num_bits', 'num_hashes', 'size_bytes'}.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    num_bits, num_hashes = bloom_parameters(expected_items, fp_rate)
+    bits = bytearray((num_bits + 7) // 8)
+    count = 0
+    for item in items:
+        for position in _bit_positions(item, num_bits, num_hashes):
+            bits[position >> 3] |= 1 << (position & 7)
+        count += 1
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(struct.pack(HEADER_FORMAT, BLOOM_MAGIC, num_bits, num_hashes, int(expected_items), float(fp_rate)))
+        out.write(bits)
+    os.replace(tmp_path, path)
+    return {'items': count, 'num_bits': num_bits, 'num_hashes': num_hashes, 'size_bytes': HEADER_SIZE + len(bits)}
+
+
+class _MappedBloomFilter:
+    """
+    Bloom filter trên một file được mmap ở chế độ ghi chung (MAP_SHARED): bit do một tiến trình thêm vào
+    các tiến trình khác thấy ngay. Hai tiến trình cùng ghi một byte có thể làm mất một bit; khi đó chỉ
+    tốn thêm một lần tra bảng/gọi API, không bao giờ trả lời sai "không có".
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "r+b")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE)
+        except ValueError:
+            self._file.close()
+            raise
+        magic, self.num_bits, self.num_hashes, self.expected_items, self.fp_rate = \
+            struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if magic != BLOOM_MAGIC or len(self._mm) < HEADER_SIZE + (self.num_bits + 7) // 8:
+            self.close()
+            raise ValueError(f"File {path} không phải Bloom filter hợp lệ.")
+
+    def might_contain(self, item):
+        mm = self._mm
+        for position in _bit_positions(item, self.num_bits, self.num_hashes):
+            if not mm[HEADER_SIZE + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, item):
+        mm = self._mm
+        for position in _bit_positions(item, self.num_bits, self.num_hashes):
+            offset = HEADER_SIZE + (position >> 3)
+            mm[offset] = mm[offset] | (1 << (position & 7))
+
+    def describe(self):
+        """Kích thước, độ đầy và tỉ lệ dương tính giả ước tính hiện tại (theo số bit đã bật)."""
+        set_bits = int.from_bytes(self._mm[HEADER_SIZE:], "little").bit_count()
+        fill_ratio = set_bits / self.num_bits
+        estimated_items = (-self.num_bits / self.num_hashes * math.log(1 - fill_ratio)) if fill_ratio < 1 else None
+        return {
+            "num_bits": self.num_bits,
+            "num_hashes": self.num_hashes,
+            "size_bytes": len(self._mm),
+            "expected_items": self.expected_items,
+            "configured_fp_rate": self.fp_rate,
+            "fill_ratio": fill_ratio,
+            "estimated_items": int(estimated_items) if estimated_items is not None else None,
+            "estimated_fp_rate": fill_ratio ** self.num_hashes,
+        }
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class NegativeLookupCache:
+    """
+    Cache "biết là không có" cho các upstream (từ gõ sai, tên riêng... mà từ điển trả 404).
+
+    - Bảng negative_lookup: danh sách chính xác, mỗi mục có TTL ngắn. Trúng bảng -> trả lời ngay, không gọi mạng.
+    - Bloom filter (file mmap, dùng chung giữa các worker process) đứng trước bảng: phần lớn các từ bình thường
+      được filter trả lời "chắc chắn không có trong danh sách" mà không tốn truy vấn database.
+      Filter chỉ thêm bit, không xóa được; `rebuild()` (lệnh `flask negative-cache-rebuild`) dọn các mục
+      hết hạn và dựng lại filter từ bảng.
+
+    Khóa truyền vào là (nguồn, khóa đã chuẩn hóa); bên gọi tự chuẩn hóa (ví dụ normalize_word_key).
+    """
+
+    def __init__(self, filter_path, ttl_seconds, fp_rate=0.01, expected_items=100000, recheck_seconds=60):
+        self.filter_path = filter_path
+        self.ttl_seconds = ttl_seconds
+        self.fp_rate = fp_rate
+        self.expected_items = expected_items
+        self.recheck_seconds = recheck_seconds
+
+        self._filter = None
+        self._filter_id = None  # (st_dev, st_ino): file bị thay thế khi rebuild -> mmap lại
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._counters = {'filter_skips': 0, 'hits': 0, 'table_misses': 0, 'added': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _current_filter(self, force=False):
+        """Trả về filter đang mmap (kiểm tra file bị thay thế tối đa mỗi recheck_seconds), hoặc None."""
+        now = time.monotonic()
+        if not force and self._last_check and now - self._last_check < self.recheck_seconds:
+            return self._filter
+
+        with self._lock:
+            self._last_check = now
+            try:
+                stat = os.stat(self.filter_path)
+                filter_id = (stat.st_dev, stat.st_ino)
+            except OSError:
+                filter_id = None
+
+            if filter_id != self._filter_id:
+                # Bản cũ không close ngay vì thread khác có thể đang đọc
+                try:
+                    self._filter = _MappedBloomFilter(self.filter_path) if filter_id is not None else None
+                except (OSError, ValueError) as e:
+                    logger.error("Không thể mở Bloom filter '%s': %s", self.filter_path, e)
+                    self._filter = None
+                self._filter_id = filter_id
+            return self._filter
+
+    @staticmethod
+    def _item(source, key):
+        return f"{source}:{key}"
+
+    def is_known_missing(self, source, key):
+        """True nếu upstream `source` đã trả lời "không có" cho `key` và mục đó chưa hết hạn. Cần app context."""
+        if not key:
+            return False
+        bloom = self._current_filter()
+        if bloom is not None and not bloom.might_contain(self._item(source, key)):
+            self._count('filter_skips')
+            return False
+
+        table = NegativeLookupEntry.__table__
+        try:
+            with db.engine.connect() as connection:
+                expires_at = connection.execute(select(table.c.expires_at).where(
+                    table.c.source == source, table.c.word_key == key)).scalar()
+        except Exception as e:
+            logger.error("Lỗi khi đọc negative cache cho '%s:%s': %s", source, key, e)
+            return False
+        if expires_at is not None and expires_at > datetime.utcnow():
+            self._count('hits')
+            return True
+        self._count('table_misses')  # Dương tính giả của filter, mục đã hết hạn, hoặc chưa có filter
+        return False
+
+    def add_missing(self, source, key):
+        """
+        Ghi nhận upstream `source` trả lời "không có" cho `key`. Chỉ gọi với câu trả lời chắc chắn (không phải lỗi mạng).
+        Ghi trên kết nối riêng: không commit/rollback db.session của request đang gọi.
+        """
+        if not key:
+            return
+        table = NegativeLookupEntry.__table__
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        try:
+            with db.engine.begin() as connection:
+                updated = connection.execute(
+                    table.update().where(table.c.source == source, table.c.word_key == key)
+                    .values(expires_at=expires_at, miss_count=table.c.miss_count + 1)).rowcount
+                if not updated:
+                    connection.execute(table.insert().values(source=source, word_key=key, created_at=now,
+                                                             expires_at=expires_at, miss_count=1))
+        except Exception as e:
+            logger.error("Lỗi khi ghi negative cache cho '%s:%s': %s", source, key, e)
+            return
+
+        bloom = self._current_filter()
+        if bloom is None:
+            # Chưa có file filter: tạo filter rỗng theo cấu hình (tiến trình khác sẽ thấy sau recheck_seconds)
+            try:
+                build_bloom_filter(self.filter_path, [], self.expected_items, self.fp_rate)
+            except OSError as e:
+                logger.error("Không thể tạo Bloom filter '%s': %s", self.filter_path, e)
+            bloom = self._current_filter(force=True)
+        if bloom is not None:
+            bloom.add(self._item(source, key))
+        self._count('added')
+
+    def rebuild(self):
+        """
+        Xóa các mục đã hết hạn và dựng lại Bloom filter từ các mục còn hạn. Cần app context.
+        Kích thước filter = max(expected_items, 2 x số mục hiện có) để còn chỗ cho các mục mới.
+
+        Returns:
+            dict: Kết quả của build_bloom_filter, thêm 'expired_deleted'.
+        """
+        now = datetime.utcnow()
+        expired_deleted = NegativeLookupEntry.query.filter(NegativeLookupEntry.expires_at <= now).delete(
+            synchronize_session=False)
+        db.session.commit()
+
+        items = [self._item(row.source, row.word_key) for row in
+                 db.session.query(NegativeLookupEntry.source, NegativeLookupEntry.word_key).all()]
+        result = build_bloom_filter(self.filter_path, items, max(self.expected_items, 2 * len(items)), self.fp_rate)
+        self._current_filter(force=True)
+        result['expired_deleted'] = expired_deleted
+        return result
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        bloom = self._current_filter()
+        counters['filter'] = bloom.describe() if bloom is not None else None
+        counters['ttl_seconds'] = self.ttl_seconds
+        counters['entries'] = NegativeLookupEntry.query.filter(
+            NegativeLookupEntry.expires_at > datetime.utcnow()).count()  # Cần app context
+        return counters
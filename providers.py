@@ -0,0 +1,73 @@
+# providers.py
+
+# --- Standard Library Imports ---
+from urllib.parse import quote, urlencode
+
+# Địa chỉ mặc định của các API công khai
+DEFAULT_DICTIONARY_BASE_URL = "https://api.dictionaryapi.dev"
+DEFAULT_TATOEBA_BASE_URL = "https://tatoeba.org"
+DEFAULT_LIBRETRANSLATE_BASE_URL = "https://libretranslate.de"
+
+
+class UpstreamProvider:
+    """
+    Một nhà cung cấp dữ liệu bên ngoài: biết địa chỉ (base URL) và cách dựng URL cho từng loại yêu cầu.
+    Các fetcher trong app.py chỉ lấy URL từ provider, nên có thể trỏ cả ứng dụng về server khác
+    (ví dụ stub_servers.py khi chạy CI/benchmark không có Internet) mà không sửa code.
+    """
+
+    name = None
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def describe(self):
+        return {"name": self.name, "base_url": self.base_url}
+
+
+class DictionaryProvider(UpstreamProvider):
+    """API tương thích dictionaryapi.dev: GET /api/v2/entries/<ngôn ngữ>/<từ>."""
+
+    name = "dictionary"
+
+    def entry_url(self, word, lang="en"):
+        return f"{self.base_url}/api/v2/entries/{lang}/{quote(word, safe='')}"
+
+
+class TatoebaProvider(UpstreamProvider):
+    """API tìm câu ví dụ tương thích tatoeba.org: GET /en/api_v0/search?..."""
+
+    name = "tatoeba"
+
+    def search_url(self, word, source_lang, target_lang):
+        query = urlencode([("from", source_lang), ("query", word), ("orphans", "no"), ("unapproved", "no"),
+                           ("trans_filter", "limit"), ("to", target_lang)])
+        return f"{self.base_url}/en/api_v0/search?{query}"
+
+
+class LibreTranslateProvider(UpstreamProvider):
+    """API dịch tương thích LibreTranslate: POST /translate (form cho một đoạn, JSON cho nhiều đoạn)."""
+
+    name = "libretranslate"
+
+    def translate_url(self):
+        return f"{self.base_url}/translate"
+
+
+def build_providers(config):
+    """
+    Dựng các provider từ cấu hình. UPSTREAM_BASE_URL (nếu có) trỏ tất cả provider về cùng một server;
+    nếu không thì mỗi provider dùng *_BASE_URL của riêng nó.
+
+    Returns:
+        dict: {'dictionary': DictionaryProvider, 'tatoeba': TatoebaProvider, 'libretranslate': LibreTranslateProvider}.
+    """
+    shared_base_url = config.get('UPSTREAM_BASE_URL')
+    return {
+        DictionaryProvider.name: DictionaryProvider(
+            shared_base_url or config.get('DICTIONARY_API_BASE_URL') or DEFAULT_DICTIONARY_BASE_URL),
+        TatoebaProvider.name: TatoebaProvider(
+            shared_base_url or config.get('TATOEBA_API_BASE_URL') or DEFAULT_TATOEBA_BASE_URL),
+        LibreTranslateProvider.name: LibreTranslateProvider(
+            shared_base_url or config.get('LIBRETRANSLATE_BASE_URL') or DEFAULT_LIBRETRANSLATE_BASE_URL),
+    }
@@ -0,0 +1,243 @@
+# retention.py
+
+# --- Standard Library Imports ---
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, date, timedelta
+
+# --- Third-party Library Imports ---
+from sqlalchemy import DateTime, select, text
+
+# --- Application-Specific Imports ---
+from models import db, APILog, UserActivity
+
+logger = logging.getLogger(__name__)
+
+# Các bảng log được áp dụng retention (tên bảng -> model). Cả hai đều có index (timestamp, id).
+RETENTION_MODELS = {
+    APILog.__tablename__: APILog,
+    UserActivity.__tablename__: UserActivity,
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Không thể ghi kiểu {type(value).__name__} vào archive")
+
+
+class LogRetention:
+    """
+    Retention cho các bảng log (api_log, user_activity): các dòng cũ hơn số ngày cấu hình được chuyển sang file
+    archive NDJSON nén gzip, chia theo ngày (<archive_dir>/<bảng>/<YYYY-MM-DD>.ndjson.gz), rồi mới bị xóa khỏi bảng.
+
+    - Làm theo từng lô batch_size dòng (đọc theo index (timestamp, id)): ghi archive + fsync, sau đó xóa lô đó
+      trong một transaction ngắn, nghỉ batch_pause giây để các request khác lấy được write lock.
+    - Mỗi lô được nối vào file của ngày tương ứng như một gzip member mới; gzip đọc lại được cả file.
+      Nếu tiến trình chết giữa lúc ghi archive và lúc xóa, lần chạy sau ghi lại lô đó (archive có thể trùng dòng,
+      reimport bỏ qua các id đã có).
+    - Cuối cùng (SQLite) chạy PRAGMA incremental_vacuum theo từng đợt vacuum_pages trang để trả lại dung lượng.
+    - Các bảng rollup (api_call_rollup theo ngày, ...) không bị ảnh hưởng: số liệu tổng trên trang admin vẫn giữ nguyên.
+    """
+
+    def __init__(self, app, archive_dir, retention_days, batch_size=1000, batch_pause=0.05, vacuum_pages=1000):
+        self.app = app
+        self.archive_dir = archive_dir
+        self.retention_days = dict(retention_days)  # {tên bảng: số ngày}, 0/None: giữ mãi
+        self.batch_size = max(1, int(batch_size))
+        self.batch_pause = batch_pause
+        self.vacuum_pages = max(1, int(vacuum_pages))
+
+    # --- Archive ---
+
+    def archive_path(self, table_name, day):
+        return os.path.join(self.archive_dir, table_name, f"{day.isoformat()}.ndjson.gz")
+
+    def _append_to_archive(self, table_name, rows):
+        """Ghi các dòng vào file archive theo ngày của timestamp. Trả về danh sách file đã ghi."""
+        rows_by_day = {}
+        for row in rows:
+            rows_by_day.setdefault(row['timestamp'].date(), []).append(row)
+
+        os.makedirs(os.path.join(self.archive_dir, table_name), exist_ok=True)
+        written_paths = []
+        for day, day_rows in sorted(rows_by_day.items()):
+            path = self.archive_path(table_name, day)
+            with open(path, "ab") as raw_file:
+                with gzip.GzipFile(fileobj=raw_file, mode="wb") as gzip_file:
+                    for row in day_rows:
+                        line = json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+                        gzip_file.write(line.encode("utf-8") + b"\n")
+                raw_file.flush()
+                os.fsync(raw_file.fileno())  # Archive phải nằm trên đĩa trước khi xóa dòng khỏi database
+            written_paths.append(path)
+        return written_paths
+
+    def purge_table(self, table_name, cutoff, dry_run=False):
+        """
+        Chuyển các dòng có timestamp < cutoff của một bảng sang archive rồi xóa khỏi bảng.
+
+        Returns:
+            dict: {'table', 'cutoff', 'archived', 'deleted', 'files'} (dry_run: chỉ đếm, không ghi/xóa).
+        """
+        table = RETENTION_MODELS[table_name].__table__
+        result = {"table": table_name, "cutoff": cutoff, "archived": 0, "deleted": 0, "files": set()}
+
+        with self.app.app_context():
+            if dry_run:
+                with db.engine.connect() as connection:
+                    result["archived"] = connection.execute(
+                        select(db.func.count()).select_from(table).where(table.c.timestamp < cutoff)).scalar()
+                return result
+
+            while True:
+                with db.engine.connect() as connection:
+                    rows = [dict(row._mapping) for row in connection.execute(
+                        table.select().where(table.c.timestamp < cutoff)
+                        .order_by(table.c.timestamp, table.c.id).limit(self.batch_size))]
+                if not rows:
+                    break
+
+                result["files"].update(self._append_to_archive(table_name, rows))
+                result["archived"] += len(rows)
+
+                ids = [row['id'] for row in rows]
+                with db.engine.begin() as connection:  # Transaction ngắn: chỉ giữ write lock cho một lô
+                    result["deleted"] += connection.execute(table.delete().where(table.c.id.in_(ids))).rowcount
+
+                if len(rows) < self.batch_size:
+                    break
+                if self.batch_pause:
+                    time.sleep(self.batch_pause)
+        return result
+
+    def run(self, now=None, dry_run=False):
+        """Áp dụng retention cho mọi bảng đã cấu hình, rồi incremental vacuum. Trả về list kết quả từng bảng."""
+        now = now or datetime.utcnow()
+        results = []
+        for table_name, days in self.retention_days.items():
+            if not days:
+                continue
+            results.append(self.purge_table(table_name, now - timedelta(days=days), dry_run=dry_run))
+        if not dry_run and any(result["deleted"] for result in results):
+            self.incremental_vacuum()
+        return results
+
+    # --- Vacuum ---
+
+    def incremental_vacuum(self):
+        """
+        Trả các trang trống về cho hệ điều hành theo từng đợt nhỏ (chỉ SQLite, và chỉ khi auto_vacuum=INCREMENTAL;
+        xem enable_incremental_vacuum). Trả về số trang đã giải phóng, None nếu không áp dụng được.
+        """
+        with self.app.app_context():
+            if db.engine.dialect.name != "sqlite":
+                return None
+            with db.engine.connect() as connection:
+                if connection.execute(text("PRAGMA auto_vacuum")).scalar() != 2:  # 2 = INCREMENTAL
+                    logger.warning("Bỏ qua incremental vacuum: database chưa bật auto_vacuum=INCREMENTAL "
+                                   "(chạy 'flask logs-retention --enable-incremental-vacuum' một lần).")
+                    return None
+                freed_pages = 0
+                while True:
+                    free_pages = connection.execute(text("PRAGMA freelist_count")).scalar()
+                    if not free_pages:
+                        break
+                    connection.exec_driver_sql(f"PRAGMA incremental_vacuum({min(free_pages, self.vacuum_pages)})")
+                    connection.commit()
+                    freed_pages += min(free_pages, self.vacuum_pages)
+                    if self.batch_pause:
+                        time.sleep(self.batch_pause)
+                return freed_pages
+
+    def enable_incremental_vacuum(self):
+        """Bật auto_vacuum=INCREMENTAL cho SQLite. Cần một lần VACUUM toàn bộ (khóa database trong lúc chạy)."""
+        with self.app.app_context():
+            if db.engine.dialect.name != "sqlite":
+                return False
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+                connection.commit()
+                connection.execution_options(isolation_level="AUTOCOMMIT").exec_driver_sql("VACUUM")
+            return True
+
+    # --- Re-import ---
+
+    def reimport(self, table_name, since, until):
+        """
+        Đưa các dòng trong archive có since <= timestamp < until trở lại bảng (để điều tra sự cố).
+        Một dòng chỉ được coi là đã có khi nội dung (mọi cột) trùng khớp, nên chạy lại nhiều lần cũng không tạo bản trùng.
+        Bảng dùng INTEGER PRIMARY KEY không có AUTOINCREMENT: sau khi retention xóa hết các dòng, SQLite cấp lại
+        các id cũ cho dòng mới. Dòng archive có id đã bị một dòng KHÁC chiếm (collision) được thêm với id mới.
+        Ghi thẳng vào bảng, không qua api_log_sink: các bảng rollup đã tính những dòng này từ trước.
+
+        Returns:
+            dict: {'read', 'inserted', 'skipped' (đã có, trùng nội dung), 'collisions' (thêm với id mới), 'files'}
+        """
+        table = RETENTION_MODELS[table_name].__table__
+        datetime_columns = [column.key for column in table.columns if isinstance(column.type, DateTime)]
+        result = {"read": 0, "inserted": 0, "skipped": 0, "collisions": 0, "files": 0}
+
+        def same_content(existing_row, row):
+            return all(existing_row[key] == value for key, value in row.items() if key != 'id')
+
+        def content_exists(connection, row):
+            """Đã có dòng nào (id bất kỳ) trùng mọi cột với `row` chưa, ví dụ bản đã import lại với id mới."""
+            conditions = [table.c[key].is_(None) if value is None else table.c[key] == value
+                          for key, value in row.items() if key != 'id']
+            return connection.execute(select(table.c.id).where(*conditions).limit(1)).first() is not None
+
+        def insert_batch(batch):
+            with db.engine.begin() as connection:
+                existing_rows = {existing_row.id: existing_row._mapping for existing_row in connection.execute(
+                    select(table).where(table.c.id.in_([row['id'] for row in batch])))}
+                new_rows = []
+                collided_rows = []
+                for row in batch:
+                    existing_row = existing_rows.get(row['id'])
+                    if existing_row is None:
+                        new_rows.append(row)
+                        existing_rows[row['id']] = row  # Archive có thể chứa cùng một dòng hai lần
+                    elif same_content(existing_row, row) or content_exists(connection, row):
+                        result["skipped"] += 1
+                    else:
+                        collided_rows.append({key: value for key, value in row.items() if key != 'id'})
+                if new_rows:
+                    connection.execute(table.insert(), new_rows)
+                for row in collided_rows:
+                    # Từng dòng một: các dòng có thể khác tập cột (archive từ phiên bản schema khác)
+                    connection.execute(table.insert().values(row))
+            result["inserted"] += len(new_rows) + len(collided_rows)
+            result["collisions"] += len(collided_rows)
+
+        with self.app.app_context():
+            day = since.date()
+            while day <= (until - timedelta(microseconds=1)).date():
+                path = self.archive_path(table_name, day)
+                day += timedelta(days=1)
+                if not os.path.exists(path):
+                    continue
+                result["files"] += 1
+                batch = []
+                with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+                    for line in archive_file:
+                        if not line.strip():
+                            continue
+                        # Chỉ giữ các cột bảng hiện có (archive cũ có thể ghi từ phiên bản schema khác)
+                        row = {key: value for key, value in json.loads(line).items() if key in table.c}
+                        for key in datetime_columns:
+                            if row.get(key):
+                                row[key] = datetime.fromisoformat(row[key])
+                        if not (since <= row['timestamp'] < until):
+                            continue
+                        result["read"] += 1
+                        batch.append(row)
+                        if len(batch) >= self.batch_size:
+                            insert_batch(batch)
+                            batch = []
+                if batch:
+                    insert_batch(batch)
+        return result
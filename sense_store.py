@@ -0,0 +1,118 @@
+# sense_store.py
+
+# --- Standard Library Imports ---
+import json
+from datetime import datetime, timedelta
+
+# --- Third-party Library Imports ---
+from sqlalchemy import select
+
+# --- Application-Specific Imports ---
+from models import WordSenseEntry
+from lookup_cache import TwoTierCache, normalize_word_key
+
+SENSE_STORE_STATS_NAME = "word_sense"  # Tên dòng thống kê hit/miss trong bảng cache_stat
+
+
+def pack_senses(entries, max_senses=30, max_synonyms=5):
+    """
+    Rút gọn danh sách entry theo định dạng dictionaryapi.dev thành dạng lưu trữ gọn:
+        {"p": [phiên âm, ...], "s": [[loại từ, định nghĩa, ví dụ hoặc null, [từ đồng nghĩa]], ...]}
+    Giữ tất cả các nghĩa của mọi entry (theo thứ tự API trả về), tối đa max_senses nghĩa.
+    Trả về None nếu không có nghĩa nào.
+    """
+    if not isinstance(entries, list):
+        return None
+
+    phonetics = []
+    senses = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        for phonetic_item in entry.get("phonetics") or []:
+            text = (phonetic_item or {}).get("text")
+            if text and text not in phonetics:
+                phonetics.append(text)
+        for meaning_obj in entry.get("meanings") or []:
+            part_of_speech = meaning_obj.get("partOfSpeech") or "N/A"
+            # Từ đồng nghĩa có thể nằm ở cấp meaning hoặc cấp từng định nghĩa
+            meaning_synonyms = meaning_obj.get("synonyms") or []
+            for definition_obj in meaning_obj.get("definitions") or []:
+                definition_en = definition_obj.get("definition")
+                if not definition_en:
+                    continue
+                synonyms = list(dict.fromkeys((definition_obj.get("synonyms") or []) + meaning_synonyms))
+                senses.append([part_of_speech, definition_en, definition_obj.get("example") or None,
+                               synonyms[:max_synonyms]])
+                if len(senses) >= max_senses:
+                    return {"p": phonetics, "s": senses}
+    if not senses:
+        return None
+    return {"p": phonetics, "s": senses}
+
+
+def unpack_senses(packed):
+    """Chuyển dạng gọn về dạng dùng trong ứng dụng: {'ipa', 'phonetics', 'senses': [{'index', 'type', ...}]}."""
+    phonetics = packed.get("p") or []
+    return {
+        "ipa": phonetics[0] if phonetics else "N/A",
+        "phonetics": phonetics,
+        "senses": [{"index": index, "type": part_of_speech, "definition_en": definition_en,
+                    "example_en": example_en, "synonyms": synonyms}
+                   for index, (part_of_speech, definition_en, example_en, synonyms) in enumerate(packed.get("s") or [])],
+    }
+
+
+class WordSenseStore(TwoTierCache):
+    """
+    Kho các nghĩa của từng từ (bảng word_sense), khóa bởi từ đã chuẩn hóa.
+    Được ghi mỗi khi dictionaryapi.dev trả về kết quả, nên việc hiện/đổi nghĩa khác của một từ đã tra
+    không cần gọi lại API. Giá trị (cả trong bộ nhớ lẫn database) là dạng gọn của pack_senses.
+    """
+
+    def __init__(self, stats, ttl_seconds, max_rows, hot_size, touch_interval_seconds=3600):
+        super().__init__(cache_name=SENSE_STORE_STATS_NAME, stats=stats, ttl_seconds=ttl_seconds,
+                         max_rows=max_rows, hot_size=hot_size)
+        self.touch_interval = timedelta(seconds=touch_interval_seconds)
+
+    def _db_get(self, connection, key):
+        table = WordSenseEntry.__table__
+        row = connection.execute(select(table.c.id, table.c.payload, table.c.created_at, table.c.last_accessed_at)
+                                 .where(table.c.word_key == key)).first()
+        if row is None:
+            return None
+
+        now = datetime.utcnow()
+        if self.ttl_seconds and row.created_at < now - timedelta(seconds=self.ttl_seconds):
+            return None
+
+        self._touch(connection, table, row, now, count_hit=False)
+        return json.loads(row.payload)
+
+    def _db_set(self, connection, key, value):
+        table = WordSenseEntry.__table__
+        now = datetime.utcnow()
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        updated = connection.execute(table.update().where(table.c.word_key == key)
+                                     .values(payload=payload, sense_count=len(value["s"]),
+                                             created_at=now, last_accessed_at=now)).rowcount
+        if not updated:
+            connection.execute(table.insert().values(word_key=key, payload=payload, sense_count=len(value["s"]),
+                                                     created_at=now, last_accessed_at=now))
+
+    def _db_delete(self, connection, key):
+        connection.execute(WordSenseEntry.__table__.delete().where(WordSenseEntry.__table__.c.word_key == key))
+
+    def _prune(self, connection):
+        self._prune_oldest(connection, WordSenseEntry.__table__)
+
+    def get_senses(self, word):
+        """Trả về dạng gọn các nghĩa của `word`, hoặc None nếu chưa có."""
+        return self.get(normalize_word_key(word))
+
+    def store_entries(self, word, entries, max_senses=30):
+        """Rút gọn và lưu các nghĩa từ response của dictionaryapi.dev. Trả về dạng gọn (None nếu không có nghĩa)."""
+        packed = pack_senses(entries, max_senses=max_senses)
+        if packed is not None:
+            self.set(normalize_word_key(word), packed)
+        return packed
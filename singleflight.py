@@ -0,0 +1,134 @@
+# singleflight.py
+
+# --- Standard Library Imports ---
+import hashlib  # Băm khóa để chọn file khóa liên tiến trình
+import os
+import threading
+import time
+
+try:
+    import fcntl  # Khóa file giữa các tiến trình (chỉ có trên POSIX)
+except ImportError:  # Windows: chỉ gộp trong một tiến trình
+    fcntl = None
+
+
+class _Flight:
+    """Một lời gọi đang chạy; các thread đến sau chờ trên `done` và dùng chung kết quả."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Gộp các lời gọi đồng thời có cùng khóa thành MỘT lời gọi upstream.
+
+    - Trong một tiến trình: thread đầu tiên (leader) chạy hàm, các thread khác cùng khóa chờ và nhận
+      chung kết quả (hoặc chung exception).
+    - Giữa các tiến trình (tùy chọn, cần lock_dir và hàm `recheck`): leader giữ khóa file trước khi gọi upstream.
+      Tiến trình đến sau chờ khóa, rồi gọi `recheck` (ví dụ tra lại cache trong database mà leader của
+      tiến trình kia vừa ghi) trước khi tự gọi upstream.
+
+    Khóa file được chia theo `lock_stripes` file cố định (theo hash của khóa), nên số file không tăng theo số từ.
+    """
+
+    def __init__(self, lock_dir=None, lock_timeout=30, lock_stripes=256):
+        """
+        Args:
+            lock_dir (str, optional): Thư mục chứa file khóa liên tiến trình. None/"" -> chỉ gộp trong tiến trình.
+            lock_timeout (float): Thời gian chờ khóa file tối đa (giây). Hết thời gian thì tự gọi upstream.
+            lock_stripes (int): Số file khóa.
+        """
+        self.lock_dir = lock_dir if (lock_dir and fcntl is not None) else None
+        self.lock_timeout = lock_timeout
+        self.lock_stripes = max(1, int(lock_stripes))
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._counters = {'leaders': 0, 'coalesced': 0, 'cross_process_hits': 0, 'lock_timeouts': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def do(self, key, fn, *args, recheck=None, **kwargs):
+        """
+        Chạy fn(*args, **kwargs) một lần cho mỗi khóa đang "bay".
+
+        Args:
+            key (str): Khóa gộp, ví dụ "dictionary_api:apple".
+            fn (callable): Hàm gọi upstream (nên tự ghi kết quả vào cache dùng chung trước khi trả về).
+            recheck (callable, optional): Hàm không tham số, trả về kết quả đã có sẵn (hoặc None).
+                                          Chỉ được dùng khi bật khóa liên tiến trình.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._flights[key] = _Flight()
+                self._counters['leaders'] += 1
+            else:
+                self._counters['coalesced'] += 1
+
+        # 1. Thread đến sau: chờ leader rồi dùng chung kết quả
+        if not is_leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        # 2. Leader: gọi upstream (có khóa liên tiến trình nếu được cấu hình)
+        try:
+            if self.lock_dir and recheck is not None:
+                flight.result = self._run_with_file_lock(key, fn, args, kwargs, recheck)
+            else:
+                flight.result = fn(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _lock_path(self, key):
+        stripe = int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16) % self.lock_stripes
+        return os.path.join(self.lock_dir, f"sf-{stripe:04d}.lock")
+
+    def _run_with_file_lock(self, key, fn, args, kwargs, recheck):
+        with open(self._lock_path(key), "a+") as lock_file:
+            # Chờ khóa không chặn vô hạn: thử lại định kỳ cho đến lock_timeout
+            deadline = time.monotonic() + self.lock_timeout
+            locked = False
+            while True:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        break
+                    time.sleep(0.05)
+
+            if not locked:
+                self._count('lock_timeouts')
+                return fn(*args, **kwargs)
+
+            try:
+                # Tiến trình khác có thể vừa lấy xong kết quả trong lúc ta chờ khóa
+                existing = recheck()
+                if existing is not None:
+                    self._count('cross_process_hits')
+                    return existing
+                return fn(*args, **kwargs)
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, in_flight=len(self._flights))
@@ -0,0 +1,176 @@
+# stub_servers.py
+
+# --- Standard Library Imports ---
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+
+# Từ bắt đầu bằng tiền tố này được stub từ điển trả 404 (giả lập từ gõ sai) để thử negative cache
+UNKNOWN_WORD_PREFIX = "zz"
+
+
+class FaultInjector:
+    """
+    Độ trễ, lỗi và giới hạn tốc độ giả lập cho stub server. Dùng một random.Random có seed
+    nên cùng cấu hình + cùng thứ tự request cho ra cùng kết quả (benchmark lặp lại được).
+
+    - latency_ms ± jitter_ms cho mỗi request; thêm tail_ms với xác suất tail_rate (đuôi độ trễ, để thử hedging/timeout).
+    - error_rate: xác suất trả 500.
+    - throttle_rps / throttle_burst: token bucket; hết token -> 429 kèm Retry-After.
+    """
+
+    def __init__(self, latency_ms=50, jitter_ms=0, tail_rate=0.0, tail_ms=0, error_rate=0.0,
+                 throttle_rps=0, throttle_burst=None, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps
+        self.throttle_burst = throttle_burst or max(1, int(throttle_rps))
+        self._random = random.Random(seed)
+        self._tokens = float(self.throttle_burst)
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "throttled": 0, "errors": 0, "ok": 0}
+
+    def decide(self):
+        """Trả về (độ trễ giây, mã lỗi hoặc None) cho một request."""
+        with self._lock:
+            self.counters["requests"] += 1
+            if self.throttle_rps:
+                now = time.monotonic()
+                self._tokens = min(self.throttle_burst, self._tokens + (now - self._refilled_at) * self.throttle_rps)
+                self._refilled_at = now
+                if self._tokens < 1:
+                    self.counters["throttled"] += 1
+                    return 0.0, 429
+                self._tokens -= 1
+
+            delay_ms = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            if self.tail_rate and self._random.random() < self.tail_rate:
+                delay_ms += self.tail_ms
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.counters["errors"] += 1
+                return max(0.0, delay_ms) / 1000.0, 500
+            self.counters["ok"] += 1
+            return max(0.0, delay_ms) / 1000.0, None
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+def canned_dictionary_entry(word):
+    """Một entry theo định dạng dictionaryapi.dev, nội dung suy ra từ chính từ đó (ổn định giữa các lần chạy)."""
+    return [{
+        "word": word,
+        "phonetics": [{"text": f"/{word}/"}],
+        "meanings": [
+            {"partOfSpeech": "noun",
+             "definitions": [{"definition": f"Stub definition of {word}.", "example": f"A {word} example.",
+                              "synonyms": [f"{word}-synonym"]}]},
+            {"partOfSpeech": "verb", "definitions": [{"definition": f"To do {word}."}]},
+        ],
+    }]
+
+
+def canned_tatoeba_results(word):
+    """Kết quả tìm câu theo định dạng Tatoeba api_v0: một câu tiếng Anh có bản dịch tiếng Việt."""
+    return {"results": [{
+        "text": f"This sentence uses {word}.",
+        "translations": [[{"lang": "vie", "text": f"Câu này dùng từ {word}."}]],
+    }]}
+
+
+def canned_translation(text):
+    return f"[vi] {text}"
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Giả lập dictionaryapi.dev, Tatoeba và LibreTranslate trên cùng một server (phân biệt theo đường dẫn)."""
+
+    protocol_version = "HTTP/1.1"  # Giữ kết nối keep-alive như API thật
+
+    def log_message(self, format, *args):
+        pass  # Không in một dòng cho mỗi request (làm nhiễu benchmark)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_faults(self):
+        """Áp dụng độ trễ/lỗi/throttle. Trả về True nếu request đã được trả lời bằng lỗi."""
+        delay, error_status = self.server.faults.decide()
+        if delay:
+            time.sleep(delay)
+        if error_status == 429:
+            self._send_json(429, {"error": "Too many requests"}, headers={"Retry-After": "1"})
+            return True
+        if error_status:
+            self._send_json(error_status, {"error": "Injected failure"})
+            return True
+        return False
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == "/__stats":
+            self._send_json(200, self.server.faults.stats())
+            return
+        if self._inject_faults():
+            return
+
+        if parts.path.startswith("/api/v2/entries/"):
+            word = unquote(parts.path.rsplit("/", 1)[-1])
+            if word.lower().startswith(UNKNOWN_WORD_PREFIX):
+                self._send_json(404, {"title": "No Definitions Found"})
+            else:
+                self._send_json(200, canned_dictionary_entry(word))
+        elif parts.path == "/en/api_v0/search":
+            word = parse_qs(parts.query).get("query", [""])[0]
+            self._send_json(200, canned_tatoeba_results(word))
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""  # Luôn đọc hết body để giữ được kết nối keep-alive
+        if self._inject_faults():
+            return
+        if urlsplit(self.path).path != "/translate":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        if "json" in (self.headers.get("Content-Type") or ""):
+            payload = json.loads(raw_body or b"{}")
+        else:
+            payload = {key: values[0] for key, values in parse_qs(raw_body.decode("utf-8")).items()}
+        texts = payload.get("q")
+        if isinstance(texts, list):  # Batch: LibreTranslate trả list trong cùng key "translatedText"
+            self._send_json(200, {"translatedText": [canned_translation(text) for text in texts]})
+        else:
+            self._send_json(200, {"translatedText": canned_translation(texts or "")})
+
+
+def make_stub_server(host="127.0.0.1", port=8765, faults=None):
+    """Tạo (chưa chạy) ThreadingHTTPServer giả lập các API; mỗi request được xử lý trên một thread riêng."""
+    server = ThreadingHTTPServer((host, port), StubRequestHandler)
+    server.daemon_threads = True
+    server.faults = faults or FaultInjector()
+    return server
+
+
+def start_stub_server_in_thread(host="127.0.0.1", port=0, faults=None):
+    """Chạy stub server trong một daemon thread (port=0: hệ điều hành chọn port trống). Trả về server."""
+    server = make_stub_server(host, port, faults)
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server
@@ -0,0 +1,235 @@
+# tatoeba_index.py
+
+# --- Standard Library Imports ---
+import bz2  # Đọc file export của Tatoeba nén .bz2
+import csv  # File export của Tatoeba là TSV (tab-separated)
+import gzip  # Đọc file export nén .gz
+import os
+import re  # Tách câu ví dụ thành các từ để đánh chỉ mục
+import sqlite3  # Chỉ mục cục bộ được lưu trong một file SQLite riêng, tách khỏi database chính
+import threading
+import time
+
+# Regex lấy các từ tiếng Anh trong câu (giữ dạng có dấu nháy như "don't")
+WORD_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Số cặp câu tối đa giữ lại cho mỗi từ trong bảng posting (các câu ngắn nhất được ưu tiên)
+DEFAULT_MAX_PAIRS_PER_WORD = 50
+
+
+def _open_text(path):
+    """Mở file văn bản, tự giải nén nếu là .bz2/.gz."""
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rt', encoding='utf-8', newline='')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def _iter_tsv(path):
+    """Đọc từng dòng TSV mà không nạp cả file vào bộ nhớ. Câu Tatoeba có thể chứa dấu nháy nên tắt quoting."""
+    csv.field_size_limit(1 << 20)
+    with _open_text(path) as f:
+        for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if row:
+                yield row
+
+
+def tokenize_sentence(text):
+    """Tách câu thành tập các từ (chữ thường, không trùng lặp)."""
+    return set(WORD_TOKEN_RE.findall((text or "").lower()))
+
+
+def import_tatoeba_export(sentences_path, links_path, index_path, source_lang='eng', target_lang='vie',
+                          max_pairs_per_word=DEFAULT_MAX_PAIRS_PER_WORD):
+    """
+    Nạp file export công khai của Tatoeba (sentences.csv + links.csv) vào một chỉ mục SQLite cục bộ.
+
+    Định dạng đầu vào (TSV, có thể nén .bz2/.gz):
+        sentences: id <TAB> lang <TAB> text
+        links:     sentence_id <TAB> translation_id
+
+    Quy trình (không nạp toàn bộ câu tiếng Anh vào bộ nhớ):
+        1. Đọc sentences lần 1: giữ lại các câu tiếng Việt (số lượng nhỏ).
+        2. Đọc links: tìm các câu có bản dịch tiếng Việt.
+        3. Đọc sentences lần 2: lấy nội dung các câu tiếng Anh tương ứng.
+        4. Ghi các cặp câu (câu ngắn trước) + bảng posting từ -> cặp câu + bảng FTS5 (nếu SQLite hỗ trợ).
+
+    Chỉ mục được xây trong file tạm rồi đổi tên, nên các worker đang đọc không bao giờ thấy file dở dang.
+
+    Returns:
+        dict: Thống kê {'pairs': số cặp câu, 'words': số từ được đánh chỉ mục, 'fts': có FTS5 hay không}.
+    """
+    # 1. Các câu ở ngôn ngữ đích
+    target_sentences = {}
+    for row in _iter_tsv(sentences_path):
+        if len(row) >= 3 and row[1] == target_lang:
+            target_sentences[row[0]] = row[2]
+
+    # 2. Câu nguồn (chưa biết ngôn ngữ) -> bản dịch đầu tiên ở ngôn ngữ đích
+    candidate_links = {}
+    for row in _iter_tsv(links_path):
+        if len(row) >= 2 and row[1] in target_sentences and row[0] not in candidate_links:
+            candidate_links[row[0]] = row[1]
+
+    # 3. Lấy nội dung câu nguồn cho các cặp tìm được
+    pairs = []
+    for row in _iter_tsv(sentences_path):
+        if len(row) >= 3 and row[1] == source_lang and row[0] in candidate_links:
+            target_id = candidate_links[row[0]]
+            pairs.append((int(row[0]), int(target_id), row[2], target_sentences[target_id]))
+    del candidate_links, target_sentences
+
+    # Câu ngắn là ví dụ dễ hiểu hơn: xếp trước để id nhỏ hơn, truy vấn chỉ cần lấy id nhỏ nhất
+    pairs.sort(key=lambda pair: (len(pair[2]), pair[0]))
+
+    # 4. Ghi chỉ mục vào file tạm
+    tmp_path = index_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE sentence_pair (id INTEGER PRIMARY KEY, source_id INTEGER, target_id INTEGER, "
+                     "example_en TEXT NOT NULL, example_vi TEXT NOT NULL)")
+        conn.execute("CREATE TABLE word_posting (word TEXT NOT NULL, pair_id INTEGER NOT NULL, "
+                     "PRIMARY KEY (word, pair_id)) WITHOUT ROWID")
+
+        conn.executemany("INSERT INTO sentence_pair (id, source_id, target_id, example_en, example_vi) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         ((pair_id, src_id, tgt_id, text_en, text_vi)
+                          for pair_id, (src_id, tgt_id, text_en, text_vi) in enumerate(pairs, start=1)))
+
+        # Bảng posting: mỗi từ chỉ giữ max_pairs_per_word cặp câu ngắn nhất
+        postings_per_word = {}
+        for pair_id, (_, _, text_en, _) in enumerate(pairs, start=1):
+            for word in tokenize_sentence(text_en):
+                pair_ids = postings_per_word.setdefault(word, [])
+                if len(pair_ids) < max_pairs_per_word:
+                    pair_ids.append(pair_id)
+        conn.executemany("INSERT INTO word_posting (word, pair_id) VALUES (?, ?)",
+                         ((word, pair_id) for word, pair_ids in postings_per_word.items() for pair_id in pair_ids))
+
+        # FTS5 cho truy vấn cụm từ (ví dụ "take off"); bỏ qua nếu bản SQLite không được build kèm FTS5
+        has_fts = True
+        try:
+            conn.execute("CREATE VIRTUAL TABLE sentence_fts USING fts5(example_en, content='sentence_pair', "
+                         "content_rowid='id')")
+            conn.execute("INSERT INTO sentence_fts (rowid, example_en) SELECT id, example_en FROM sentence_pair")
+        except sqlite3.OperationalError:
+            has_fts = False
+
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ('source_lang', source_lang),
+            ('target_lang', target_lang),
+            ('pairs', str(len(pairs))),
+            ('fts', '1' if has_fts else '0'),
+            ('built_at', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+        ])
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, index_path)  # Đổi tên nguyên tử: worker đang đọc vẫn dùng file cũ đến khi mở lại
+    return {'pairs': len(pairs), 'words': len(postings_per_word), 'fts': has_fts}
+
+
+class TatoebaIndex:
+    """
+    Tra câu ví dụ Anh - Việt từ chỉ mục cục bộ do import_tatoeba_export() tạo ra.
+
+    Mỗi thread có một kết nối SQLite chỉ-đọc riêng. Nếu file chỉ mục chưa tồn tại,
+    lookup() trả về None và sẽ kiểm tra lại sau recheck_seconds (cho phép import khi ứng dụng đang chạy).
+    """
+
+    def __init__(self, index_path, recheck_seconds=60):
+        self.index_path = index_path
+        self.recheck_seconds = recheck_seconds
+        self._local = threading.local()
+        self._meta = None
+        self._index_mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh_state(self):
+        """Kiểm tra (có giới hạn tần suất) file chỉ mục có tồn tại/thay đổi không. Trả về True nếu dùng được."""
+        now = time.monotonic()
+        if self._meta is not None and now - self._last_check < self.recheck_seconds:
+            return True
+        if self._meta is None and now - self._last_check < self.recheck_seconds and self._last_check:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            try:
+                mtime = os.path.getmtime(self.index_path)
+            except OSError:
+                self._meta = None
+                return False
+            if self._meta is None or mtime != self._index_mtime:
+                conn = self._connect()
+                try:
+                    self._meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+                finally:
+                    conn.close()
+                self._index_mtime = mtime
+            return True
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True, check_same_thread=False)
+
+    def _get_connection(self):
+        """Kết nối theo từng thread; mở lại nếu file chỉ mục đã được import lại."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'mtime', None) != self._index_mtime:
+            if conn is not None:
+                conn.close()
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.mtime = self._index_mtime
+        return conn
+
+    def is_available(self, source_lang='eng', target_lang='vie'):
+        """True nếu chỉ mục đã được import cho đúng cặp ngôn ngữ."""
+        if not self._refresh_state():
+            return False
+        meta = self._meta or {}
+        return meta.get('source_lang') == source_lang and meta.get('target_lang') == target_lang
+
+    def lookup(self, word, source_lang='eng', target_lang='vie'):
+        """
+        Tìm một câu ví dụ chứa `word`.
+
+        Returns:
+            dict | None: {'example_en': ..., 'example_vi': ...} giống get_tatoeba_examples, hoặc None nếu không có.
+        """
+        if not self.is_available(source_lang, target_lang):
+            return None
+
+        tokens = WORD_TOKEN_RE.findall((word or "").lower())
+        if not tokens:
+            return None
+
+        conn = self._get_connection()
+        if len(tokens) == 1:
+            # Tra bảng posting theo khóa chính (word, pair_id): một lần seek B-tree
+            row = conn.execute("SELECT p.example_en, p.example_vi FROM word_posting w "
+                               "JOIN sentence_pair p ON p.id = w.pair_id "
+                               "WHERE w.word = ? ORDER BY w.pair_id LIMIT 1", (tokens[0],)).fetchone()
+        elif self._meta.get('fts') == '1':
+            # Cụm nhiều từ: truy vấn cụm từ chính xác qua FTS5
+            phrase = '"' + " ".join(tokens) + '"'
+            row = conn.execute("SELECT p.example_en, p.example_vi FROM sentence_fts f "
+                               "JOIN sentence_pair p ON p.id = f.rowid "
+                               "WHERE sentence_fts MATCH ? ORDER BY f.rowid LIMIT 1", (phrase,)).fetchone()
+        else:
+            row = None
+
+        if row:
+            return {'example_en': row[0], 'example_vi': row[1]}
+        return None
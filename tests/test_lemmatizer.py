@@ -0,0 +1,96 @@
+# tests/test_lemmatizer.py
+
+# --- Third-party Library Imports ---
+import pytest
+
+# --- Application-Specific Imports ---
+from lemmatizer import EXCEPTIONS, lemmatize, normalize_surface
+
+LEMMA_CASES = [
+    # Chuẩn hóa bề mặt
+    ("RUN ", "run"),
+    ("ice  cream", "ice cream"),
+    ("well-known", "well-known"),
+    # Động từ / danh từ bất quy tắc
+    ("ran", "run"),
+    ("went", "go"),
+    ("children", "child"),
+    ("mice", "mouse"),
+    ("knives", "knife"),
+    # Số nhiều / ngôi thứ ba
+    ("cats", "cat"),
+    ("makes", "make"),
+    ("studies", "study"),
+    ("watches", "watch"),
+    ("classes", "class"),
+    ("buses", "bus"),
+    ("gases", "gas"),
+    # -ed / -ing
+    ("running", "run"),
+    ("stopped", "stop"),
+    ("making", "make"),
+    ("hoped", "hope"),
+    ("related", "relate"),
+    ("troubled", "trouble"),
+    ("organized", "organize"),
+    ("studied", "study"),
+    ("agreed", "agree"),
+    ("visited", "visit"),
+    ("limited", "limit"),
+    ("focused", "focus"),
+    ("biased", "bias"),
+    # Nguyên âm đôi + s/z: thêm lại 'e'
+    ("caused", "cause"),
+    ("causing", "cause"),
+    ("increased", "increase"),
+    ("pleased", "please"),
+    ("released", "release"),
+    ("squeezed", "squeeze"),
+    # Động từ 'e' câm không dựng lại được bằng quy tắc
+    ("excited", "excite"),
+    ("exciting", "excite"),
+    ("united", "unite"),
+    ("completed", "complete"),
+    # Không phải số nhiều
+    ("physics", "physics"),
+    ("politics", "politics"),
+    ("whereas", "whereas"),
+    ("atlas", "atlas"),
+    ("sometimes", "sometimes"),
+    ("news", "news"),
+    # Dạng gốc trông như có hậu tố
+    ("need", "need"),
+    ("morning", "morning"),
+    ("string", "string"),
+    ("hundred", "hundred"),
+    # Dạng biến đổi nhưng là từ độc lập trong từ điển
+    ("rose", "rose"),
+    ("left", "left"),
+    ("saw", "saw"),
+    ("found", "found"),
+    ("wound", "wound"),
+    ("bit", "bit"),
+    ("felt", "felt"),
+    ("lay", "lay"),
+    ("data", "data"),
+]
+
+
+@pytest.mark.parametrize("word, expected", LEMMA_CASES)
+def test_lemmatize(word, expected):
+    assert lemmatize(word) == expected
+
+
+@pytest.mark.parametrize("word", ["rose", "left", "saw", "found", "wound", "bit", "felt", "lay", "data"])
+def test_standalone_headwords_are_not_exceptions(word):
+    assert word not in EXCEPTIONS
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("  Hello   World ", "hello world"),
+    ("ＲＵＮ", "run"),  # Ký tự full-width -> NFKC
+    ("", ""),
+    (None, ""),
+])
+def test_normalize_surface(word, expected):
+    assert normalize_surface(word) == expected
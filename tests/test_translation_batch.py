@@ -0,0 +1,42 @@
+# tests/test_translation_batch.py
+
+# --- Third-party Library Imports ---
+import pytest
+import requests
+
+# --- Application-Specific Imports ---
+from enrichment import parse_libre_batch_response, split_translation_batches
+from stub_servers import start_stub_server_in_thread
+
+
+@pytest.mark.parametrize("data, expected_count, expected", [
+    # Định dạng thật của LibreTranslate khi q là list
+    ({"translatedText": ["xin chào", "thế giới"]}, 2, ["xin chào", "thế giới"]),
+    # Key cũ của một số bản fork
+    ({"translatedTexts": ["xin chào"]}, 1, ["xin chào"]),
+    # Số lượng không khớp / sai định dạng
+    ({"translatedText": ["xin chào"]}, 2, None),
+    ({"translatedText": "xin chào"}, 1, None),
+    ({"error": "Invalid request"}, 1, None),
+    (["xin chào"], 1, None),
+])
+def test_parse_libre_batch_response(data, expected_count, expected):
+    assert parse_libre_batch_response(data, expected_count) == expected
+
+
+def test_stub_server_answers_batches_in_libretranslate_shape():
+    server = start_stub_server_in_thread()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/translate"
+        response = requests.post(url, json={"q": ["hello", "world"], "source": "en", "target": "vi"}, timeout=5)
+        data = response.json()
+        assert isinstance(data["translatedText"], list)
+        assert parse_libre_batch_response(data, 2) == ["[vi] hello", "[vi] world"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_split_translation_batches_respects_item_and_byte_limits():
+    batches = list(split_translation_batches(["a" * 4, "b" * 4, "c" * 20, "d"], max_items=2, max_bytes=10))
+    assert batches == [["a" * 4, "b" * 4], ["c" * 20], ["d"]]
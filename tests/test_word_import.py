@@ -0,0 +1,34 @@
+# tests/test_word_import.py
+
+# --- Third-party Library Imports ---
+import pytest
+
+# --- Application-Specific Imports ---
+from word_import import count_import_rows, detect_delimiter, iter_import_rows
+
+
+def write_import_file(tmp_path, content, name="words.csv"):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("header", [
+    "word,definition_en,definition_vi,ipa,examples,examples_vi",  # Tên cột theo đặc tả của /import-words
+    "word,definition,meaning_vi,pronunciation,example_sentence,example_sentence_vi",
+    "original_word,definition_en,definition_vi,ipa,example_en,example_vi",
+])
+def test_header_aliases_map_to_import_columns(tmp_path, header):
+    path = write_import_file(tmp_path, header + "\napple,a fruit,quả táo,/ˈæp.əl/,I eat an apple.,Tôi ăn táo.\n")
+    rows = list(iter_import_rows(path, detect_delimiter(path)))
+    assert rows == [{
+        "original_word": "apple", "word_type": None, "definition_en": "a fruit", "definition_vi": "quả táo",
+        "ipa": "/ˈæp.əl/", "example_en": "I eat an apple.", "example_vi": "Tôi ăn táo.",
+    }]
+
+
+def test_rows_without_header_follow_column_order(tmp_path):
+    path = write_import_file(tmp_path, "apple\tnoun\n\nbanana\n", name="words.tsv")
+    rows = list(iter_import_rows(path, detect_delimiter(path, "words.tsv")))
+    assert [(row["original_word"], row["word_type"]) for row in rows] == [("apple", "noun"), ("banana", None)]
+    assert count_import_rows(path, "\t") == 2
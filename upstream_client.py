@@ -0,0 +1,186 @@
+# upstream_client.py
+
+# --- Standard Library Imports ---
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+# --- Third-party Library Imports ---
+import requests
+from requests.adapters import HTTPAdapter  # Adapter giữ pool kết nối keep-alive của urllib3
+from urllib3.util.retry import Retry  # Tự động thử lại với backoff khi lỗi kết nối hoặc 429/5xx
+
+# --- Application-Specific Imports ---
+from circuit_breaker import LatencyTracker
+
+# Mã trạng thái HTTP đáng thử lại (quá tải / lỗi tạm thời của upstream)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class _NoCookiePolicy(DefaultCookiePolicy):
+    """Không lưu cookie nào: session dùng chung giữa các thread/người dùng không được mang trạng thái."""
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+class UpstreamClient:
+    """
+    HTTP client dùng chung cho MỘT upstream (một host), thay cho requests.get/requests.post cấp module.
+
+    - Một requests.Session duy nhất với HTTPAdapter có pool kết nối keep-alive: các lời gọi sau
+      dùng lại kết nối TCP+TLS đã mở thay vì bắt tay lại cho mỗi từ.
+    - Retry có backoff cho lỗi kết nối và các mã 429/5xx (tôn trọng header Retry-After).
+    - Timeout (connect, read) mặc định theo từng upstream, có thể ghi đè cho từng lời gọi.
+    - Tùy chọn circuit breaker (fail fast khi upstream hỏng) và read timeout thích ứng theo p95 độ trễ:
+      read timeout cấu hình chỉ còn là mức trần.
+
+    An toàn khi dùng từ nhiều worker thread: pool kết nối của urllib3 có khóa riêng, và session
+    không lưu cookie giữa các lời gọi (các API công khai này không cần cookie).
+    """
+
+    def __init__(self, name, connect_timeout=3.05, read_timeout=10, pool_maxsize=4,
+                 retries=2, backoff_factor=0.3, breaker=None, adaptive_timeout=None):
+        """
+        Args:
+            name (str): Tên upstream (hiển thị trên trang admin).
+            connect_timeout (float): Thời gian chờ mở kết nối (giây).
+            read_timeout (float): Thời gian chờ đọc response mặc định (giây).
+            pool_maxsize (int): Số kết nối keep-alive tối đa giữ lại cho host này.
+                                Nên bằng giới hạn đồng thời của upstream trong enrichment_engine.
+            retries (int): Số lần thử lại tối đa.
+            backoff_factor (float): Hệ số backoff giữa các lần thử lại (0.3 -> 0.3s, 0.6s, 1.2s...).
+            breaker (CircuitBreaker, optional): Circuit breaker của upstream này.
+            adaptive_timeout (dict, optional): Tham số cho LatencyTracker (multiplier, min_timeout, ...).
+                                               None -> dùng read timeout cố định.
+        """
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_maxsize = max(1, int(pool_maxsize))
+        self.breaker = breaker
+        self.adaptive_timeout = adaptive_timeout
+        self._latency_trackers = {}  # Mức trần read timeout -> LatencyTracker (batch và đơn lẻ được theo dõi riêng)
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET", "POST"]),  # Các API dịch/tra từ đều không có tác dụng phụ
+            respect_retry_after_header=True,
+            raise_on_status=False  # Trả về response cuối cùng để raise_for_status() của fetcher xử lý như cũ
+        )
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize,
+                                    max_retries=retry, pool_block=False)
+        self.session = requests.Session()
+        self.session.cookies.set_policy(_NoCookiePolicy())
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        # Bộ đếm cho trang admin
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._failures = 0
+        self._retries = 0
+
+    def _latency_tracker(self, max_read_timeout):
+        if self.adaptive_timeout is None:
+            return None
+        with self._lock:
+            tracker = self._latency_trackers.get(max_read_timeout)
+            if tracker is None:
+                tracker = self._latency_trackers[max_read_timeout] = LatencyTracker(**self.adaptive_timeout)
+            return tracker
+
+    def request(self, method, url, read_timeout=None, **kwargs):
+        """
+        Gửi request qua session dùng chung. Ném ra requests.exceptions.RequestException như requests.get/post
+        (kể cả CircuitOpenError khi circuit breaker đang mở).
+
+        Args:
+            read_timeout (float, optional): Ghi đè mức trần read timeout cho lời gọi này.
+        """
+        # 1. Circuit breaker: từ chối ngay nếu upstream đang bị ngắt
+        if self.breaker is not None:
+            self.breaker.before_call()
+
+        # 2. Read timeout: thích ứng theo p95 độ trễ, không vượt quá mức trần cấu hình
+        max_read_timeout = read_timeout if read_timeout is not None else self.read_timeout
+        tracker = self._latency_tracker(max_read_timeout)
+        effective_read_timeout = tracker.timeout(max_read_timeout) if tracker else max_read_timeout
+        kwargs.setdefault("timeout", (self.connect_timeout, effective_read_timeout))
+
+        # 3. Gửi request và ghi nhận kết quả. 429/5xx/lỗi mạng là lỗi của upstream; 4xx khác (ví dụ 404) thì không.
+        started = time.monotonic()
+        upstream_ok = False
+        try:
+            response = self.session.request(method, url, **kwargs)
+            upstream_ok = response.status_code < 500 and response.status_code != 429
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._requests += 1
+                self._failures += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            if tracker is not None and upstream_ok:
+                tracker.add(elapsed)
+            if self.breaker is not None:
+                self.breaker.record(upstream_ok, elapsed)
+
+        retry_history = getattr(getattr(getattr(response, "raw", None), "retries", None), "history", None) or ()
+        with self._lock:
+            self._requests += 1
+            self._retries += len(retry_history)
+            if response.status_code >= 400:
+                self._failures += 1
+        return response
+
+    def get(self, url, read_timeout=None, **kwargs):
+        return self.request("GET", url, read_timeout=read_timeout, **kwargs)
+
+    def post(self, url, read_timeout=None, **kwargs):
+        return self.request("POST", url, read_timeout=read_timeout, **kwargs)
+
+    def stats(self):
+        """
+        Thống kê dùng lại kết nối. urllib3 đếm số kết nối đã mở (num_connections) và số request
+        đã gửi (num_requests) trên từng pool; phần chênh lệch là số lần dùng lại kết nối keep-alive.
+        """
+        new_connections = 0
+        pool_requests = 0
+        pool_manager = getattr(self._adapter, "poolmanager", None)
+        if pool_manager is not None:
+            for key in list(pool_manager.pools.keys()):
+                pool = pool_manager.pools.get(key)
+                if pool is None:
+                    continue
+                new_connections += getattr(pool, "num_connections", 0)
+                pool_requests += getattr(pool, "num_requests", 0)
+
+        with self._lock:
+            requests_sent, failures, retries = self._requests, self._failures, self._retries
+        reused = max(0, pool_requests - new_connections)
+        tracker = self._latency_tracker(self.read_timeout)
+        p95 = tracker.percentile(0.95) if tracker else None
+        breaker_stats = self.breaker.stats() if self.breaker is not None else {}
+        return {
+            "name": self.name,
+            "requests": requests_sent,
+            "failures": failures,
+            "retries": retries,
+            "new_connections": new_connections,
+            "reused_connections": reused,
+            "reuse_rate": (100.0 * reused / pool_requests) if pool_requests else None,
+            "pool_maxsize": self.pool_maxsize,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            "effective_read_timeout": tracker.timeout(self.read_timeout) if tracker else self.read_timeout,
+            "p95_latency": p95,
+            "breaker_state": breaker_stats.get("state"),
+            "breaker_reason": breaker_stats.get("reason"),
+            "breaker_rejected": breaker_stats.get("rejected", 0),
+        }
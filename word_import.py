@@ -0,0 +1,82 @@
+# word_import.py
+
+# --- Standard Library Imports ---
+import csv  # Đọc file CSV/TSV theo từng dòng (không nạp cả file vào bộ nhớ)
+import os
+
+# Các cột mà một dòng trong file nhập có thể có. Chỉ 'original_word' là bắt buộc;
+# các cột còn lại nếu có giá trị sẽ được dùng thẳng, nếu trống thì được tra bổ sung.
+IMPORT_COLUMNS = ("original_word", "word_type", "definition_en", "definition_vi", "ipa", "example_en", "example_vi")
+
+# Tên cột (viết thường) được chấp nhận trong dòng tiêu đề -> cột chuẩn
+HEADER_ALIASES = {
+    "word": "original_word", "original_word": "original_word", "term": "original_word",
+    "type": "word_type", "word_type": "word_type", "pos": "word_type",
+    "definition": "definition_en", "definition_en": "definition_en", "meaning_en": "definition_en",
+    "definition_vi": "definition_vi", "meaning_vi": "definition_vi", "vietnamese": "definition_vi",
+    "ipa": "ipa", "pronunciation": "ipa",
+    "example": "example_en", "example_en": "example_en", "example_sentence": "example_en", "examples": "example_en",
+    "example_vi": "example_vi", "example_sentence_vi": "example_vi", "examples_vi": "example_vi",
+}
+
+# Độ dài tối đa theo schema của VocabularyEntry
+COLUMN_MAX_LENGTHS = {"original_word": 200, "word_type": 50, "ipa": 100}
+
+FILE_ENCODING = "utf-8-sig"  # Bỏ BOM mà Excel hay thêm vào đầu file CSV
+
+
+def detect_delimiter(path, filename=None):
+    """Đoán ký tự phân cách: theo đuôi file (.tsv/.tab) hoặc dò 4KB đầu tiên; mặc định là dấu phẩy."""
+    if filename and os.path.splitext(filename)[1].lower() in (".tsv", ".tab"):
+        return "\t"
+    with open(path, "r", encoding=FILE_ENCODING, errors="replace", newline="") as source:
+        sample = source.read(4096)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",\t;").delimiter
+    except csv.Error:
+        return "\t" if sample.count("\t") > sample.count(",") else ","
+
+
+def _column_mapping(first_row):
+    """
+    Trả về (vị trí cột -> cột chuẩn, dòng đầu có phải tiêu đề không).
+    Không có tiêu đề (không có cột nào là từ) thì các cột được hiểu theo thứ tự IMPORT_COLUMNS.
+    """
+    mapping = {}
+    for position, name in enumerate(first_row):
+        column = HEADER_ALIASES.get(name.strip().lower())
+        if column and column not in mapping.values():
+            mapping[position] = column
+    if "original_word" in mapping.values():
+        return mapping, True
+    return dict(enumerate(IMPORT_COLUMNS)), False
+
+
+def iter_import_rows(path, delimiter=","):
+    """
+    Đọc file nhập theo từng dòng và trả về dict {cột chuẩn: giá trị đã strip hoặc None}.
+    Dòng trống bị bỏ qua; dòng không có từ vẫn được trả về (original_word=None) để bên gọi đếm và bỏ qua,
+    nhờ vậy vị trí dòng (dùng để chạy tiếp sau khi worker bị tắt) luôn ổn định.
+    """
+    with open(path, "r", encoding=FILE_ENCODING, errors="replace", newline="") as source:
+        reader = csv.reader(source, delimiter=delimiter)
+        mapping = None
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            if mapping is None:
+                mapping, has_header = _column_mapping(row)
+                if has_header:
+                    continue
+            item = dict.fromkeys(IMPORT_COLUMNS)
+            for position, column in mapping.items():
+                if position < len(row):
+                    value = row[position].strip()
+                    max_length = COLUMN_MAX_LENGTHS.get(column)
+                    item[column] = (value[:max_length] if max_length else value) or None
+            yield item
+
+
+def count_import_rows(path, delimiter=","):
+    """Đếm số dòng dữ liệu (không tính tiêu đề, dòng trống) bằng cách đọc lướt file một lần."""
+    return sum(1 for _ in iter_import_rows(path, delimiter))